@@ -69,7 +69,7 @@ def check_subscription_limits(resource_type):
             elif resource_type == 'racks':
                 # Count racks in this facility
                 from models_db import RackModel
-                rack_count = RackModel.query.filter_by(facility_id=facility_id).count()
+                rack_count = RackModel.query.filter_by(facility_id=facility_id, deleted_at=None).count()
                 max_allowed = subscription.max_racks
                 
                 if rack_count >= max_allowed:
@@ -2,6 +2,7 @@
 # At the top of your app.py or config.py
 from dotenv import load_dotenv
 import os
+import json
 
 # Load .env file if it exists (for local development)
 if os.path.exists('.env'):
@@ -9,7 +10,7 @@ if os.path.exists('.env'):
 
 if not os.path.exists("logs"):
     os.makedirs("logs")
-from flask import Flask, jsonify, request, make_response
+from flask import Flask, jsonify, request, make_response, Response, stream_with_context
 from flask_jwt_extended import (
     jwt_required, 
     get_jwt_identity,  # Add this import
@@ -27,6 +28,9 @@ from models_db import (
     BreedingPlanModel,
     BreedingCalendarModel,
     CrossModel,
+    CalendarFeedModel,
+    BreedingCalendarSeriesModel,
+    BreedingCalendarExceptionModel,
     TankPositionHistoryModel,  # Add this
     ClinicalCaseModel,  # Make sure this is included
     ClinicalNoteModel,  # Make sure this is included
@@ -34,9 +38,10 @@ from models_db import (
 )
 from auth import role_required  # Add this import
 from werkzeug.security import generate_password_hash, check_password_hash  # Add this import
-from datetime import datetime  # Add this at the top with other imports
+from datetime import date, datetime, timedelta  # Add this at the top with other imports
 from flask_migrate import Migrate
 from sqlalchemy import or_, text  # Also add this import for the database query
+from sqlalchemy.orm import joinedload, selectinload
 from admin import admin_bp
 # Import at the top of your app.py file
 from auth import auth_bp, jwt_required, get_jwt_identity
@@ -52,6 +57,27 @@ from webhook_handler import webhook_handler_bp
 from webhook import webhook_bp
 # Import the notification service at the top of app.py
 from notification_service import create_notification
+from email_queue import email_pool
+from position_history import PositionIntervalIndex, position_at, resolve_positions, record_move, record_moves, retire_tank
+from breeding_service import get_tank_crosses, search_plans_query, tank_fish_counts, validate_fish_availability, TANK1_ROLE
+from reservations import adjust_reservations, cross_uses, reserved_on
+from breeding_analytics import get_breeding_analytics, invalidate_breeding_analytics
+from pagination import encode_cursor, decode_cursor, keyset_after, page_size, NEXT_CURSOR_HEADER
+from rack_layout import layout_at
+from calendar_feed import bump_calendar_version, feed_body, feed_etag, get_or_create_feed
+from calendar_service import calendar_summary, month_bounds, series_occurrences
+from recurrence import occurrence_dates, parse_rrule, validate_rule
+from capacity import plan_capacity, MAX_PLANNER_DAYS
+from clinical_service import (
+    cases_query, adjust_open_cases, open_case_delta, case_notes_page, case_note_count,
+    OPEN_STATUS, CLOSED_STATUS, CASE_STATUSES,
+    get_symptom_trends, invalidate_symptom_trends, SYMPTOM_TREND_GROUPS, MAX_TREND_WEEKS
+)
+from pairing import suggest_pairs, DEFAULT_MAX_FISH
+from pedigree import (
+    cross_for_facility, crosses_with_offspring, get_ancestors, get_descendants,
+    graph_to_dot, lineage_graph, set_parent_cross
+)
 # Add this to your app.py file
 from super_admin_routes import super_admin_bp
 # Add these imports to app.py
@@ -122,7 +148,7 @@ def get_racks():
     try:
         facility_id = get_current_facility_id()
         print(f"Current facility ID for racks request: {facility_id}")
-        racks = RackModel.query.filter_by(facility_id=facility_id).all()
+        racks = RackModel.query.filter_by(facility_id=facility_id, deleted_at=None).all()
         data = []
         for rack in racks:
             # Manual serialization of rack
@@ -134,6 +160,7 @@ def get_racks():
                 "columns": rack.columns,
                 "row_configs": rack.row_configs,
                 "facility_id": rack.facility_id,
+                "open_case_count": rack.open_case_count,
                 "tanks": []  # Initialize tanks array
             }
             
@@ -151,6 +178,9 @@ def get_racks():
                     "dob": tank.dob.isoformat() if tank.dob else None,
                     "color": tank.color,
                     "rack_id": tank.rack_id,
+                    # Health badge straight from the maintained counter
+                    "open_case_count": tank.open_case_count,
+                    "has_open_cases": tank.open_case_count > 0,
                     "subdivisions": []
                 }
                 
@@ -219,7 +249,7 @@ def update_rack_row_config(rack_id):
         print("Backend: Received request data:", data)
         print("Backend: Rack ID:", rack_id)
         
-        rack = RackModel.query.get_or_404(rack_id)
+        rack = RackModel.query.filter_by(id=rack_id, deleted_at=None).first_or_404()
         print("Backend: Found rack:", {
             'id': rack.id,
             'name': rack.name,
@@ -281,7 +311,7 @@ def create_tank():
         facility_id = get_current_facility_id()
         
         # Verify the rack belongs to the current facility
-        rack = RackModel.query.get_or_404(data['rack_id'])
+        rack = RackModel.query.filter_by(id=data['rack_id'], deleted_at=None).first_or_404()
         if facility_id and rack.facility_id != facility_id:
             return jsonify({"message": "You can only create tanks in your facility's racks"}), 403
         
@@ -302,6 +332,15 @@ def create_tank():
             new_tank.subdivisions.append(sub)
         
         db.session.add(new_tank)
+        
+        if data.get('parent_cross_id'):
+            parent_cross = cross_for_facility(data['parent_cross_id'], facility_id)
+            if not parent_cross:
+                db.session.rollback()
+                return jsonify({'message': 'Parent cross not found'}), 404
+            db.session.flush()
+            set_parent_cross(new_tank, parent_cross)
+        
         db.session.commit()
         
         return jsonify({
@@ -311,6 +350,7 @@ def create_tank():
             'line': new_tank.line,
             'dob': new_tank.dob.isoformat() if new_tank.dob else None,
             'color': new_tank.color,
+            'parent_cross_id': new_tank.parent_cross_id,
             'subdivisions': [{
                 'gender': sub.gender.value,
                 'count': sub.count
@@ -338,6 +378,18 @@ def update_tank(tank_id):
             tank.dob = datetime.strptime(data['dob'], '%Y-%m-%d').date() if data.get('dob') else None
         if 'color' in data:  # Add this block
             tank.color = data.get('color')
+        if 'parent_cross_id' in data:
+            parent_cross = None
+            if data['parent_cross_id']:
+                parent_cross = cross_for_facility(data['parent_cross_id'], get_current_facility_id())
+                if not parent_cross:
+                    db.session.rollback()
+                    return jsonify({'message': 'Parent cross not found'}), 404
+            try:
+                set_parent_cross(tank, parent_cross)
+            except ValueError as e:
+                db.session.rollback()
+                return jsonify({'message': str(e)}), 400
         
         # Update subdivisions
         if 'subdivisions' in data:
@@ -358,6 +410,7 @@ def update_tank(tank_id):
             'line': tank.line,
             'dob': tank.dob.isoformat() if tank.dob else None,
             'color': tank.color,  # Include color in response
+            'parent_cross_id': tank.parent_cross_id,
             'subdivisions': [{
                 'gender': sub.gender.value,
                 'count': sub.count
@@ -374,7 +427,7 @@ def update_tank(tank_id):
 def update_tank_position(tank_id):
     data = request.json
     tank = TankModel.query.get_or_404(tank_id)
-    tank.position = data['position']
+    record_move(tank, tank.rack_id, data['position'])
     db.session.commit()
     return jsonify({'message': 'Tank position updated'})
 
@@ -389,27 +442,8 @@ def move_tank(tank_id):
         with db.session.begin_nested():
             tank = TankModel.query.get_or_404(tank_id)
             
-            # Close current position history entry
-            current_position = TankPositionHistoryModel.query.filter_by(
-                tank_id=tank_id, 
-                end_date=None
-            ).first()
-            
-            if current_position:
-                current_position.end_date = datetime.utcnow()
-            
-            # Create new position history entry
-            new_position_history = TankPositionHistoryModel(
-                tank_id=tank_id,
-                position=new_position,
-                rack_id=new_rack_id,
-                start_date=datetime.utcnow()
-            )
-            db.session.add(new_position_history)
-            
-            # Update tank
-            tank.rack_id = new_rack_id
-            tank.position = new_position
+            # Close the current position history entry and open the new one
+            record_move(tank, new_rack_id, new_position)
             
         db.session.commit()
         return jsonify({'message': 'Tank moved successfully'}), 200
@@ -418,16 +452,222 @@ def move_tank(tank_id):
         db.session.rollback()
         return jsonify({'message': str(e)}), 400
 
+@app.route('/api/tanks/bulk-move', methods=['POST'])
+@jwt_required()
+def bulk_move_tanks():
+    try:
+        data = request.json or {}
+        facility_id = get_current_facility_id()
+        moves = data.get('moves', [])
+        
+        if not isinstance(moves, list) or not moves:
+            return jsonify({'message': 'moves must be a non-empty list of {tank_id, rack_id, position}'}), 400
+        
+        tank_ids = [move['tank_id'] for move in moves]
+        if len(set(tank_ids)) != len(tank_ids):
+            return jsonify({'message': 'Each tank can only be moved once per request'}), 400
+        
+        # Load every tank and target rack in one query each
+        tank_query = TankModel.query.join(RackModel).filter(TankModel.id.in_(tank_ids))
+        rack_query = RackModel.query.filter(
+            RackModel.id.in_({move['rack_id'] for move in moves}), RackModel.deleted_at.is_(None)
+        )
+        if facility_id is not None:
+            tank_query = tank_query.filter(RackModel.facility_id == facility_id)
+            rack_query = rack_query.filter(RackModel.facility_id == facility_id)
+        tanks = {tank.id: tank for tank in tank_query.all()}
+        rack_ids = {rack.id for rack in rack_query.all()}
+        
+        missing_tanks = set(tank_ids) - set(tanks)
+        if missing_tanks:
+            return jsonify({'message': f'Tanks not found: {sorted(missing_tanks)}'}), 404
+        missing_racks = {move['rack_id'] for move in moves} - rack_ids
+        if missing_racks:
+            return jsonify({'message': f'Racks not found: {sorted(missing_racks)}'}), 404
+        
+        record_moves([(tanks[move['tank_id']], move['rack_id'], move['position']) for move in moves])
+        db.session.commit()
+        
+        return jsonify({'message': f'{len(moves)} tanks moved successfully'}), 200
+        
+    except KeyError as e:
+        db.session.rollback()
+        return jsonify({'message': f'Missing field in move: {str(e)}'}), 400
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error moving tanks: {str(e)}")
+        return jsonify({'message': str(e)}), 500
+
+@app.route('/api/tanks/<int:tank_id>/availability', methods=['GET'])
+@jwt_required()
+def get_tank_availability(tank_id):
+    try:
+        facility_id = get_current_facility_id()
+        date_str = request.args.get('date')
+        if not date_str:
+            return jsonify({'message': 'date is required'}), 400
+        breeding_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+        
+        stock = tank_fish_counts([tank_id], facility_id).get(tank_id)
+        if stock is None:
+            return jsonify({'message': 'Tank not found'}), 404
+        reserved = reserved_on([tank_id], breeding_date).get(tank_id, {'males': 0, 'females': 0})
+        
+        return jsonify({
+            'tank_id': tank_id,
+            'date': breeding_date.isoformat(),
+            'total': stock,
+            'reserved': reserved,
+            'available': {
+                gender: max(stock[gender] - reserved[gender], 0)
+                for gender in ('males', 'females')
+            }
+        }), 200
+        
+    except ValueError:
+        return jsonify({'message': 'date must be in YYYY-MM-DD format'}), 400
+    except Exception as e:
+        print(f"Error getting tank availability: {str(e)}")
+        return jsonify({'message': str(e)}), 500
+
+MAX_POSITION_LOOKUPS = 5000
+
+@app.route('/api/tanks/positions-at', methods=['POST'])
+@jwt_required()
+def get_tank_positions_at():
+    try:
+        data = request.json or {}
+        facility_id = get_current_facility_id()
+        pairs = data.get('pairs', [])
+        
+        if not isinstance(pairs, list) or not pairs:
+            return jsonify({'message': 'pairs must be a non-empty list of {tank_id, at}'}), 400
+        if len(pairs) > MAX_POSITION_LOOKUPS:
+            return jsonify({'message': f'At most {MAX_POSITION_LOOKUPS} pairs can be resolved per request'}), 400
+        
+        try:
+            lookups = [(int(pair['tank_id']), datetime.fromisoformat(pair['at'])) for pair in pairs]
+        except (KeyError, TypeError, ValueError):
+            return jsonify({'message': 'Each pair needs an integer tank_id and an ISO date or timestamp in at'}), 400
+        
+        # Only resolve tanks that belong to the caller's facility
+        tank_ids = {tank_id for tank_id, _ in lookups}
+        tank_query = db.session.query(TankModel.id).join(RackModel).filter(TankModel.id.in_(tank_ids))
+        if facility_id is not None:
+            tank_query = tank_query.filter(RackModel.facility_id == facility_id)
+        missing = tank_ids - {row.id for row in tank_query.all()}
+        if missing:
+            return jsonify({'message': f'Tanks not found: {sorted(missing)}'}), 404
+        
+        resolved = resolve_positions(lookups)
+        
+        return jsonify({
+            'results': [{
+                'tank_id': tank_id,
+                'at': pair['at'],
+                'position': interval.position if interval else None,
+                'rack_id': interval.rack_id if interval else None
+            } for pair, (tank_id, _), interval in zip(pairs, lookups, resolved)]
+        }), 200
+        
+    except Exception as e:
+        print(f"Error resolving tank positions: {str(e)}")
+        return jsonify({'message': str(e)}), 500
+
+@app.route('/api/racks/<int:rack_id>/layout', methods=['GET'])
+@jwt_required()
+def get_rack_layout(rack_id):
+    try:
+        facility_id = get_current_facility_id()
+        rack = RackModel.query.get_or_404(rack_id)
+        
+        if facility_id and rack.facility_id != facility_id:
+            return jsonify({"message": "Access denied to this rack"}), 403
+        
+        at_str = request.args.get('at')
+        try:
+            at = datetime.fromisoformat(at_str) if at_str else datetime.utcnow()
+        except ValueError:
+            return jsonify({'message': 'at must be an ISO date or timestamp'}), 400
+        
+        layout, snapshot_at = layout_at(rack_id, at)
+        
+        return jsonify({
+            'rack_id': rack.id,
+            'at': at.isoformat(),
+            'snapshot_at': snapshot_at.isoformat() if snapshot_at else None,
+            'layout': layout
+        }), 200
+        
+    except Exception as e:
+        print(f"Error getting rack layout: {str(e)}")
+        return jsonify({'message': str(e)}), 500
+
+@app.route('/api/tanks/<int:tank_id>/ancestors', methods=['GET'])
+@jwt_required()
+def get_tank_ancestors(tank_id):
+    return _tank_relatives(tank_id, get_ancestors)
+
+@app.route('/api/tanks/<int:tank_id>/descendants', methods=['GET'])
+@jwt_required()
+def get_tank_descendants(tank_id):
+    return _tank_relatives(tank_id, get_descendants)
+
+def _tank_relatives(tank_id, lookup):
+    try:
+        tank = TankModel.query.get_or_404(tank_id)
+        facility_id = get_current_facility_id()
+        if facility_id and tank.rack.facility_id != facility_id:
+            return jsonify({'message': 'Tank not found'}), 404
+        
+        return jsonify([{
+            'id': relative.id,
+            'depth': depth,
+            'line': relative.line,
+            'position': relative.position,
+            'rack_id': relative.rack_id,
+            'dob': relative.dob.isoformat() if relative.dob else None,
+            'parent_cross_id': relative.parent_cross_id
+        } for relative, depth in lookup(tank_id)]), 200
+    except Exception as e:
+        print(f"Error fetching pedigree for tank {tank_id}: {str(e)}")
+        return jsonify({'message': str(e)}), 500
+
+@app.route('/api/pedigree/graph', methods=['GET'])
+@jwt_required()
+def export_pedigree_graph():
+    try:
+        facility_id = get_current_facility_id()
+        tank_id = request.args.get('tank_id', type=int)
+        if tank_id is not None:
+            tank = TankModel.query.get_or_404(tank_id)
+            if facility_id and tank.rack.facility_id != facility_id:
+                return jsonify({'message': 'Tank not found'}), 404
+        
+        graph = lineage_graph(facility_id, tank_id)
+        if request.args.get('format') == 'dot':
+            response = make_response(graph_to_dot(graph))
+            response.headers['Content-Type'] = 'text/vnd.graphviz; charset=utf-8'
+            return response
+        return jsonify(graph), 200
+    except Exception as e:
+        print(f"Error exporting pedigree graph: {str(e)}")
+        return jsonify({'message': str(e)}), 500
+
 @app.route('/api/racks/<int:rack_id>', methods=['DELETE'])
 @jwt_required()
 def delete_rack(rack_id):
     try:
-        rack = RackModel.query.get_or_404(rack_id)
-        # Delete all tanks and their subdivisions first
+        rack = RackModel.query.filter_by(id=rack_id, deleted_at=None).first_or_404()
+        # Delete its tanks the way delete_tank does, keeping their position history
+        now = datetime.utcnow()
         for tank in rack.tanks:
             SubdivisionModel.query.filter_by(tank_id=tank.id).delete()
-        TankModel.query.filter_by(rack_id=rack_id).delete()
-        db.session.delete(rack)
+            retire_tank(tank, at=now)
+            adjust_open_cases(tank.id, -tank.open_case_count)
+            db.session.delete(tank)
+        # The history still points at the rack, so it is only marked deleted
+        rack.deleted_at = now
         db.session.commit()
         return jsonify({'message': 'Rack deleted successfully'}), 200
     except Exception as e:
@@ -444,6 +684,11 @@ def delete_tank(tank_id):
         # Delete all subdivisions first
         SubdivisionModel.query.filter_by(tank_id=tank_id).delete()
         
+        # Keep its position history so past rack layouts still show it
+        retire_tank(tank)
+        # Its open cases no longer count towards the rack
+        adjust_open_cases(tank.id, -tank.open_case_count)
+        
         # Then delete the tank
         db.session.delete(tank)
         db.session.commit()
@@ -609,39 +854,11 @@ def swap_tank_positions():
         if size1 != size2:
             return jsonify({'message': 'Cannot swap tanks of different sizes'}), 400
         
-        # SIMPLIFIED VERSION: Only swap essential properties
-        # Store tank1 values
-        temp_position = tank1.position
-        temp_rack_id = tank1.rack_id
-        
-        # Update tank positions
-        tank1.position = tank2.position
-        tank1.rack_id = tank2.rack_id
-        
-        tank2.position = temp_position
-        tank2.rack_id = temp_rack_id
-        
-        # Track position history
-        now = datetime.utcnow()
-        
-        # Record tank1's new position
-        history1 = TankPositionHistoryModel(
-            tank_id=tank1.id,
-            position=tank1.position,
-            rack_id=tank1.rack_id,
-            start_date=now
-        )
-        
-        # Record tank2's new position
-        history2 = TankPositionHistoryModel(
-            tank_id=tank2.id,
-            position=tank2.position,
-            rack_id=tank2.rack_id,
-            start_date=now
-        )
-        
-        db.session.add(history1)
-        db.session.add(history2)
+        # Swap positions, closing each tank's open history entry
+        record_moves([
+            (tank1, tank2.rack_id, tank2.position),
+            (tank2, tank1.rack_id, tank1.position)
+        ])
         
         db.session.commit()
         return jsonify({'message': 'Tank positions swapped successfully'})
@@ -734,6 +951,8 @@ def update_profile(profile_id):
         
         if 'name' in data:
             profile.name = data['name']
+            # Plan events in the calendar feed are titled with the profile name
+            bump_calendar_version(profile.facility_id)
             
         db.session.commit()
         return jsonify({
@@ -746,6 +965,26 @@ def update_profile(profile_id):
         return jsonify({'message': str(e)}), 400
 
 # Breeding plan endpoints
+def serialize_cross(cross):
+    return {
+        'id': cross.id,
+        'tank1_id': cross.tank1_id,
+        'tank2_id': cross.tank2_id,
+        'tank1_males': cross.tank1_males,
+        'tank1_females': cross.tank1_females,
+        'tank2_males': cross.tank2_males,
+        'tank2_females': cross.tank2_females,
+        'breeding_result': cross.breeding_result
+    }
+
+def serialize_plan(plan):
+    return {
+        'id': plan.id,
+        'breeding_date': plan.breeding_date.isoformat(),
+        'created_at': plan.created_at.isoformat(),
+        'crosses': [serialize_cross(cross) for cross in plan.crosses]
+    }
+
 @app.route('/api/breeding/plans', methods=['GET'])
 @jwt_required()
 def get_plans():
@@ -759,56 +998,76 @@ def get_plans():
     if facility_id and profile.facility_id != facility_id:
         return jsonify({"message": "Access denied to this breeding profile"}), 403
     
-    # Get plans for the profile
-    plans = BreedingPlanModel.query.filter_by(profile_id=profile_id).all()
+    headers_only = request.args.get('headers_only', '').lower() in ('1', 'true')
     
-    return jsonify([{
-        'id': plan.id,
-        'breeding_date': plan.breeding_date.isoformat(),
-        'created_at': plan.created_at.isoformat(),
-        'crosses': [{
-            'id': cross.id,
-            'tank1_id': cross.tank1_id,
-            'tank2_id': cross.tank2_id,
-            'tank1_males': cross.tank1_males,
-            'tank1_females': cross.tank1_females,
-            'tank2_males': cross.tank2_males,
-            'tank2_females': cross.tank2_females,
-            'breeding_result': cross.breeding_result
-        } for cross in plan.crosses]
-    } for plan in plans])
+    try:
+        if headers_only:
+            # Plan headers with cross counts from one GROUP BY, no crosses loaded
+            query = db.session.query(
+                BreedingPlanModel.id,
+                BreedingPlanModel.breeding_date,
+                BreedingPlanModel.created_at,
+                db.func.count(CrossModel.id).label('cross_count')
+            ).outerjoin(
+                CrossModel, CrossModel.plan_id == BreedingPlanModel.id
+            ).group_by(BreedingPlanModel.id)
+        else:
+            query = BreedingPlanModel.query.options(selectinload(BreedingPlanModel.crosses))
+        query = query.filter(BreedingPlanModel.profile_id == profile.id)\
+            .order_by(BreedingPlanModel.breeding_date.desc(), BreedingPlanModel.id.desc())
+        
+        # Without a limit every plan is returned, as before; with one, keyset
+        # pagination on (breeding_date, id), newest first
+        limit = None
+        if request.args.get('limit'):
+            limit = page_size(request.args.get('limit'))
+            if request.args.get('cursor'):
+                cursor_date, cursor_id = decode_cursor(request.args['cursor'], date, int)
+                query = query.filter(keyset_after(
+                    [BreedingPlanModel.breeding_date, BreedingPlanModel.id],
+                    [cursor_date, cursor_id],
+                    descending=True
+                ))
+            query = query.limit(limit + 1)
+        plans = query.all()
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    has_more = limit is not None and len(plans) > limit
+    if has_more:
+        plans = plans[:limit]
+    
+    if headers_only:
+        response = jsonify([{
+            'id': plan.id,
+            'breeding_date': plan.breeding_date.isoformat(),
+            'created_at': plan.created_at.isoformat(),
+            'cross_count': plan.cross_count
+        } for plan in plans])
+    else:
+        response = jsonify([serialize_plan(plan) for plan in plans])
+    if has_more:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(plans[-1].breeding_date, plans[-1].id)
+    return response
 
 @app.route('/api/breeding/plans', methods=['POST'])
 @jwt_required()
 def create_plan():
     data = request.json
+    facility_id = get_current_facility_id()
+    breeding_date = datetime.strptime(data['breeding_date'], '%Y-%m-%d').date()
     
-    # Validate fish counts
-    for cross in data['crosses']:
-        tank1 = TankModel.query.get_or_404(cross['tank1']['id'])
-        tank2 = TankModel.query.get_or_404(cross['tank2']['id'])
-        
-        # Get available fish counts
-        tank1_fish = {
-            'males': sum(s.count for s in tank1.subdivisions if s.gender == GenderEnum.MALE),
-            'females': sum(s.count for s in tank1.subdivisions if s.gender == GenderEnum.FEMALE)
-        }
-        tank2_fish = {
-            'males': sum(s.count for s in tank2.subdivisions if s.gender == GenderEnum.MALE),
-            'females': sum(s.count for s in tank2.subdivisions if s.gender == GenderEnum.FEMALE)
-        }
-        
-        # Validate counts
-        if (cross['tank1']['males'] > tank1_fish['males'] or
-            cross['tank1']['females'] > tank1_fish['females'] or
-            cross['tank2']['males'] > tank2_fish['males'] or
-            cross['tank2']['females'] > tank2_fish['females']):
-            return jsonify({'message': 'Insufficient fish in tanks'}), 400
+    # Validate fish counts for every tank at once, net of other plans on the same date
+    missing, shortages = validate_fish_availability(data['crosses'], breeding_date, facility_id)
+    if missing:
+        return jsonify({'message': f'Tanks not found: {missing}'}), 404
+    if shortages:
+        return jsonify({'message': 'Insufficient fish in tanks', 'shortages': shortages}), 400
     
     # Create plan and crosses
     plan = BreedingPlanModel(
         profile_id=data['profile_id'],
-        breeding_date=datetime.strptime(data['breeding_date'], '%Y-%m-%d').date()
+        breeding_date=breeding_date
     )
     db.session.add(plan)
     db.session.flush()  # Add this line to get plan.id before creating crosses
@@ -826,7 +1085,11 @@ def create_plan():
         )
         db.session.add(cross)
     
+    adjust_reservations([(breeding_date, cross_uses(data['crosses']), 1)])
+    bump_calendar_version(facility_id)
+    
     db.session.commit()
+    invalidate_breeding_analytics(facility_id)
     return jsonify({'id': plan.id}), 201
 
 @app.route('/api/breeding/plans/<int:plan_id>', methods=['DELETE'])
@@ -835,12 +1098,22 @@ def delete_plan(plan_id):
     try:
         plan = BreedingPlanModel.query.get_or_404(plan_id)
         
+        # Crosses with recorded offspring hold the pedigree together
+        linked = crosses_with_offspring([cross.id for cross in plan.crosses])
+        if linked:
+            return jsonify({'message': 'Crosses have offspring tanks linked to them', 'cross_ids': linked}), 409
+        
+        # Release the fish this plan had reserved
+        adjust_reservations([(plan.breeding_date, cross_uses(plan.crosses), -1)])
+        
         # Delete all crosses associated with this plan
         CrossModel.query.filter_by(plan_id=plan_id).delete()
         
         # Delete the plan
         db.session.delete(plan)
+        bump_calendar_version(get_current_facility_id())
         db.session.commit()
+        invalidate_breeding_analytics(get_current_facility_id())
         
         return jsonify({'message': 'Breeding plan deleted successfully'}), 200
     except Exception as e:
@@ -854,12 +1127,31 @@ def update_plan(plan_id):
     
     try:
         plan = BreedingPlanModel.query.get_or_404(plan_id)
+        old_date = plan.breeding_date
+        old_uses = cross_uses(plan.crosses)
+        new_uses = old_uses
         
         # Update breeding date if provided
         if 'breeding_date' in data:
             plan.breeding_date = datetime.strptime(data['breeding_date'], '%Y-%m-%d').date()
         
+        # Moving the plan to another date needs its fish free on that date too
+        if 'crosses' in data or plan.breeding_date != old_date:
+            missing, shortages = validate_fish_availability(
+                data['crosses'] if 'crosses' in data else plan.crosses,
+                plan.breeding_date, get_current_facility_id(),
+                credit=old_uses if plan.breeding_date == old_date else None
+            )
+            if missing:
+                return jsonify({'message': f'Tanks not found: {missing}'}), 404
+            if shortages:
+                return jsonify({'message': 'Insufficient fish in tanks', 'shortages': shortages}), 400
+        
         if 'crosses' in data:
+            linked = crosses_with_offspring([cross.id for cross in plan.crosses])
+            if linked:
+                return jsonify({'message': 'Crosses have offspring tanks linked to them', 'cross_ids': linked}), 409
+            
             # Delete existing crosses
             CrossModel.query.filter_by(plan_id=plan_id).delete()
             
@@ -876,8 +1168,14 @@ def update_plan(plan_id):
                     breeding_result=cross_data.get('breedingResult')  # Add this line
                 )
                 db.session.add(cross)
+            new_uses = cross_uses(data['crosses'])
+        
+        # Move this plan's reservations to its new date and crosses
+        adjust_reservations([(old_date, old_uses, -1), (plan.breeding_date, new_uses, 1)])
+        bump_calendar_version(get_current_facility_id())
                 
         db.session.commit()
+        invalidate_breeding_analytics(get_current_facility_id())
         return jsonify({'message': 'Plan updated successfully'}), 200
     except Exception as e:
         db.session.rollback()
@@ -895,6 +1193,7 @@ def update_cross(cross_id):
             cross.breeding_result = data['breedingResult']
         
         db.session.commit()
+        invalidate_breeding_analytics(get_current_facility_id())
         return jsonify({'message': 'Cross updated successfully'}), 200
     except Exception as e:
         db.session.rollback()
@@ -929,80 +1228,119 @@ def get_plan(plan_id):
 @app.route('/api/breeding/plans/search', methods=['POST'])
 @jwt_required()
 def search_breeding_plans():
-    data = request.json
-    query = BreedingPlanModel.query
-    
-    # Filter by profile ID
-    if 'profile_id' in data:
-        query = query.filter(BreedingPlanModel.profile_id == data['profile_id'])
-    
-    # Filter by date range
-    if 'dateFrom' in data and data['dateFrom']:
-        start_date = datetime.strptime(data['dateFrom'], '%Y-%m-%d').date()
-        query = query.filter(BreedingPlanModel.breeding_date >= start_date)
-    
-    if 'dateTo' in data and data['dateTo']:
-        end_date = datetime.strptime(data['dateTo'], '%Y-%m-%d').date()
-        query = query.filter(BreedingPlanModel.breeding_date <= end_date)
-    
-    # Get all plans that match the initial filters
-    plans = query.all()
-    
-    # Further filter by tank properties or breeding result
-    filtered_plans = []
-    for plan in plans:
-        # Skip filtering if no additional filters
-        if not (data.get('tankLine') or data.get('tankPosition') or 'breedingResult' in data):
-            filtered_plans.append(plan)
-            continue
-            
-        # Check each cross in the plan
-        for cross in plan.crosses:
-            tank1 = TankModel.query.get(cross.tank1_id)
-            tank2 = TankModel.query.get(cross.tank2_id)
-            
-            # Check if the tanks match the line filter
-            if data.get('tankLine'):
-                if not ((tank1 and tank1.line == data['tankLine']) or 
-                        (tank2 and tank2.line == data['tankLine'])):
-                    continue
-            
-            # Check if the tanks match the position filter
-            if data.get('tankPosition'):
-                if not ((tank1 and tank1.position == data['tankPosition']) or 
-                        (tank2 and tank2.position == data['tankPosition'])):
-                    continue
-            
-            # Check if breeding result matches
-            if 'breedingResult' in data and data['breedingResult']:
-                if data['breedingResult'] == 'null':
-                    if cross.breeding_result is not None:
-                        continue
-                else:
-                    breeding_result = data['breedingResult'] == 'true'
-                    if cross.breeding_result != breeding_result:
-                        continue
-            
-            # If we get here, this plan has a cross that matches all filters
-            filtered_plans.append(plan)
-            break  # No need to check other crosses in this plan
-            
-    # Format the plans for response
-    return jsonify([{
-        'id': plan.id,
-        'breeding_date': plan.breeding_date.isoformat(),
-        'created_at': plan.created_at.isoformat(),
-        'crosses': [{
-            'id': cross.id,
-            'tank1_id': cross.tank1_id,
-            'tank2_id': cross.tank2_id,
-            'tank1_males': cross.tank1_males,
-            'tank1_females': cross.tank1_females,
-            'tank2_males': cross.tank2_males,
-            'tank2_females': cross.tank2_females,
-            'breeding_result': cross.breeding_result
-        } for cross in plan.crosses]
-    } for plan in filtered_plans])
+    try:
+        data = request.json or {}
+        facility_id = get_current_facility_id()
+        
+        query = search_plans_query(facility_id, data)\
+            .options(selectinload(BreedingPlanModel.crosses))\
+            .order_by(BreedingPlanModel.breeding_date.desc(), BreedingPlanModel.id.desc())
+        
+        # Without a limit every matching plan is returned, as before; with
+        # one, keyset pagination on (breeding_date, id), newest first
+        limit = None
+        if data.get('limit'):
+            limit = page_size(data.get('limit'))
+            if data.get('cursor'):
+                cursor_date, cursor_id = decode_cursor(data['cursor'], date, int)
+                query = query.filter(keyset_after(
+                    [BreedingPlanModel.breeding_date, BreedingPlanModel.id],
+                    [cursor_date, cursor_id],
+                    descending=True
+                ))
+            query = query.limit(limit + 1)
+        plans = query.all()
+        
+        has_more = limit is not None and len(plans) > limit
+        if has_more:
+            plans = plans[:limit]
+        
+        response = jsonify([serialize_plan(plan) for plan in plans])
+        if has_more:
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor(plans[-1].breeding_date, plans[-1].id)
+        return response
+        
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        print(f"Error searching breeding plans: {str(e)}")
+        return jsonify({'message': str(e)}), 500
+
+@app.route('/api/breeding/analytics', methods=['GET'])
+@jwt_required()
+def get_breeding_analytics_route():
+    try:
+        facility_id = get_current_facility_id()
+        return jsonify(get_breeding_analytics(facility_id)), 200
+    except Exception as e:
+        print(f"Error computing breeding analytics: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'message': str(e)}), 500
+
+@app.route('/api/breeding/capacity', methods=['GET'])
+@jwt_required()
+def get_breeding_capacity():
+    try:
+        try:
+            start_date = datetime.strptime(request.args['start'], '%Y-%m-%d').date() \
+                if request.args.get('start') else date.today()
+            days = int(request.args.get('days', 7))
+            fish_per_request = int(request.args.get('fish_per_request', 1))
+        except ValueError:
+            return jsonify({'message': 'Invalid start, days or fish_per_request'}), 400
+        if not 1 <= days <= MAX_PLANNER_DAYS:
+            return jsonify({'message': f'days must be between 1 and {MAX_PLANNER_DAYS}'}), 400
+        if fish_per_request < 1:
+            return jsonify({'message': 'fish_per_request must be positive'}), 400
+        
+        return jsonify({
+            'start': start_date.isoformat(),
+            'days': plan_capacity(get_current_facility_id(), start_date, days, fish_per_request)
+        }), 200
+    except Exception as e:
+        print(f"Error computing breeding capacity: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'message': str(e)}), 500
+
+@app.route('/api/breeding/suggest-pairs', methods=['POST'])
+@jwt_required()
+def suggest_breeding_pairs():
+    try:
+        data = request.get_json() or {}
+        targets = data.get('targets') or []
+        if not data.get('date') or not targets:
+            return jsonify({'message': 'date and targets are required'}), 400
+
+        try:
+            breeding_date = date.fromisoformat(data['date'])
+            max_fish = int(data.get('max_fish', DEFAULT_MAX_FISH))
+            min_rest_days = int(data.get('min_rest_days', 0))
+        except (TypeError, ValueError):
+            return jsonify({'message': 'Invalid date, max_fish or min_rest_days'}), 400
+        if max_fish < 1 or min_rest_days < 0:
+            return jsonify({'message': 'max_fish must be positive and min_rest_days not negative'}), 400
+
+        for target in targets:
+            if not isinstance(target, dict) or not target.get('line'):
+                return jsonify({'message': 'Each target needs a line'}), 400
+            try:
+                if int(target.get('crosses', 0)) < 1:
+                    raise ValueError
+            except (TypeError, ValueError):
+                return jsonify({'message': 'Each target needs a positive number of crosses'}), 400
+
+        suggestions = suggest_pairs(
+            targets, breeding_date, get_current_facility_id(),
+            max_fish=max_fish, min_rest_days=min_rest_days
+        )
+        return jsonify(suggestions), 200
+    except Exception as e:
+        print(f"Error suggesting breeding pairs: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'message': str(e)}), 500
 
 @app.route('/api/breeding/tank-history/<int:tank_id>', methods=['GET'])
 @jwt_required()
@@ -1012,6 +1350,7 @@ def get_tank_breeding_history(tank_id):
         
         # Get position history - ensure it's ordered by start_date
         position_history = TankPositionHistoryModel.query.filter_by(tank_id=tank_id)\
+            .options(joinedload(TankPositionHistoryModel.rack))\
             .order_by(TankPositionHistoryModel.start_date).all()
         
         if not position_history:
@@ -1028,59 +1367,19 @@ def get_tank_breeding_history(tank_id):
             # Fetch the newly created position history
             position_history = [current_position]
         
-        # Find all crosses that involve this tank
-        crosses_as_tank1 = CrossModel.query.filter_by(tank1_id=tank_id).all()
-        crosses_as_tank2 = CrossModel.query.filter_by(tank2_id=tank_id).all()
+        position_index = PositionIntervalIndex(position_history)
         
-        # Initialize breeding history
+        # Load every cross involving this tank, with its plan, in a single query
         breeding_history = []
-        
-        # Process crosses where this tank was tank1
-        for cross in crosses_as_tank1:
-            plan = BreedingPlanModel.query.get(cross.plan_id)
-            if not plan:
-                continue
-                
-            position = tank.position  # Default position
-            
-            # Find the appropriate historical position for this breeding date
-            for ph in position_history:
-                start_date = ph.start_date.date()
-                end_date = ph.end_date.date() if ph.end_date else datetime.now().date()
-                
-                if start_date <= plan.breeding_date <= end_date:
-                    position = ph.position
-                    break
-            
-            breeding_history.append({
-                'date': plan.breeding_date.isoformat(),
-                'males_used': cross.tank1_males,
-                'females_used': cross.tank1_females,
-                'breeding_result': cross.breeding_result,
-                'position': position
-            })
-        
-        # Process crosses where this tank was tank2
-        for cross in crosses_as_tank2:
-            plan = BreedingPlanModel.query.get(cross.plan_id)
-            if not plan:
-                continue
-                
-            position = tank.position  # Default position
-            
+        for cross in get_tank_crosses(tank_id):
             # Find the appropriate historical position for this breeding date
-            for ph in position_history:
-                start_date = ph.start_date.date()
-                end_date = ph.end_date.date() if ph.end_date else datetime.now().date()
-                
-                if start_date <= plan.breeding_date <= end_date:
-                    position = ph.position
-                    break
+            interval = position_index.position_at(tank_id, cross.breeding_date)
+            position = interval.position if interval else tank.position
             
             breeding_history.append({
-                'date': plan.breeding_date.isoformat(),
-                'males_used': cross.tank2_males,
-                'females_used': cross.tank2_females,
+                'date': cross.breeding_date.isoformat(),
+                'males_used': cross.males_used,
+                'females_used': cross.females_used,
                 'breeding_result': cross.breeding_result,
                 'position': position
             })
@@ -1113,38 +1412,22 @@ def get_tank_breeding_history(tank_id):
 @jwt_required()
 def debug_tank_breeding_history(tank_id):
     try:
-        # Get all crosses involving this tank
-        crosses_as_tank1 = CrossModel.query.filter_by(tank1_id=tank_id).all()
-        crosses_as_tank2 = CrossModel.query.filter_by(tank2_id=tank_id).all()
-        
         tank1_data = []
         tank2_data = []
         
-        # Get details for crosses where this was tank1
-        for cross in crosses_as_tank1:
-            plan = BreedingPlanModel.query.get(cross.plan_id)
-            if plan:
-                tank1_data.append({
-                    'cross_id': cross.id,
-                    'plan_id': cross.plan_id,
-                    'breeding_date': plan.breeding_date.isoformat(),
-                    'result': cross.breeding_result,
-                    'males_used': cross.tank1_males,
-                    'females_used': cross.tank1_females
-                })
-        
-        # Get details for crosses where this was tank2
-        for cross in crosses_as_tank2:
-            plan = BreedingPlanModel.query.get(cross.plan_id)
-            if plan:
-                tank2_data.append({
-                    'cross_id': cross.id,
-                    'plan_id': cross.plan_id,
-                    'breeding_date': plan.breeding_date.isoformat(),
-                    'result': cross.breeding_result,
-                    'males_used': cross.tank2_males,
-                    'females_used': cross.tank2_females
-                })
+        for cross in get_tank_crosses(tank_id):
+            cross_data = {
+                'cross_id': cross.cross_id,
+                'plan_id': cross.plan_id,
+                'breeding_date': cross.breeding_date.isoformat(),
+                'result': cross.breeding_result,
+                'males_used': cross.males_used,
+                'females_used': cross.females_used
+            }
+            if cross.role == TANK1_ROLE:
+                tank1_data.append(cross_data)
+            else:
+                tank2_data.append(cross_data)
         
         return jsonify({
             'tank_id': tank_id,
@@ -1159,15 +1442,50 @@ def debug_tank_breeding_history(tank_id):
 
 def get_tank_position_at_date(tank_id, date):
     """Helper function to get the tank position at a specific date"""
-    position_record = TankPositionHistoryModel.query.filter_by(tank_id=tank_id)\
-        .filter(TankPositionHistoryModel.start_date <= date)\
-        .filter(or_(TankPositionHistoryModel.end_date >= date, TankPositionHistoryModel.end_date == None))\
-        .first()
+    position_record = position_at(tank_id, date)
     
     if position_record:
         return position_record.position
     return None
 
+# Breeding calendar endpoints
+CALENDAR_STREAM_BATCH_SIZE = 500
+
+def serialize_calendar_entry(entry):
+    return {
+        'id': entry.id,
+        'date': entry.date.isoformat() if entry.date else None,
+        'username': entry.username,
+        'request_type': entry.request_type,
+        'fish_age': entry.fish_age,
+        'notes': entry.notes,
+        'created_at': entry.created_at.isoformat() if entry.created_at else None
+    }
+
+@app.route('/api/breeding/calendar/summary', methods=['GET'])
+@jwt_required()
+def get_calendar_summary():
+    """Per-day counts for a month view; fetch a clicked day's rows with
+    /api/breeding/calendar/<date>?end_date=<date>."""
+    try:
+        month = request.args.get('month')
+        if not month:
+            return jsonify({'message': 'month (YYYY-MM) is required'}), 400
+        try:
+            start_date, end_date = month_bounds(month)
+        except ValueError:
+            return jsonify({'message': 'month must be formatted as YYYY-MM'}), 400
+        
+        return jsonify({
+            'month': month,
+            'days': calendar_summary(get_current_facility_id(), start_date, end_date)
+        }), 200
+    except Exception as e:
+        print(f"Error fetching calendar summary: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'message': f'Server error: {str(e)}'}), 500
+
 @app.route('/api/breeding/calendar/<date>', methods=['GET'])
 @jwt_required()
 def get_calendar_data(date):
@@ -1193,18 +1511,10 @@ def get_calendar_data(date):
             
         calendar_entries = query.order_by(BreedingCalendarModel.date).all()
         
-        # Manually convert to dictionaries
-        result = []
-        for entry in calendar_entries:
-            result.append({
-                'id': entry.id,
-                'date': entry.date.isoformat() if entry.date else None,
-                'username': entry.username,
-                'request_type': entry.request_type,
-                'fish_age': entry.fish_age,
-                'notes': entry.notes,
-                'created_at': entry.created_at.isoformat() if entry.created_at else None
-            })
+        # Recurring requests are expanded only inside the requested window
+        result = [serialize_calendar_entry(entry) for entry in calendar_entries]
+        result += series_occurrences(facility_id, start_date.date(), end_date.date())
+        result.sort(key=lambda entry: entry['date'] or '')
         
         return jsonify(result)
     except Exception as e:
@@ -1240,6 +1550,7 @@ def add_breeding_request():
         )
         
         db.session.add(new_request)
+        bump_calendar_version(facility_id)
         db.session.commit()
         
         return jsonify({
@@ -1258,6 +1569,53 @@ def add_breeding_request():
 
 
 
+@app.route('/api/breeding/calendar-feed', methods=['GET', 'POST'])
+@jwt_required()
+def calendar_feed_token():
+    """GET returns the facility's feed token (creating it on first use);
+    POST with {"rotate": true} issues a new token and revokes the old one."""
+    try:
+        facility_id = get_current_facility_id()
+        if facility_id is None:
+            return jsonify({'message': 'No facility associated with this user'}), 400
+        
+        rotate = request.method == 'POST' and bool((request.get_json(silent=True) or {}).get('rotate'))
+        feed = get_or_create_feed(facility_id, rotate=rotate)
+        db.session.commit()
+        
+        return jsonify({
+            'token': feed.token,
+            'url': f"{request.host_url.rstrip('/')}/api/breeding/calendar-feed/{feed.token}.ics",
+            'version': feed.version
+        }), 200
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error creating calendar feed: {str(e)}")
+        return jsonify({'message': str(e)}), 500
+
+@app.route('/api/breeding/calendar-feed/<token>.ics', methods=['GET'])
+def calendar_feed(token):
+    # Calendar apps can't send a JWT, so the secret token is the credential
+    try:
+        feed = CalendarFeedModel.query.filter_by(token=token).first()
+        if not feed:
+            return jsonify({'message': 'Feed not found'}), 404
+        
+        etag = feed_etag(feed)
+        if request.if_none_match.contains(etag):
+            response = make_response('', 304)
+        else:
+            response = Response(
+                stream_with_context(feed_body(feed.facility_id, feed.version)),
+                mimetype='text/calendar'
+            )
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, max-age=300'
+        return response
+    except Exception as e:
+        print(f"Error serving calendar feed: {str(e)}")
+        return jsonify({'message': str(e)}), 500
+
 @app.route('/api/breeding/calendar/history', methods=['GET'])
 @jwt_required()
 def get_calendar_history():
@@ -1270,27 +1628,49 @@ def get_calendar_history():
             
         start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
         end_date = datetime.strptime(end_date_str, '%Y-%m-%d')
+        facility_id = get_current_facility_id()
         
-        # Use the ORM model instead of raw SQL
-        calendar_entries = BreedingCalendarModel.query.filter(
+        # Served by ix_breeding_calendar_facility_date
+        query = BreedingCalendarModel.query.filter(
             BreedingCalendarModel.date >= start_date,
             BreedingCalendarModel.date <= end_date
-        ).order_by(BreedingCalendarModel.date).all()
-        
-        # Manually convert to dictionaries
-        result = []
-        for entry in calendar_entries:
-            result.append({
-                'id': entry.id,
-                'date': entry.date.isoformat() if entry.date else None,
-                'username': entry.username,
-                'request_type': entry.request_type,
-                'fish_age': entry.fish_age,
-                'notes': entry.notes,
-                'created_at': entry.created_at.isoformat() if entry.created_at else None
-            })
-        
-        return jsonify(result)
+        )
+        if facility_id is not None:
+            query = query.filter_by(facility_id=facility_id)
+        query = query.order_by(BreedingCalendarModel.date, BreedingCalendarModel.id)
+        
+        # Long ranges (yearly reports): stream the same JSON array in batches
+        if request.args.get('stream', '').lower() in ('1', 'true'):
+            def generate():
+                yield '['
+                for i, entry in enumerate(query.yield_per(CALENDAR_STREAM_BATCH_SIZE)):
+                    yield (',' if i else '') + json.dumps(serialize_calendar_entry(entry))
+                yield ']'
+            return Response(stream_with_context(generate()), mimetype='application/json')
+        
+        # Keyset pagination on (date, id) when a limit is given
+        limit = None
+        if request.args.get('limit'):
+            limit = page_size(request.args.get('limit'))
+            if request.args.get('cursor'):
+                cursor_date, cursor_id = decode_cursor(request.args['cursor'], date, int)
+                query = query.filter(keyset_after(
+                    [BreedingCalendarModel.date, BreedingCalendarModel.id],
+                    [cursor_date, cursor_id]
+                ))
+            query = query.limit(limit + 1)
+        
+        calendar_entries = query.all()
+        has_more = limit is not None and len(calendar_entries) > limit
+        if has_more:
+            calendar_entries = calendar_entries[:limit]
+        
+        response = jsonify([serialize_calendar_entry(entry) for entry in calendar_entries])
+        if has_more:
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor(calendar_entries[-1].date, calendar_entries[-1].id)
+        return response
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         print(f"Error fetching calendar history: {str(e)}")
         import traceback
@@ -1314,6 +1694,7 @@ def delete_breeding_request(request_id):
             return jsonify({'message': 'You can only delete requests from your own facility'}), 403
             
         db.session.delete(request_to_delete)
+        bump_calendar_version(request_to_delete.facility_id)
         db.session.commit()
         
         return jsonify({'message': 'Request deleted successfully'}), 200
@@ -1322,49 +1703,213 @@ def delete_breeding_request(request_id):
         db.session.rollback()
         return jsonify({'message': f'Error deleting request: {str(e)}'}), 500
 
+@app.route('/api/breeding/calendar/series', methods=['POST'])
+@jwt_required()
+def add_breeding_series():
+    try:
+        data = request.json or {}
+        facility_id = get_current_facility_id()
+        
+        if not data.get('start_date') or not data.get('username') or not data.get('request_type'):
+            return jsonify({'message': 'Missing required fields'}), 400
+        
+        try:
+            start_date = datetime.strptime(data['start_date'], '%Y-%m-%d').date()
+            if data.get('rrule'):
+                rule = parse_rrule(data['rrule'])
+            else:
+                rule = {
+                    'freq': (data.get('freq') or '').upper(),
+                    'interval': int(data.get('interval') or 1),
+                    'by_day': (data.get('by_day') or '').upper() or None,
+                    'count': int(data['count']) if data.get('count') else None,
+                    'until': datetime.strptime(data['until'], '%Y-%m-%d').date() if data.get('until') else None
+                }
+            freq, interval, by_day, until = validate_rule(
+                rule['freq'], rule['interval'], rule['by_day'], start_date,
+                count=rule['count'], until=rule['until']
+            )
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
+        
+        series = BreedingCalendarSeriesModel(
+            facility_id=facility_id,
+            username=data['username'],
+            request_type=data['request_type'],
+            fish_age=data.get('fish_age'),
+            notes=data.get('notes'),
+            freq=freq,
+            interval=interval,
+            by_day=by_day,
+            start_date=start_date,
+            until=until,
+            count=rule['count']
+        )
+        db.session.add(series)
+        bump_calendar_version(facility_id)
+        db.session.commit()
+        
+        return jsonify({
+            'id': series.id,
+            'start_date': series.start_date.isoformat(),
+            'until': series.until.isoformat() if series.until else None,
+            'freq': series.freq,
+            'interval': series.interval,
+            'by_day': series.by_day,
+            'count': series.count
+        }), 201
+    except Exception as e:
+        print(f"Error adding breeding series: {str(e)}")
+        db.session.rollback()
+        return jsonify({'message': f'Server error: {str(e)}'}), 500
+
+@app.route('/api/breeding/calendar/series/<int:series_id>', methods=['DELETE'])
+@jwt_required()
+def delete_breeding_series(series_id):
+    try:
+        facility_id = get_current_facility_id()
+        series = BreedingCalendarSeriesModel.query.get(series_id)
+        if not series:
+            return jsonify({'message': 'Series not found'}), 404
+        if facility_id is not None and series.facility_id != facility_id:
+            return jsonify({'message': 'You can only delete requests from your own facility'}), 403
+        
+        db.session.delete(series)
+        bump_calendar_version(series.facility_id)
+        db.session.commit()
+        return jsonify({'message': 'Series deleted successfully'}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Error deleting series: {str(e)}'}), 500
+
+@app.route('/api/breeding/calendar/series/<int:series_id>/occurrences/<occurrence>', methods=['PUT'])
+@jwt_required()
+def update_series_occurrence(series_id, occurrence):
+    """Cancel one occurrence ({"cancelled": true}) or override its
+    username/request_type/fish_age/notes; {"cancelled": false} with no
+    overrides restores it."""
+    try:
+        data = request.json or {}
+        facility_id = get_current_facility_id()
+        series = BreedingCalendarSeriesModel.query.get(series_id)
+        if not series:
+            return jsonify({'message': 'Series not found'}), 404
+        if facility_id is not None and series.facility_id != facility_id:
+            return jsonify({'message': 'You can only change requests from your own facility'}), 403
+        
+        try:
+            occurrence_date = datetime.strptime(occurrence, '%Y-%m-%d').date()
+        except ValueError:
+            return jsonify({'message': 'Occurrence date must be formatted as YYYY-MM-DD'}), 400
+        if not occurrence_dates(series.freq, series.interval, series.by_day, series.start_date,
+                                series.until, occurrence_date, occurrence_date):
+            return jsonify({'message': 'The series has no occurrence on that date'}), 400
+        
+        exception = BreedingCalendarExceptionModel.query.filter_by(
+            series_id=series.id, occurrence_date=occurrence_date
+        ).first()
+        if exception is None:
+            exception = BreedingCalendarExceptionModel(series_id=series.id, occurrence_date=occurrence_date)
+            db.session.add(exception)
+        
+        exception.cancelled = bool(data.get('cancelled', False))
+        for field in ('username', 'request_type', 'fish_age', 'notes'):
+            if field in data:
+                setattr(exception, field, data[field])
+        
+        overridden = any(getattr(exception, field) is not None
+                         for field in ('username', 'request_type', 'fish_age', 'notes'))
+        if not exception.cancelled and not overridden:
+            if exception.id is None:
+                db.session.expunge(exception)
+            else:
+                db.session.delete(exception)
+        
+        bump_calendar_version(series.facility_id)
+        db.session.commit()
+        return jsonify({'message': 'Occurrence updated successfully'}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Error updating occurrence: {str(e)}'}), 500
+
 # Clinical Management Routes
+CASE_NOTES_PAGE_SIZE = 20
+
+def serialize_case_note(note, username):
+    return {
+        'id': note.id,
+        'content': note.content,
+        'username': username or 'Unknown User',
+        'timestamp': note.created_at.isoformat() if note.created_at else None
+    }
+
 @app.route('/api/clinical/cases', methods=['GET'])
 @jwt_required()
 def get_cases():
-    current_user_id = get_current_user_id()
     facility_id = get_current_facility_id()
     
-    # Filter cases by facility_id
-    query = ClinicalCaseModel.query
-    
-    if facility_id:
-        query = query.filter_by(facility_id=facility_id)
+    try:
+        # Tank, rack and reporter come from the same joined query
+        query = cases_query(facility_id, request.args)\
+            .order_by(ClinicalCaseModel.report_date.desc(), ClinicalCaseModel.id.desc())
+        
+        # Without a limit every matching case is returned, as before; with
+        # one, keyset pagination on (report_date, id), newest first
+        limit = None
+        if request.args.get('limit'):
+            limit = page_size(request.args.get('limit'))
+            if request.args.get('cursor'):
+                cursor_date, cursor_id = decode_cursor(request.args['cursor'], date, int)
+                query = query.filter(keyset_after(
+                    [ClinicalCaseModel.report_date, ClinicalCaseModel.id],
+                    [cursor_date, cursor_id],
+                    descending=True
+                ))
+            query = query.limit(limit + 1)
+        rows = query.all()
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     
-    cases = query.order_by(ClinicalCaseModel.report_date.desc()).all()
+    has_more = limit is not None and len(rows) > limit
+    if has_more:
+        rows = rows[:limit]
     
-    case_data = []
-    for case in cases:
-        # Get tank details
-        tank = TankModel.query.get(case.tank_id)
-        rack = RackModel.query.get(tank.rack_id) if tank else None
-        
-        # Get reporter details (if available)
-        reporter = None
-        if case.user_id:
-            reporter = UserModel.query.get(case.user_id)
-            
-        case_data.append({
-            'id': case.id,
-            'tank_id': case.tank_id,
-            'tank_position': tank.position if tank else "Unknown",
-            'rack_name': rack.name if rack else "Unknown",
-            'reporter': reporter.username if reporter else "Unknown",
-            'symptoms': case.symptoms,
-            'fish_count': case.fish_count,
-            'report_date': case.report_date.isoformat() if case.report_date else None,
-            'note': case.note,
-            'status': case.status,
-            'closure_reason': case.closure_reason
-        })
-        
-    return jsonify(case_data)
-
+    response = jsonify([{
+        'id': case.id,
+        'tank_id': case.tank_id,
+        'tank_position': tank_position or "Unknown",
+        'rack_name': rack_name or "Unknown",
+        'reporter': reporter or "Unknown",
+        'symptoms': case.symptoms,
+        'fish_count': case.fish_count,
+        'report_date': case.report_date.isoformat() if case.report_date else None,
+        'note': case.note,
+        'status': case.status,
+        'closure_reason': case.closure_reason
+    } for case, tank_position, rack_name, reporter in rows])
+    if has_more:
+        last_case = rows[-1][0]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last_case.report_date, last_case.id)
+    return response
 
+@app.route('/api/clinical/symptoms/trends', methods=['GET'])
+@jwt_required()
+def get_symptom_trends_route():
+    try:
+        group_by = request.args.get('group_by', 'rack')
+        if group_by not in SYMPTOM_TREND_GROUPS:
+            return jsonify({'message': f"group_by must be one of {', '.join(SYMPTOM_TREND_GROUPS)}"}), 400
+        try:
+            weeks = int(request.args.get('weeks', 12))
+        except ValueError:
+            return jsonify({'message': 'weeks must be a number'}), 400
+        if not 1 <= weeks <= MAX_TREND_WEEKS:
+            return jsonify({'message': f'weeks must be between 1 and {MAX_TREND_WEEKS}'}), 400
+        
+        return jsonify(get_symptom_trends(get_current_facility_id(), weeks, group_by)), 200
+    except Exception as e:
+        print(f"Error computing symptom trends: {str(e)}")
+        return jsonify({'message': f'Server error: {str(e)}'}), 500
 
 @app.route('/api/clinical/cases', methods=['POST'])
 @jwt_required()
@@ -1388,12 +1933,13 @@ def create_clinical_case():
             report_date=datetime.strptime(data['report_date'], '%Y-%m-%d').date(),
             note=data.get('note', ''),
             user_id=current_user_id,
-            status='Open',
+            status=OPEN_STATUS,
             facility_id=facility_id
         )
         
         db.session.add(new_case)
         db.session.flush()  # Get the case ID before commit
+        adjust_open_cases(new_case.tank_id, 1)
         
         # Get information needed for the notification
         user = UserModel.query.get(current_user_id)
@@ -1412,6 +1958,8 @@ def create_clinical_case():
         )
         
         db.session.commit()
+        # Only once committed, or a concurrent request could cache trends without the case
+        invalidate_symptom_trends(facility_id)
         
         # Return the new case
         return jsonify({
@@ -1497,19 +2045,24 @@ def update_case_status(case_id):
         
         if 'status' not in data:
             return jsonify({'message': 'Status is required'}), 400
+        if data['status'] not in CASE_STATUSES:
+            return jsonify({'message': f"Status must be one of {', '.join(CASE_STATUSES)}"}), 400
         
         # Verify the case exists
         case = ClinicalCaseModel.query.get_or_404(case_id)
+        old_status = case.status
         
         # Update status
         case.status = data['status']
         
         # If status is closed, update closure reason
-        if case.status == 'Closed':
+        if case.status == CLOSED_STATUS:
             if 'closure_reason' not in data or not data['closure_reason']:
+                db.session.rollback()
                 return jsonify({'message': 'Closure reason is required when closing a case'}), 400
             case.closure_reason = data['closure_reason']
         
+        adjust_open_cases(case.tank_id, open_case_delta(old_status, case.status))
         db.session.commit()
         
         return jsonify({
@@ -1531,8 +2084,10 @@ def delete_clinical_case(case_id):
         case = ClinicalCaseModel.query.get_or_404(case_id)
         
         # Delete the case (notes will be deleted automatically due to cascade)
+        adjust_open_cases(case.tank_id, open_case_delta(case.status, None))
         db.session.delete(case)
         db.session.commit()
+        invalidate_symptom_trends(case.facility_id)
         
         return jsonify({'message': 'Case deleted successfully'}), 200
     except Exception as e:
@@ -1540,6 +2095,32 @@ def delete_clinical_case(case_id):
         print(f"Error deleting clinical case: {str(e)}")
         return jsonify({'message': f'Server error: {str(e)}'}), 500
 
+@app.route('/api/clinical/cases/<int:case_id>/notes', methods=['GET'])
+@jwt_required()
+def get_case_notes(case_id):
+    try:
+        facility_id = get_current_facility_id()
+        case = ClinicalCaseModel.query.get(case_id)
+        if not case:
+            return jsonify({'message': 'Case not found'}), 404
+        if case.facility_id != facility_id:
+            return jsonify({'message': 'Unauthorized access to case'}), 403
+        
+        try:
+            limit = page_size(request.args.get('limit'), default=CASE_NOTES_PAGE_SIZE)
+            cursor_values = decode_cursor(request.args['cursor'], datetime, int) if request.args.get('cursor') else None
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
+        
+        notes_page, has_more = case_notes_page(case_id, limit, cursor_values)
+        response = jsonify([serialize_case_note(note, username) for note, username in notes_page])
+        if has_more:
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor(notes_page[-1][0].created_at, notes_page[-1][0].id)
+        return response
+    except Exception as e:
+        print(f"Error getting case notes: {str(e)}")
+        return jsonify({'message': f'Server error: {str(e)}'}), 500
+
 @app.route('/api/clinical/cases/<int:case_id>', methods=['GET'])
 @jwt_required()
 def get_clinical_case(case_id):
@@ -1562,29 +2143,13 @@ def get_clinical_case(case_id):
         tank = TankModel.query.get(case.tank_id)
         rack = RackModel.query.get(tank.rack_id) if tank else None
         
-        # Get all notes with user information
-        from models_db import ClinicalNoteModel, UserModel
-        notes_with_users = db.session.query(
-            ClinicalNoteModel, 
-            UserModel.username
-        ).outerjoin(
-            UserModel, 
-            ClinicalNoteModel.user_id == UserModel.id
-        ).filter(
-            ClinicalNoteModel.case_id == case_id
-        ).order_by(
-            ClinicalNoteModel.created_at
-        ).all()
-        
-        # Format notes
-        formatted_notes = []
-        for note, username in notes_with_users:
-            formatted_notes.append({
-                'id': note.id,
-                'content': note.content,
-                'username': username or 'Unknown User',
-                'timestamp': note.created_at.isoformat() if note.created_at else None
-            })
+        # First page of notes, newest first; more via /api/clinical/cases/<id>/notes
+        try:
+            notes_limit = page_size(request.args.get('notes_limit'), default=CASE_NOTES_PAGE_SIZE)
+        except ValueError:
+            return jsonify({'message': 'Invalid notes_limit'}), 400
+        notes_page, has_more_notes = case_notes_page(case_id, notes_limit)
+        formatted_notes = [serialize_case_note(note, username) for note, username in notes_page]
         
         # Use the correct field name for tank line (line instead of line_name)
         return jsonify({
@@ -1600,7 +2165,9 @@ def get_clinical_case(case_id):
             'status': case.status,
             'closure_reason': case.closure_reason,
             'created_at': case.created_at.isoformat() if case.created_at else None,
-            'notes': formatted_notes
+            'note_count': case_note_count(case_id),
+            'notes': formatted_notes,
+            'notes_next_cursor': encode_cursor(notes_page[-1][0].created_at, notes_page[-1][0].id) if has_more_notes else None
         }), 200
         
     except Exception as e:
@@ -1736,8 +2303,11 @@ def get_notifications():
         
         # Query notifications for this user
         from models_db import NotificationModel
+        # Rows coalesced into a digest are listed through the digest instead
         notifications = NotificationModel.query.filter_by(
-            user_id=current_user_id
+            user_id=current_user_id,
+            digest_pending=False,
+            digest_id=None
         ).order_by(
             NotificationModel.created_at.desc()
         ).limit(limit).all()
@@ -1778,6 +2348,53 @@ def check_subscription_status():
         print(f"Error checking subscription: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/notifications/preferences', methods=['GET'])
+@jwt_required()
+def get_notification_preferences():
+    from notification_service import get_digest_minutes, DIGEST_WINDOWS
+    return jsonify({
+        'digest_minutes': get_digest_minutes(get_current_user_id()),
+        'digest_windows': list(DIGEST_WINDOWS)
+    }), 200
+
+@app.route('/api/notifications/preferences', methods=['PUT'])
+@jwt_required()
+def update_notification_preferences():
+    try:
+        from notification_service import set_digest_minutes, DIGEST_WINDOWS
+        data = request.json or {}
+        if 'digest_minutes' not in data:
+            return jsonify({'message': 'digest_minutes is required'}), 400
+        digest_minutes = data['digest_minutes']
+        if digest_minutes is not None and digest_minutes not in DIGEST_WINDOWS:
+            return jsonify({'message': f"digest_minutes must be null or one of {', '.join(map(str, DIGEST_WINDOWS))}"}), 400
+        
+        set_digest_minutes(get_current_user_id(), digest_minutes)
+        db.session.commit()
+        
+        return jsonify({'digest_minutes': digest_minutes}), 200
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error updating notification preferences: {str(e)}")
+        return jsonify({'message': f'Server error: {str(e)}'}), 500
+
+@app.route('/api/notifications/<int:notification_id>/digest', methods=['GET'])
+@jwt_required()
+def get_notification_digest_items(notification_id):
+    current_user_id = get_current_user_id()
+    
+    from notification_service import get_digest_items
+    items = get_digest_items(notification_id, current_user_id)
+    
+    if items is None:
+        return jsonify({'message': 'Digest not found'}), 404
+    return jsonify([{
+        'id': n.id,
+        'message': n.message,
+        'category': n.category,
+        'created_at': n.created_at.isoformat()
+    } for n in items])
+
 @app.route('/api/notifications/<int:notification_id>/read', methods=['POST'])
 @jwt_required()
 def mark_notification_read(notification_id):
@@ -1807,7 +2424,8 @@ def health_check():
     """Health check endpoint"""
     return jsonify({
         'status': 'healthy',
-        'timestamp': datetime.utcnow().isoformat()
+        'timestamp': datetime.utcnow().isoformat(),
+        'email_queue': email_pool.stats()
     })
 
 # Add security headers to all responses
@@ -1838,6 +2456,7 @@ def after_request(response):
     response.headers["Access-Control-Allow-Headers"] = "Content-Type,Authorization"
     response.headers["Access-Control-Allow-Methods"] = "GET,PUT,POST,DELETE,OPTIONS,PATCH"
     response.headers["Access-Control-Allow-Credentials"] = "true"
+    response.headers["Access-Control-Expose-Headers"] = NEXT_CURSOR_HEADER
     return response
 
 # Test endpoint for CORS - No JWT required
@@ -1949,7 +2568,7 @@ def init_test_data():
         facility_id = get_current_facility_id()
         
         # Add a test rack if none exists
-        if not RackModel.query.filter_by(facility_id=facility_id).first():
+        if not RackModel.query.filter_by(facility_id=facility_id, deleted_at=None).first():
             new_rack = RackModel(
                 name="Test Rack 1",
                 lab_id="TR-001",
@@ -0,0 +1,141 @@
+import numpy as np
+from sqlalchemy import select, union_all
+
+from config import db
+from facility_cache import FacilityCache
+from models_db import BreedingPlanModel, BreedingProfileModel, CrossModel, TankModel
+from position_history import resolve_positions
+
+# Fish age at breeding, in days from the tank's date of birth
+AGE_BUCKETS = [90, 180, 365, 540]
+AGE_LABELS = ['<90d', '90-179d', '180-364d', '365-539d', '540d+']
+
+# Days since the tank was last used in a cross
+REST_BUCKETS = [8, 15, 31, 61]
+REST_LABELS = ['0-7d', '8-14d', '15-30d', '31-60d', '61d+']
+
+analytics_cache = FacilityCache(ttl=600)
+
+
+def _tank_uses(facility_id):
+    """Every tank participation in a cross for a facility, in one query"""
+    selects = []
+    for tank_column in (CrossModel.tank1_id, CrossModel.tank2_id):
+        role_select = select(
+            CrossModel.id.label('cross_id'),
+            BreedingPlanModel.breeding_date.label('breeding_date'),
+            CrossModel.breeding_result.label('breeding_result'),
+            TankModel.id.label('tank_id'),
+            TankModel.line.label('line'),
+            TankModel.dob.label('dob'),
+            TankModel.position.label('current_position'),
+            TankModel.rack_id.label('current_rack_id')
+        ).join(
+            BreedingPlanModel, BreedingPlanModel.id == CrossModel.plan_id
+        ).join(
+            BreedingProfileModel, BreedingProfileModel.id == BreedingPlanModel.profile_id
+        ).join(
+            TankModel, TankModel.id == tank_column
+        )
+        if facility_id is not None:
+            role_select = role_select.where(BreedingProfileModel.facility_id == facility_id)
+        selects.append(role_select)
+
+    return db.session.execute(union_all(*selects)).all()
+
+
+def _success_rates(keys, has_result, succeeded, labels=None):
+    """Group rows by key and count crosses, recorded results and successes.
+
+    Everything is done with np.unique/np.bincount, so the cost is a sort of
+    the keys rather than a Python loop over rows.
+    """
+    if labels is None:
+        labels, inverse = np.unique(keys, return_inverse=True)
+    else:
+        inverse = keys
+    size = len(labels)
+    crosses = np.bincount(inverse, minlength=size)
+    recorded = np.bincount(inverse, weights=has_result, minlength=size)
+    successes = np.bincount(inverse, weights=succeeded, minlength=size)
+    rates = np.divide(successes, recorded, out=np.full(size, np.nan), where=recorded > 0)
+
+    return [{
+        'key': label.item() if hasattr(label, 'item') else label,
+        'crosses': int(crosses[i]),
+        'recorded': int(recorded[i]),
+        'successes': int(successes[i]),
+        'success_rate': None if np.isnan(rates[i]) else round(float(rates[i]), 4)
+    } for i, label in enumerate(labels) if crosses[i]]
+
+
+def compute_breeding_analytics(facility_id):
+    """Success rates by line, tank, fish age, rest time and rack position.
+
+    Rates are per tank participation: a cross contributes once for each of
+    its tanks. Only crosses with a recorded result count towards the rate.
+    """
+    rows = _tank_uses(facility_id)
+    if not rows:
+        return {'total_crosses': 0, 'by_line': [], 'by_tank': [], 'by_age': [], 'by_rest': [], 'by_position': []}
+
+    tank_ids = np.array([row.tank_id for row in rows])
+    breeding_dates = np.array([row.breeding_date for row in rows], dtype='datetime64[D]')
+    dobs = np.array([row.dob for row in rows], dtype='datetime64[D]')
+    results = [row.breeding_result for row in rows]
+    has_result = np.array([result is not None for result in results], dtype=float)
+    succeeded = np.array([result is True for result in results], dtype=float)
+
+    # Fish age at breeding
+    ages = (breeding_dates - dobs).astype('timedelta64[D]').astype(float)
+    age_index = np.digitize(np.nan_to_num(ages, nan=-1), AGE_BUCKETS)
+    age_known = ~np.isnat(dobs)
+
+    # Days since the tank's previous cross: sort by tank then date and diff neighbours
+    day_numbers = breeding_dates.astype('int64')
+    order = np.lexsort((day_numbers, tank_ids))
+    rest = np.full(len(rows), -1.0)
+    gaps = np.diff(day_numbers[order]).astype(float)
+    same_tank = tank_ids[order][1:] == tank_ids[order][:-1]
+    rest[order[1:][same_tank]] = gaps[same_tank]
+    rest_index = np.digitize(rest, REST_BUCKETS)
+    rest_known = rest >= 0
+
+    # Rack position on the breeding date, falling back to the current one
+    intervals = resolve_positions([(row.tank_id, row.breeding_date) for row in rows])
+    positions = np.array([
+        f"{interval.rack_id}:{interval.position}" if interval else f"{row.current_rack_id}:{row.current_position}"
+        for row, interval in zip(rows, intervals)
+    ])
+
+    by_position = _success_rates(positions, has_result, succeeded)
+    for entry in by_position:
+        rack_id, position = entry.pop('key').split(':', 1)
+        entry['rack_id'] = int(rack_id)
+        entry['position'] = position
+
+    return {
+        'total_crosses': len({row.cross_id for row in rows}),
+        'by_line': _success_rates(np.array([row.line or 'Unknown' for row in rows]), has_result, succeeded),
+        'by_tank': _success_rates(tank_ids, has_result, succeeded),
+        'by_age': _success_rates(
+            age_index[age_known], has_result[age_known], succeeded[age_known], labels=AGE_LABELS
+        ),
+        'by_rest': _success_rates(
+            rest_index[rest_known], has_result[rest_known], succeeded[rest_known], labels=REST_LABELS
+        ),
+        'by_position': by_position
+    }
+
+
+def get_breeding_analytics(facility_id):
+    """Cached per facility; see invalidate_breeding_analytics"""
+    cached = analytics_cache.get(facility_id)
+    if cached is not None:
+        return cached
+    return analytics_cache.set(facility_id, compute_breeding_analytics(facility_id))
+
+
+def invalidate_breeding_analytics(facility_id):
+    """Call whenever crosses or their results change"""
+    analytics_cache.invalidate(facility_id)
@@ -0,0 +1,166 @@
+from datetime import date
+
+from sqlalchemy import case, func, literal, or_, select, union_all
+from sqlalchemy.orm import aliased
+
+from config import db
+from models_db import (
+    BreedingPlanModel,
+    BreedingProfileModel,
+    CrossModel,
+    GenderEnum,
+    RackModel,
+    SubdivisionModel,
+    TankModel
+)
+from reservations import cross_uses, reserved_on
+
+TANK1_ROLE = 1
+TANK2_ROLE = 2
+
+
+def _cross_role_select(tank_id, role):
+    tank_column = CrossModel.tank1_id if role == TANK1_ROLE else CrossModel.tank2_id
+    males = CrossModel.tank1_males if role == TANK1_ROLE else CrossModel.tank2_males
+    females = CrossModel.tank1_females if role == TANK1_ROLE else CrossModel.tank2_females
+
+    return select(
+        CrossModel.id.label('cross_id'),
+        CrossModel.plan_id.label('plan_id'),
+        BreedingPlanModel.breeding_date.label('breeding_date'),
+        CrossModel.breeding_result.label('breeding_result'),
+        males.label('males_used'),
+        females.label('females_used'),
+        literal(role).label('role')
+    ).join(
+        BreedingPlanModel, BreedingPlanModel.id == CrossModel.plan_id
+    ).where(tank_column == tank_id)
+
+
+def get_tank_crosses(tank_id):
+    """Return every cross a tank took part in, joined to its plan, in one query.
+
+    The tank1 and tank2 roles are combined with UNION ALL so the fish counts
+    in each row are the ones taken from this tank. A tank that sat on both
+    sides of the same cross appears once per role.
+    """
+    crosses = union_all(
+        _cross_role_select(tank_id, TANK1_ROLE),
+        _cross_role_select(tank_id, TANK2_ROLE)
+    ).subquery()
+
+    return db.session.execute(
+        select(crosses).order_by(crosses.c.breeding_date, crosses.c.cross_id)
+    ).all()
+
+
+def search_plans_query(facility_id, filters):
+    """Build the breeding plan search with every filter pushed into SQL.
+
+    Profile and date filters apply to the plan itself. Line, position and
+    breeding-result filters must all hold for the same cross, so they are
+    combined into a single correlated EXISTS over crosses joined to both
+    of its tanks.
+    """
+    query = BreedingPlanModel.query.join(
+        BreedingProfileModel, BreedingProfileModel.id == BreedingPlanModel.profile_id
+    )
+    if facility_id is not None:
+        query = query.filter(BreedingProfileModel.facility_id == facility_id)
+
+    if filters.get('profile_id'):
+        query = query.filter(BreedingPlanModel.profile_id == filters['profile_id'])
+    if filters.get('dateFrom'):
+        query = query.filter(BreedingPlanModel.breeding_date >= date.fromisoformat(filters['dateFrom']))
+    if filters.get('dateTo'):
+        query = query.filter(BreedingPlanModel.breeding_date <= date.fromisoformat(filters['dateTo']))
+
+    tank1 = aliased(TankModel)
+    tank2 = aliased(TankModel)
+    cross_filters = []
+
+    if filters.get('tankLine'):
+        cross_filters.append(or_(tank1.line == filters['tankLine'], tank2.line == filters['tankLine']))
+    if filters.get('tankPosition'):
+        cross_filters.append(or_(tank1.position == filters['tankPosition'], tank2.position == filters['tankPosition']))
+    if filters.get('breedingResult'):
+        if filters['breedingResult'] == 'null':
+            cross_filters.append(CrossModel.breeding_result.is_(None))
+        else:
+            cross_filters.append(CrossModel.breeding_result == (filters['breedingResult'] == 'true'))
+
+    if cross_filters:
+        matching_cross = db.session.query(CrossModel.id).outerjoin(
+            tank1, tank1.id == CrossModel.tank1_id
+        ).outerjoin(
+            tank2, tank2.id == CrossModel.tank2_id
+        ).filter(
+            CrossModel.plan_id == BreedingPlanModel.id,
+            *cross_filters
+        ).exists()
+        query = query.filter(matching_cross)
+
+    return query
+
+
+def tank_fish_counts(tank_ids, facility_id=None):
+    """Return {tank_id: {'males': n, 'females': n}} for the given tanks in one query.
+
+    Tanks outside `facility_id` are left out, so callers can treat a missing
+    key as "not found".
+    """
+    query = db.session.query(
+        TankModel.id,
+        func.coalesce(func.sum(case(
+            (SubdivisionModel.gender == GenderEnum.MALE, SubdivisionModel.count), else_=0
+        )), 0).label('males'),
+        func.coalesce(func.sum(case(
+            (SubdivisionModel.gender == GenderEnum.FEMALE, SubdivisionModel.count), else_=0
+        )), 0).label('females')
+    ).join(
+        RackModel, RackModel.id == TankModel.rack_id
+    ).outerjoin(
+        SubdivisionModel, SubdivisionModel.tank_id == TankModel.id
+    ).filter(
+        TankModel.id.in_(set(tank_ids))
+    ).group_by(TankModel.id)
+
+    if facility_id is not None:
+        query = query.filter(RackModel.facility_id == facility_id)
+
+    return {row.id: {'males': row.males, 'females': row.females} for row in query.all()}
+
+
+def validate_fish_availability(crosses, breeding_date, facility_id=None, credit=None):
+    """Check that every tank in a plan has enough unreserved fish on its breeding date.
+
+    Runs a fixed number of queries however many crosses the plan has. Fish
+    requested from the same tank by several crosses are added up, and the
+    reservation ledger for that date is subtracted from the stock. When
+    editing a plan, pass its current reservations as `credit` so the plan
+    does not count against itself.
+    Returns (missing_tank_ids, shortages); both are empty when the plan fits.
+    """
+    requested = cross_uses(crosses)
+    stock = tank_fish_counts(requested.keys(), facility_id)
+    missing = sorted(set(requested) - set(stock))
+    if missing:
+        return missing, []
+
+    reserved = reserved_on(requested.keys(), breeding_date)
+    credit = credit or {}
+
+    shortages = []
+    for tank_id, counts in requested.items():
+        for gender in ('males', 'females'):
+            available = (stock[tank_id][gender]
+                         - reserved.get(tank_id, {}).get(gender, 0)
+                         + credit.get(tank_id, {}).get(gender, 0))
+            if counts[gender] > available:
+                shortages.append({
+                    'tank_id': tank_id,
+                    'gender': gender,
+                    'requested': counts[gender],
+                    'available': max(available, 0)
+                })
+    return [], shortages
@@ -0,0 +1,227 @@
+import secrets
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import or_
+
+from config import db
+from facility_cache import FacilityCache
+from models_db import (
+    BreedingCalendarExceptionModel,
+    BreedingCalendarModel,
+    BreedingCalendarSeriesModel,
+    BreedingPlanModel,
+    BreedingProfileModel,
+    CalendarFeedModel,
+    CrossModel
+)
+from recurrence import first_occurrence, to_rrule
+
+# Past events kept in the feed; everything from this far back onwards is included
+FEED_HISTORY_DAYS = 180
+STREAM_BATCH_SIZE = 500
+
+# Rendered feeds keyed by facility and (version, window start); a bump makes old bodies unreachable
+feed_cache = FacilityCache(ttl=3600)
+
+
+def get_or_create_feed(facility_id, rotate=False):
+    """Return the facility's feed row, creating it (or issuing a new token) as needed.
+
+    The caller must commit.
+    """
+    feed = CalendarFeedModel.query.get(facility_id)
+    if feed is None:
+        feed = CalendarFeedModel(facility_id=facility_id, token=secrets.token_urlsafe(32), version=1)
+        db.session.add(feed)
+    elif rotate:
+        feed.token = secrets.token_urlsafe(32)
+    return feed
+
+
+def bump_calendar_version(facility_id):
+    """Mark the facility's feed as changed; call alongside writes to calendar entries or plans.
+
+    A single-row UPDATE, and a no-op for facilities that never created a
+    feed. Runs in the caller's transaction.
+    """
+    if facility_id is None:
+        return
+    CalendarFeedModel.query.filter_by(facility_id=facility_id).update(
+        {CalendarFeedModel.version: CalendarFeedModel.version + 1},
+        synchronize_session=False
+    )
+
+
+def _feed_since():
+    return date.today() - timedelta(days=FEED_HISTORY_DAYS)
+
+
+def feed_etag(feed):
+    # The window start is part of the tag so the feed still rolls forward on quiet days
+    return f'{feed.facility_id}-{feed.version}-{_feed_since().isoformat()}'
+
+
+def _escape(value):
+    return (str(value or '').replace('\\', '\\\\').replace(';', '\\;')
+            .replace(',', '\\,').replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def _fold(line):
+    # RFC 5545: content lines longer than 75 octets continue on lines starting with a space
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts = []
+    while encoded:
+        size = 75 if not parts else 74
+        chunk = encoded[:size]
+        while len(chunk) < len(encoded) and (encoded[len(chunk)] & 0xC0) == 0x80:
+            chunk = chunk[:-1]  # don't split a multi-byte character
+        parts.append(chunk.decode('utf-8'))
+        encoded = encoded[len(chunk):]
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def _event(uid, day, summary, description, stamp, rrule=None, exdates=()):
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:{uid}',
+        f'DTSTAMP:{stamp}',
+        f'DTSTART;VALUE=DATE:{day.strftime("%Y%m%d")}',
+        f'DTEND;VALUE=DATE:{(day + timedelta(days=1)).strftime("%Y%m%d")}',
+        f'SUMMARY:{_escape(summary)}'
+    ]
+    if rrule:
+        lines.append(f'RRULE:{rrule}')
+    if exdates:
+        lines.append('EXDATE;VALUE=DATE:' + ','.join(day.strftime('%Y%m%d') for day in exdates))
+    if description:
+        lines.append(f'DESCRIPTION:{_escape(description)}')
+    lines.append('END:VEVENT')
+    return ''.join(_fold(line) for line in lines)
+
+
+def _request_details(request, override=None):
+    def field(name):
+        value = getattr(override, name, None) if override is not None else None
+        return value if value is not None else getattr(request, name)
+
+    details = [f"Requested by {field('username')}"]
+    if field('fish_age'):
+        details.append(f"Fish age: {field('fish_age')}")
+    if field('notes'):
+        details.append(field('notes'))
+    return '\n'.join(details)
+
+
+def _generate_feed(facility_id, since):
+    """Yield the .ics body in chunks, reading rows in batches"""
+    stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')
+
+    yield ''.join(_fold(line) for line in [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//Zebrafish Registry//Breeding Calendar//EN',
+        'CALSCALE:GREGORIAN',
+        'X-WR-CALNAME:Breeding calendar'
+    ])
+
+    entries = BreedingCalendarModel.query.filter(
+        BreedingCalendarModel.facility_id == facility_id,
+        BreedingCalendarModel.date >= since
+    ).order_by(BreedingCalendarModel.date, BreedingCalendarModel.id).yield_per(STREAM_BATCH_SIZE)
+    chunk = []
+    for entry in entries:
+        chunk.append(_event(
+            f'calendar-{entry.id}@zebrafish-registry', entry.date,
+            f'{entry.request_type} ({entry.username})', _request_details(entry), stamp
+        ))
+        if len(chunk) >= STREAM_BATCH_SIZE:
+            yield ''.join(chunk)
+            chunk = []
+
+    # Recurring requests go out as one RRULE event each; changed or cancelled
+    # occurrences are excluded from the rule and changed ones re-added singly
+    series_list = BreedingCalendarSeriesModel.query.filter(
+        BreedingCalendarSeriesModel.facility_id == facility_id,
+        or_(BreedingCalendarSeriesModel.until.is_(None), BreedingCalendarSeriesModel.until >= since)
+    ).order_by(BreedingCalendarSeriesModel.id).all()
+    exceptions = {}
+    if series_list:
+        for exception in BreedingCalendarExceptionModel.query.filter(
+            BreedingCalendarExceptionModel.series_id.in_([series.id for series in series_list])
+        ).order_by(BreedingCalendarExceptionModel.occurrence_date):
+            exceptions.setdefault(exception.series_id, []).append(exception)
+    for series in series_list:
+        # DTSTART counts as an occurrence, so it must be the first real one
+        first = first_occurrence(series.freq, series.interval, series.by_day, series.start_date, series.until)
+        if first is None:
+            continue
+        changed = exceptions.get(series.id, [])
+        chunk.append(_event(
+            f'series-{series.id}@zebrafish-registry', first,
+            f'{series.request_type} ({series.username})', _request_details(series), stamp,
+            rrule=to_rrule(series.freq, series.interval, series.by_day, series.until),
+            exdates=[exception.occurrence_date for exception in changed]
+        ))
+        for exception in changed:
+            if exception.cancelled:
+                continue
+            username = exception.username or series.username
+            chunk.append(_event(
+                f'series-{series.id}-{exception.occurrence_date.isoformat()}@zebrafish-registry',
+                exception.occurrence_date,
+                f'{exception.request_type or series.request_type} ({username})',
+                _request_details(series, exception), stamp
+            ))
+        if len(chunk) >= STREAM_BATCH_SIZE:
+            yield ''.join(chunk)
+            chunk = []
+
+    plans = db.session.query(
+        BreedingPlanModel.id,
+        BreedingPlanModel.breeding_date,
+        BreedingProfileModel.name,
+        db.func.count(CrossModel.id).label('cross_count')
+    ).join(
+        BreedingProfileModel, BreedingProfileModel.id == BreedingPlanModel.profile_id
+    ).outerjoin(
+        CrossModel, CrossModel.plan_id == BreedingPlanModel.id
+    ).filter(
+        BreedingProfileModel.facility_id == facility_id,
+        BreedingPlanModel.breeding_date >= since
+    ).group_by(
+        BreedingPlanModel.id, BreedingProfileModel.name
+    ).order_by(BreedingPlanModel.breeding_date, BreedingPlanModel.id).yield_per(STREAM_BATCH_SIZE)
+    for plan in plans:
+        chunk.append(_event(
+            f'plan-{plan.id}@zebrafish-registry', plan.breeding_date,
+            f'Breeding plan: {plan.name}', f'{plan.cross_count} crosses', stamp
+        ))
+        if len(chunk) >= STREAM_BATCH_SIZE:
+            yield ''.join(chunk)
+            chunk = []
+
+    chunk.append(_fold('END:VCALENDAR'))
+    yield ''.join(chunk)
+
+
+def feed_body(facility_id, version):
+    """Iterate over the feed body, from cache when this version was already rendered.
+
+    A freshly rendered body is streamed as it is generated and cached once
+    complete, so an interrupted response never leaves a partial feed behind.
+    """
+    since = _feed_since()
+    cache_key = (version, since)
+    cached = feed_cache.get(facility_id, key=cache_key)
+    if cached is not None:
+        yield cached
+        return
+
+    parts = []
+    for part in _generate_feed(facility_id, since):
+        parts.append(part)
+        yield part
+    feed_cache.invalidate(facility_id)
+    feed_cache.set(facility_id, ''.join(parts), key=cache_key)
@@ -0,0 +1,116 @@
+from datetime import date, timedelta
+
+from sqlalchemy import or_
+
+from config import db
+from models_db import BreedingCalendarExceptionModel, BreedingCalendarModel, BreedingCalendarSeriesModel
+from recurrence import occurrence_dates
+
+
+def month_bounds(month):
+    """Return (first_day, last_day) for a 'YYYY-MM' string; raises ValueError if malformed"""
+    first = date.fromisoformat(f'{month}-01')
+    next_month = (first.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return first, next_month - timedelta(days=1)
+
+
+def calendar_summary(facility_id, start_date, end_date):
+    """Entry counts per day, request_type and fish_age, from one GROUP BY.
+
+    The facility/date filter is served by ix_breeding_calendar_facility_date;
+    occurrences of recurring requests in the window are added on top.
+    Returns [{'date', 'total', 'groups': [{'request_type', 'fish_age', 'count'}]}]
+    for days that have entries, in date order.
+    """
+    query = db.session.query(
+        BreedingCalendarModel.date,
+        BreedingCalendarModel.request_type,
+        BreedingCalendarModel.fish_age,
+        db.func.count(BreedingCalendarModel.id).label('count')
+    ).filter(
+        BreedingCalendarModel.date >= start_date,
+        BreedingCalendarModel.date <= end_date
+    )
+    if facility_id is not None:
+        query = query.filter(BreedingCalendarModel.facility_id == facility_id)
+
+    rows = query.group_by(
+        BreedingCalendarModel.date,
+        BreedingCalendarModel.request_type,
+        BreedingCalendarModel.fish_age
+    ).all()
+
+    counts = {(row.date.isoformat(), row.request_type, row.fish_age): row.count for row in rows}
+    for occurrence in series_occurrences(facility_id, start_date, end_date):
+        key = (occurrence['date'], occurrence['request_type'], occurrence['fish_age'])
+        counts[key] = counts.get(key, 0) + 1
+
+    days = {}
+    ordered = sorted(counts.items(), key=lambda item: (item[0][0], item[0][1], item[0][2] or ''))
+    for (day_key, request_type, fish_age), count in ordered:
+        day = days.setdefault(day_key, {'date': day_key, 'total': 0, 'groups': []})
+        day['total'] += count
+        day['groups'].append({
+            'request_type': request_type,
+            'fish_age': fish_age,
+            'count': count
+        })
+    return list(days.values())
+
+
+def _series_in_window(facility_id, start_date, end_date):
+    query = BreedingCalendarSeriesModel.query.filter(
+        BreedingCalendarSeriesModel.start_date <= end_date,
+        or_(BreedingCalendarSeriesModel.until.is_(None), BreedingCalendarSeriesModel.until >= start_date)
+    )
+    if facility_id is not None:
+        query = query.filter(BreedingCalendarSeriesModel.facility_id == facility_id)
+    return query.all()
+
+
+def series_occurrences(facility_id, start_date, end_date):
+    """Expand recurring requests into entry dicts for [start_date, end_date].
+
+    Only series overlapping the window are loaded (via
+    ix_breeding_calendar_series_facility_window), each is expanded just
+    inside the window, and exceptions for the window come from one query.
+    Cancelled occurrences are dropped and overrides replace the series'
+    fields. Each dict has the same keys as a calendar entry plus series_id
+    and occurrence_date; its id is a string so it never collides with
+    entry ids.
+    """
+    series_list = _series_in_window(facility_id, start_date, end_date)
+    if not series_list:
+        return []
+
+    exceptions = {
+        (exception.series_id, exception.occurrence_date): exception
+        for exception in BreedingCalendarExceptionModel.query.filter(
+            BreedingCalendarExceptionModel.series_id.in_([series.id for series in series_list]),
+            BreedingCalendarExceptionModel.occurrence_date >= start_date,
+            BreedingCalendarExceptionModel.occurrence_date <= end_date
+        )
+    }
+
+    occurrences = []
+    for series in series_list:
+        for day in occurrence_dates(series.freq, series.interval, series.by_day,
+                                    series.start_date, series.until, start_date, end_date):
+            exception = exceptions.get((series.id, day))
+            if exception is not None and exception.cancelled:
+                continue
+            fields = {
+                field: getattr(exception, field) if exception is not None and getattr(exception, field) is not None
+                else getattr(series, field)
+                for field in ('username', 'request_type', 'fish_age', 'notes')
+            }
+            occurrences.append({
+                'id': f'series-{series.id}-{day.isoformat()}',
+                'date': day.isoformat(),
+                **fields,
+                'created_at': series.created_at.isoformat() if series.created_at else None,
+                'series_id': series.id,
+                'occurrence_date': day.isoformat()
+            })
+    occurrences.sort(key=lambda occurrence: occurrence['date'])
+    return occurrences
@@ -0,0 +1,144 @@
+from datetime import timedelta
+
+import numpy as np
+from sqlalchemy import case, func
+
+from breeding_analytics import AGE_BUCKETS, AGE_LABELS
+from calendar_service import series_occurrences
+from config import db
+from models_db import BreedingCalendarModel, FishReservationModel, GenderEnum, RackModel, SubdivisionModel, TankModel
+
+MAX_PLANNER_DAYS = 62
+
+
+def _facility_stock(facility_id):
+    """(tank_ids, dobs, males, females) for every dated tank in the facility, from one GROUP BY"""
+    query = db.session.query(
+        TankModel.id,
+        TankModel.dob,
+        func.coalesce(func.sum(case(
+            (SubdivisionModel.gender == GenderEnum.MALE, SubdivisionModel.count), else_=0
+        )), 0).label('males'),
+        func.coalesce(func.sum(case(
+            (SubdivisionModel.gender == GenderEnum.FEMALE, SubdivisionModel.count), else_=0
+        )), 0).label('females')
+    ).join(
+        RackModel, RackModel.id == TankModel.rack_id
+    ).join(
+        SubdivisionModel, SubdivisionModel.tank_id == TankModel.id
+    ).filter(
+        TankModel.dob.isnot(None)
+    ).group_by(TankModel.id).order_by(TankModel.id)
+    if facility_id is not None:
+        query = query.filter(RackModel.facility_id == facility_id)
+
+    rows = query.all()
+    return (
+        np.array([row.id for row in rows], dtype=np.int64),
+        np.array([row.dob for row in rows], dtype='datetime64[D]'),
+        np.array([row.males for row in rows], dtype=np.int64),
+        np.array([row.females for row in rows], dtype=np.int64)
+    )
+
+
+def _requests(facility_id, start_date, end_date):
+    """(date, request_type, fish_age) for every one-off and recurring request in the window"""
+    query = db.session.query(
+        BreedingCalendarModel.date,
+        BreedingCalendarModel.request_type,
+        BreedingCalendarModel.fish_age
+    ).filter(
+        BreedingCalendarModel.date >= start_date,
+        BreedingCalendarModel.date <= end_date
+    )
+    if facility_id is not None:
+        query = query.filter(BreedingCalendarModel.facility_id == facility_id)
+
+    requests = [(row.date.isoformat(), row.request_type, row.fish_age) for row in query]
+    requests += [
+        (occurrence['date'], occurrence['request_type'], occurrence['fish_age'])
+        for occurrence in series_occurrences(facility_id, start_date, end_date)
+    ]
+    return requests
+
+
+def _dpf(value):
+    try:
+        return int(str(value).strip())
+    except (TypeError, ValueError):
+        return -1
+
+
+def plan_capacity(facility_id, start_date, days, fish_per_request=1):
+    """Compare daily fish requests against free fish of the requested age.
+
+    Demand is the 'fish' calendar requests per day, bucketed by their
+    fish_age (days post fertilisation) with the same age buckets as the
+    breeding analytics. Supply is every dated tank's males and females
+    minus what the reservation ledger holds for that day, bucketed by the
+    tank's age on that day. A request needs fish_per_request fish of each
+    sex. Both sides are built as (day x tank) or (day x bucket) arrays, so
+    the whole facility is aggregated in one pass with no per-tank or
+    per-day queries.
+    """
+    end_date = start_date + timedelta(days=days - 1)
+    day_values = np.arange(np.datetime64(start_date, 'D'), np.datetime64(end_date, 'D') + 1)
+    n_days, n_buckets = len(day_values), len(AGE_LABELS)
+
+    # Supply: free fish per (day, tank), then summed per (day, age bucket)
+    tank_ids, dobs, males, females = _facility_stock(facility_id)
+    free_males = np.broadcast_to(males, (n_days, len(tank_ids))).copy()
+    free_females = np.broadcast_to(females, (n_days, len(tank_ids))).copy()
+
+    if len(tank_ids):
+        reservations = FishReservationModel.query.filter(
+            FishReservationModel.tank_id.in_(tank_ids.tolist()),
+            FishReservationModel.breeding_date >= start_date,
+            FishReservationModel.breeding_date <= end_date
+        ).all()
+        if reservations:
+            tank_index = np.searchsorted(tank_ids, [row.tank_id for row in reservations])
+            day_index = (np.array([row.breeding_date for row in reservations], dtype='datetime64[D]')
+                         - day_values[0]).astype(np.int64)
+            np.subtract.at(free_males, (day_index, tank_index), [row.reserved_males for row in reservations])
+            np.subtract.at(free_females, (day_index, tank_index), [row.reserved_females for row in reservations])
+    np.clip(free_males, 0, None, out=free_males)
+    np.clip(free_females, 0, None, out=free_females)
+
+    ages = (day_values[:, None] - dobs[None, :]).astype(np.int64)
+    born = ages >= 0
+    cell = np.arange(n_days)[:, None] * n_buckets + np.digitize(ages, AGE_BUCKETS)
+    size = n_days * n_buckets
+    supply_males = np.bincount(cell[born], weights=free_males[born], minlength=size).reshape(n_days, n_buckets)
+    supply_females = np.bincount(cell[born], weights=free_females[born], minlength=size).reshape(n_days, n_buckets)
+
+    # Demand: fish requests per (day, requested age bucket)
+    requests = _requests(facility_id, start_date, end_date)
+    request_days = np.array([request[0] for request in requests], dtype='datetime64[D]')
+    request_day_index = (request_days - day_values[0]).astype(np.int64)
+    is_fish = np.array([request[1] == 'fish' for request in requests], dtype=bool)
+    requested_ages = np.array([_dpf(request[2]) for request in requests], dtype=np.int64)
+    known_age = is_fish & (requested_ages >= 0)
+
+    demand = np.bincount(
+        request_day_index[known_age] * n_buckets + np.digitize(requested_ages[known_age], AGE_BUCKETS),
+        minlength=size
+    ).reshape(n_days, n_buckets)
+    other_requests = np.bincount(request_day_index[~known_age], minlength=n_days)
+
+    needed = demand * fish_per_request
+    shortfall = np.maximum(needed - np.minimum(supply_males, supply_females), 0)
+
+    return [{
+        'date': str(day_values[d]),
+        'other_requests': int(other_requests[d]),
+        'buckets': [{
+            'age': AGE_LABELS[b],
+            'requests': int(demand[d, b]),
+            'fish_needed': int(needed[d, b]),
+            'males_free': int(supply_males[d, b]),
+            'females_free': int(supply_females[d, b]),
+            'shortfall': int(shortfall[d, b])
+        } for b in range(n_buckets)],
+        'can_meet_demand': bool((shortfall[d] == 0).all())
+    } for d in range(n_days)]
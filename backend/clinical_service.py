@@ -0,0 +1,181 @@
+from datetime import date, timedelta
+
+from sqlalchemy import String, cast, text
+from sqlalchemy.dialects.postgresql import ARRAY, array
+
+from config import db
+from facility_cache import FacilityCache
+from models_db import ClinicalCaseModel, ClinicalNoteModel, RackModel, TankModel, UserModel
+from pagination import keyset_after
+
+OPEN_STATUS = 'Open'
+CLOSED_STATUS = 'Closed'
+CASE_STATUSES = (OPEN_STATUS, CLOSED_STATUS)
+
+SYMPTOM_TREND_GROUPS = {
+    'rack': ('r.id', 'r.name'),
+    'line': ('NULL::integer', "COALESCE(t.line, 'Unknown')")
+}
+MAX_TREND_WEEKS = 104
+
+symptom_trend_cache = FacilityCache(ttl=600)
+
+
+def cases_query(facility_id, filters):
+    """Clinical cases joined to their tank, rack and reporter in one query.
+
+    Rows carry the case plus tank_position, rack_name and reporter columns.
+    Supported filters (all optional): status, tank_id, rack_id, date_from
+    and date_to (ISO dates, inclusive), and symptom (repeatable; a case
+    must have all of them). The facility/status/report_date filters are
+    served by ix_clinical_cases_facility_status_date and the symptom
+    filter, an array @> containment, by the GIN index on symptoms.
+    """
+    query = db.session.query(
+        ClinicalCaseModel,
+        TankModel.position.label('tank_position'),
+        RackModel.name.label('rack_name'),
+        UserModel.username.label('reporter')
+    ).outerjoin(
+        TankModel, TankModel.id == ClinicalCaseModel.tank_id
+    ).outerjoin(
+        RackModel, RackModel.id == TankModel.rack_id
+    ).outerjoin(
+        UserModel, UserModel.id == ClinicalCaseModel.user_id
+    )
+
+    if facility_id:
+        query = query.filter(ClinicalCaseModel.facility_id == facility_id)
+    if filters.get('status'):
+        query = query.filter(ClinicalCaseModel.status == filters['status'])
+    if filters.get('tank_id'):
+        query = query.filter(ClinicalCaseModel.tank_id == int(filters['tank_id']))
+    if filters.get('rack_id'):
+        query = query.filter(TankModel.rack_id == int(filters['rack_id']))
+    if filters.get('date_from'):
+        query = query.filter(ClinicalCaseModel.report_date >= date.fromisoformat(filters['date_from']))
+    if filters.get('date_to'):
+        query = query.filter(ClinicalCaseModel.report_date <= date.fromisoformat(filters['date_to']))
+    symptoms = filters.getlist('symptom') if hasattr(filters, 'getlist') else filters.get('symptom')
+    if symptoms:
+        # Cast so the literal matches the column's varchar[] and the GIN index applies
+        values = [symptoms] if isinstance(symptoms, str) else list(symptoms)
+        query = query.filter(ClinicalCaseModel.symptoms.contains(cast(array(values), ARRAY(String))))
+
+    return query
+
+
+def adjust_open_cases(tank_id, delta):
+    """Add `delta` to the open-case counters of a tank and its rack.
+
+    Both are relative UPDATEs, so concurrent requests cannot lose counts.
+    The caller must commit.
+    """
+    if not delta:
+        return
+    TankModel.query.filter(TankModel.id == tank_id).update(
+        {TankModel.open_case_count: TankModel.open_case_count + delta},
+        synchronize_session=False
+    )
+    rack_id = db.session.query(TankModel.rack_id).filter(TankModel.id == tank_id).scalar_subquery()
+    RackModel.query.filter(RackModel.id == rack_id).update(
+        {RackModel.open_case_count: RackModel.open_case_count + delta},
+        synchronize_session=False
+    )
+
+
+def open_case_delta(old_status, new_status):
+    """+1, -1 or 0 for a case moving between statuses"""
+    return int(new_status == OPEN_STATUS) - int(old_status == OPEN_STATUS)
+
+
+def case_notes_page(case_id, limit, cursor_values=None):
+    """One page of a case's notes, newest first, with author usernames.
+
+    Keyset pagination on (created_at, id) over ix_clinical_notes_case_created,
+    so later pages cost the same as the first. Returns (rows, has_more);
+    rows are (note, username) pairs.
+    """
+    query = db.session.query(
+        ClinicalNoteModel,
+        UserModel.username
+    ).outerjoin(
+        UserModel, ClinicalNoteModel.user_id == UserModel.id
+    ).filter(
+        ClinicalNoteModel.case_id == case_id
+    )
+    if cursor_values:
+        query = query.filter(keyset_after(
+            [ClinicalNoteModel.created_at, ClinicalNoteModel.id], cursor_values, descending=True
+        ))
+    rows = query.order_by(
+        ClinicalNoteModel.created_at.desc(), ClinicalNoteModel.id.desc()
+    ).limit(limit + 1).all()
+    return rows[:limit], len(rows) > limit
+
+
+def case_note_count(case_id):
+    return db.session.query(db.func.count(ClinicalNoteModel.id)).filter(
+        ClinicalNoteModel.case_id == case_id
+    ).scalar()
+
+
+def compute_symptom_trends(facility_id, weeks, group_by):
+    """Symptom counts per week and rack or line, computed in SQL.
+
+    Each case's symptoms are expanded with unnest and counted with one
+    GROUP BY, so only the aggregated rows leave the database.
+    """
+    group_id, group_name = SYMPTOM_TREND_GROUPS[group_by]
+    since = date.today() - timedelta(weeks=weeks)
+    facility_filter = 'AND c.facility_id = :facility_id' if facility_id is not None else ''
+
+    rows = db.session.execute(text(f"""
+        SELECT date_trunc('week', c.report_date)::date AS week,
+               {group_id} AS group_id,
+               {group_name} AS group_name,
+               s.symptom,
+               COUNT(*) AS cases
+        FROM clinical_cases c
+        JOIN tanks t ON t.id = c.tank_id
+        JOIN racks r ON r.id = t.rack_id
+        CROSS JOIN LATERAL unnest(c.symptoms) AS s(symptom)
+        WHERE c.report_date >= :since {facility_filter}
+        GROUP BY 1, 2, 3, 4
+        ORDER BY 1, 3, cases DESC, 4
+    """), {'since': since, 'facility_id': facility_id}).all()
+
+    totals = {}
+    trend = []
+    for row in rows:
+        totals[row.symptom] = totals.get(row.symptom, 0) + row.cases
+        entry = {'week': row.week.isoformat(), 'symptom': row.symptom, 'cases': row.cases}
+        if group_by == 'rack':
+            entry['rack_id'] = row.group_id
+            entry['rack_name'] = row.group_name
+        else:
+            entry['line'] = row.group_name
+        trend.append(entry)
+
+    return {
+        'weeks': weeks,
+        'group_by': group_by,
+        'since': since.isoformat(),
+        'totals': [{'symptom': symptom, 'cases': cases}
+                   for symptom, cases in sorted(totals.items(), key=lambda item: (-item[1], item[0]))],
+        'rows': trend
+    }
+
+
+def get_symptom_trends(facility_id, weeks, group_by):
+    """Cached per facility; see invalidate_symptom_trends"""
+    key = (weeks, group_by, date.today())
+    cached = symptom_trend_cache.get(facility_id, key=key)
+    if cached is not None:
+        return cached
+    return symptom_trend_cache.set(facility_id, compute_symptom_trends(facility_id, weeks, group_by), key=key)
+
+
+def invalidate_symptom_trends(facility_id):
+    """Call whenever cases are created or deleted"""
+    symptom_trend_cache.invalidate(facility_id)
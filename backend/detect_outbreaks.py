@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta
+from config import app, db
+from models_db import NotificationModel
+from email_queue import email_pool
+from notification_service import create_notification
+from outbreak import find_clusters, WINDOW_DAYS
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("outbreak-detection")
+
+ALERT_CATEGORY = 'outbreak_alert'
+# A rack is not alerted again within this many hours of its last alert
+ALERT_COOLDOWN_HOURS = 24
+MAX_LISTED_POSITIONS = 20
+EMAIL_DRAIN_SECONDS = 300
+
+def _priority(cluster):
+    return (cluster.kind == 'rack', len(cluster.tank_ids))
+
+def _message(cluster):
+    positions = ', '.join(cluster.positions[:MAX_LISTED_POSITIONS])
+    if len(cluster.positions) > MAX_LISTED_POSITIONS:
+        positions += f" and {len(cluster.positions) - MAX_LISTED_POSITIONS} more"
+    if cluster.kind == 'rack':
+        scope = f"{len(cluster.tank_ids)} tanks on rack {cluster.rack_name}"
+    else:
+        scope = f"{len(cluster.tank_ids)} neighbouring tanks on rack {cluster.rack_name}"
+    return (f"Possible outbreak: {cluster.cases} clinical cases ({cluster.fish} fish) in {scope} "
+            f"over the last {WINDOW_DAYS} days: {positions}")[:500]
+
+def detect_outbreaks():
+    """Scan recent clinical cases for spatial clusters and alert each facility.
+
+    Meant to run periodically (e.g. hourly). Racks alerted within the
+    cooldown are skipped so one cluster does not notify users every run.
+    """
+    with app.app_context():
+        clusters = [cluster for cluster in find_clusters() if cluster.facility_id is not None]
+        logger.info(f"Found {len(clusters)} case clusters")
+        if not clusters:
+            return
+        
+        since = datetime.utcnow() - timedelta(hours=ALERT_COOLDOWN_HOURS)
+        recently_alerted = set(db.session.query(
+            NotificationModel.facility_id, NotificationModel.reference_id
+        ).filter(
+            NotificationModel.category == ALERT_CATEGORY,
+            NotificationModel.created_at >= since
+        ).group_by(NotificationModel.facility_id, NotificationModel.reference_id).all())
+        
+        # One alert per rack: the rack-wide cluster if any, else its largest neighbourhood
+        by_rack = {}
+        for cluster in clusters:
+            key = (cluster.facility_id, cluster.rack_id)
+            current = by_rack.get(key)
+            if current is None or _priority(cluster) > _priority(current):
+                by_rack[key] = cluster
+        
+        sent = 0
+        for (facility_id, rack_id), cluster in by_rack.items():
+            if (facility_id, rack_id) in recently_alerted:
+                continue
+            try:
+                if create_notification(
+                    facility_id=facility_id,
+                    sender_id=None,
+                    message=_message(cluster),
+                    category=ALERT_CATEGORY,
+                    reference_id=rack_id
+                ):
+                    sent += 1
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Error alerting facility {facility_id} about rack {rack_id}: {str(e)}")
+        
+        logger.info(f"Sent outbreak alerts for {sent} racks")
+        
+        # Email workers are daemon threads; let them finish before the script exits
+        if not email_pool.drain(timeout=EMAIL_DRAIN_SECONDS):
+            logger.warning(f"Email queue not drained: {email_pool.stats()}")
+
+if __name__ == "__main__":
+    detect_outbreaks()
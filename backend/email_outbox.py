@@ -0,0 +1,229 @@
+import os
+import smtplib
+import threading
+from datetime import datetime, timedelta
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from sqlalchemy import insert
+
+from config import app, db
+from email_queue import email_pool
+from models_db import EmailOutboxModel
+
+# Environment variables override app config, e.g. to point at a local
+# aiosmtpd stand-in: SMTP_SERVER=localhost SMTP_PORT=8025 SMTP_STARTTLS=false SMTP_USERNAME=
+SMTP_SERVER = os.environ.get('SMTP_SERVER', app.config.get('SMTP_SERVER', 'smtp.gmail.com'))
+SMTP_PORT = int(os.environ.get('SMTP_PORT', app.config.get('SMTP_PORT', 587)))
+SMTP_USERNAME = os.environ.get('SMTP_USERNAME', app.config.get('SMTP_USERNAME', ''))
+SMTP_PASSWORD = os.environ.get('SMTP_PASSWORD', app.config.get('SMTP_PASSWORD', ''))
+SMTP_STARTTLS = os.environ.get('SMTP_STARTTLS', 'true').lower() not in ('0', 'false', 'no')
+SMTP_TIMEOUT = int(os.environ.get('SMTP_TIMEOUT', 30))
+EMAIL_FROM = os.environ.get('EMAIL_FROM', app.config.get('EMAIL_FROM', 'Zebrafish Registry <your-email@gmail.com>'))
+
+OUTBOX_BATCH_SIZE = 50
+MAX_ATTEMPTS = 8
+# Retry n waits RETRY_BASE_SECONDS * 2**(n-1), capped at RETRY_MAX_SECONDS
+RETRY_BASE_SECONDS = 30
+RETRY_MAX_SECONDS = 6 * 3600
+
+# Set while a wake-up is queued and not yet started, so a burst of emails queues only one
+_wake_queued = threading.Event()
+_wake_lock = threading.Lock()
+
+
+def enqueue_emails(messages):
+    """Add (to_email, subject, html_content) tuples to the outbox in one INSERT.
+
+    Runs in the caller's transaction, so the emails are saved exactly when
+    the change that triggered them is; call wake_sender() after commit.
+    """
+    rows = [{'to_email': to_email, 'subject': subject, 'html_content': html_content,
+             'next_attempt_at': datetime.utcnow(), 'created_at': datetime.utcnow()}
+            for to_email, subject, html_content in messages]
+    if rows:
+        db.session.execute(insert(EmailOutboxModel), rows)
+    return len(rows)
+
+
+def wake_sender():
+    """Ask an email worker to drain the outbox now rather than at the next scheduled run.
+
+    Wake-ups are coalesced: while one is queued and hasn't started, further
+    calls do nothing, since that run will pick up every pending row. It
+    doesn't wait for room in a full worker queue either; if the pool drops
+    the wake-up, the rows stay pending for the next one.
+    """
+    with _wake_lock:
+        if _wake_queued.is_set():
+            return
+        _wake_queued.set()
+    if not email_pool.submit(_deliver_in_app_context, timeout=0):
+        _wake_queued.clear()
+
+
+def _deliver_in_app_context():
+    # Rows committed from here on need a new wake-up
+    _wake_queued.clear()
+    with app.app_context():
+        deliver_pending()
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS))
+
+
+class SmtpUnavailable(Exception):
+    """No SMTP session could be set up; says nothing about the message being sent"""
+
+
+class SmtpConnection:
+    """One authenticated SMTP session reused for many messages, reconnecting when dropped"""
+
+    def __init__(self):
+        self._server = None
+
+    def _connect(self):
+        # Any failure here (refused greeting, EHLO, STARTTLS or login) is an
+        # outage, even when the server answered with a 5xx reply
+        server = None
+        try:
+            server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=SMTP_TIMEOUT)
+            server.ehlo_or_helo_if_needed()
+            if SMTP_STARTTLS:
+                server.starttls()
+                server.ehlo_or_helo_if_needed()
+            if SMTP_USERNAME:
+                server.login(SMTP_USERNAME, SMTP_PASSWORD)
+        except (smtplib.SMTPException, OSError) as e:
+            if server is not None:
+                server.close()
+            raise SmtpUnavailable(f"{SMTP_SERVER}:{SMTP_PORT} unavailable: {e}") from e
+        self._server = server
+
+    def send(self, to_email, subject, html_content):
+        msg = MIMEMultipart('alternative')
+        msg['Subject'] = subject
+        msg['From'] = EMAIL_FROM
+        msg['To'] = to_email
+        msg.attach(MIMEText(html_content, 'html'))
+
+        if self._server is None:
+            self._connect()
+        try:
+            self._server.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            # Servers close idle sessions; reconnect once and retry this message
+            self._server = None
+            self._connect()
+            self._server.send_message(msg)
+
+    def reset(self):
+        """Drop the session after a connection-level error; the next send reconnects"""
+        server, self._server = self._server, None
+        if server is not None:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def close(self):
+        server, self._server = self._server, None
+        if server is not None:
+            try:
+                server.quit()
+            except Exception:
+                server.close()
+
+
+def _connection_error(error):
+    # Anything but a reply to one message means the session itself is unusable
+    return not isinstance(error, (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused))
+
+
+def _permanent(error):
+    # 5xx replies (bad address, rejected content) won't succeed on retry
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code >= 500
+
+
+def deliver_pending(batch_size=OUTBOX_BATCH_SIZE, max_batches=None):
+    """Send due outbox rows over one SMTP connection; returns (sent, retried, failed).
+
+    Rows are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so several
+    workers or job runs can drain concurrently without sending a message
+    twice. Each batch is committed as soon as it is processed. A message
+    that can't be sent is retried with exponential backoff, and marked
+    'failed' after MAX_ATTEMPTS or on a permanent (5xx) rejection. If the
+    server can't be reached or refuses the session, the run stops early
+    and leaves the rest due; an outage never counts as a failed attempt.
+    """
+    sent = retried = failed = batches = 0
+    connection = SmtpConnection()
+    try:
+        while max_batches is None or batches < max_batches:
+            now = datetime.utcnow()
+            rows = EmailOutboxModel.query.filter(
+                EmailOutboxModel.status == 'pending',
+                EmailOutboxModel.next_attempt_at <= now
+            ).order_by(
+                EmailOutboxModel.next_attempt_at, EmailOutboxModel.id
+            ).limit(batch_size).with_for_update(skip_locked=True).all()
+            if not rows:
+                break
+            batches += 1
+
+            server_down = False
+            for row in rows:
+                try:
+                    connection.send(row.to_email, row.subject, row.html_content)
+                    row.status = 'sent'
+                    row.sent_at = datetime.utcnow()
+                    sent += 1
+                except (smtplib.SMTPException, OSError, SmtpUnavailable) as e:
+                    row.last_error = str(e)[:500]
+                    print(f"Failed to send email {row.id} to {row.to_email}: {str(e)}")
+                    if _connection_error(e):
+                        # The server is the problem, not this message: retry later without
+                        # using up an attempt, and leave the rest of the batch pending
+                        # rather than timing out on each row
+                        server_down = True
+                        connection.reset()
+                        row.next_attempt_at = now + retry_delay(1)
+                        retried += 1
+                        break
+                    row.attempts += 1
+                    if _permanent(e) or row.attempts >= MAX_ATTEMPTS:
+                        row.status = 'failed'
+                        failed += 1
+                    else:
+                        row.next_attempt_at = now + retry_delay(row.attempts)
+                        retried += 1
+
+            db.session.commit()
+            if server_down:
+                break
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        connection.close()
+    return sent, retried, failed
+
+
+def purge_sent(days):
+    """Delete sent rows older than `days`; returns how many were removed"""
+    removed = EmailOutboxModel.query.filter(
+        EmailOutboxModel.status == 'sent',
+        EmailOutboxModel.sent_at < datetime.utcnow() - timedelta(days=days)
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return removed
+
+
+def outbox_stats():
+    """Counts of outbox rows by status"""
+    return dict(db.session.query(
+        EmailOutboxModel.status, db.func.count(EmailOutboxModel.id)
+    ).group_by(EmailOutboxModel.status).all())
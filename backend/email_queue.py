@@ -0,0 +1,126 @@
+import os
+import queue
+import threading
+from collections import deque
+
+# Worker threads sending queued emails, and how many emails may wait for them
+EMAIL_WORKERS = int(os.environ.get('EMAIL_WORKERS', 4))
+EMAIL_QUEUE_SIZE = int(os.environ.get('EMAIL_QUEUE_SIZE', 1000))
+# How long submit() waits for room in a full queue before using the overflow
+EMAIL_SUBMIT_TIMEOUT = float(os.environ.get('EMAIL_SUBMIT_TIMEOUT', 2))
+# Emails held in the overflow at most; beyond that they are dropped
+EMAIL_OVERFLOW_SIZE = int(os.environ.get('EMAIL_OVERFLOW_SIZE', 1000))
+
+
+class EmailWorkerPool:
+    """Fixed pool of threads sending emails from a bounded queue.
+
+    When the queue is full, submit() waits up to EMAIL_SUBMIT_TIMEOUT for
+    room, which slows a burst of notifications down to the workers' pace.
+    If the queue is still full the email goes to an overflow list that the
+    workers move back into the queue as they free up. The overflow is
+    bounded too: once it holds `max_overflow` emails, further ones are
+    dropped and counted. Workers start on the first submit, so importing
+    this module from scripts costs nothing.
+    """
+
+    def __init__(self, workers=EMAIL_WORKERS, maxsize=EMAIL_QUEUE_SIZE, submit_timeout=EMAIL_SUBMIT_TIMEOUT,
+                 max_overflow=EMAIL_OVERFLOW_SIZE):
+        self.workers = workers
+        self.submit_timeout = submit_timeout
+        self.max_overflow = max_overflow
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._overflow = deque()
+        self._lock = threading.Lock()
+        self._threads = []
+        self.completed = 0
+        self.failed = 0
+        self.overflowed = 0
+        self.dropped = 0
+
+    def _start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f'email-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _run(self):
+        while True:
+            func, args = self._queue.get()
+            try:
+                ok = func(*args)
+                with self._lock:
+                    if ok is False:
+                        self.failed += 1
+                    else:
+                        self.completed += 1
+            except Exception as e:
+                with self._lock:
+                    self.failed += 1
+                print(f"Error in email worker: {str(e)}")
+            finally:
+                # Refill before task_done so drain() never sees an empty queue with overflow left
+                with self._lock:
+                    self._refill()
+                self._queue.task_done()
+
+    def _refill(self):
+        # Caller holds self._lock
+        while self._overflow:
+            try:
+                self._queue.put_nowait(self._overflow[0])
+            except queue.Full:
+                return
+            self._overflow.popleft()
+
+    def submit(self, func, *args, timeout=None):
+        """Queue func(*args) for a worker; returns False if it was dropped because the overflow is full"""
+        self._start()
+        try:
+            self._queue.put((func, args), timeout=self.submit_timeout if timeout is None else timeout)
+            return True
+        except queue.Full:
+            with self._lock:
+                self._overflow.append((func, args))
+                # A slot may have freed up since the put timed out
+                self._refill()
+                kept = len(self._overflow) <= self.max_overflow
+                if kept:
+                    self.overflowed += 1
+                else:
+                    # Still in the overflow, so it's this email at the end
+                    self._overflow.pop()
+                    self.dropped += 1
+            if kept:
+                print(f"Email queue full ({self._queue.maxsize}), keeping email in the overflow")
+            else:
+                print(f"Email queue and overflow full ({self.max_overflow}), dropping email")
+            return kept
+
+    def drain(self, timeout=None):
+        """Wait until every queued email was handled; returns False on timeout.
+
+        Scripts call this before exiting, since the workers are daemon threads.
+        """
+        with self._queue.all_tasks_done:
+            return self._queue.all_tasks_done.wait_for(lambda: not self._queue.unfinished_tasks, timeout)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'queue_capacity': self._queue.maxsize,
+                'overflow_depth': len(self._overflow),
+                'overflow_capacity': self.max_overflow,
+                'workers': self.workers,
+                'completed': self.completed,
+                'failed': self.failed,
+                'overflowed': self.overflowed,
+                'dropped': self.dropped
+            }
+
+
+email_pool = EmailWorkerPool()
@@ -1,58 +1,25 @@
 # Create new file: backend/email_service.py
-import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
 from datetime import datetime
-from config import app
-
-# Configure email settings
-SMTP_SERVER = app.config.get('SMTP_SERVER', 'smtp.gmail.com')
-SMTP_PORT = app.config.get('SMTP_PORT', 587)
-SMTP_USERNAME = app.config.get('SMTP_USERNAME', 'your-email@gmail.com')
-SMTP_PASSWORD = app.config.get('SMTP_PASSWORD', 'your-app-password')
-EMAIL_FROM = app.config.get('EMAIL_FROM', 'Zebrafish Registry <your-email@gmail.com>')
+from config import db
+from email_outbox import enqueue_emails, wake_sender
 
 def send_email(to_email, subject, html_content):
-    """Send an HTML email"""
+    """Queue an HTML email in the outbox; it is sent by email_outbox.deliver_pending"""
     try:
-        # Create message container
-        msg = MIMEMultipart('alternative')
-        msg['Subject'] = subject
-        msg['From'] = EMAIL_FROM
-        msg['To'] = to_email
-        
-        # Create HTML content
-        html_part = MIMEText(html_content, 'html')
-        msg.attach(html_part)
-        
-        # Send the email
-        server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
-        server.ehlo()
-        server.starttls()
-        server.login(SMTP_USERNAME, SMTP_PASSWORD)
-        server.sendmail(EMAIL_FROM, to_email, msg.as_string())
-        server.close()
+        enqueue_emails([(to_email, subject, html_content)])
+        db.session.commit()
+        wake_sender()
         
-        print(f"Email sent successfully to {to_email}")
+        print(f"Email queued for {to_email}")
         return True
     except Exception as e:
-        print(f"Failed to send email: {str(e)}")
+        db.session.rollback()
+        print(f"Failed to queue email: {str(e)}")
         return False
 
 def send_payment_confirmation_email(user_email, plan_name, days, amount, end_date):
     """Send a payment confirmation email to the user with detailed receipt"""
     try:
-        # Email server settings from config
-        smtp_server = app.config.get('SMTP_SERVER', 'smtp.gmail.com')
-        smtp_port = app.config.get('SMTP_PORT', 587)
-        smtp_username = app.config.get('SMTP_USERNAME')
-        smtp_password = app.config.get('SMTP_PASSWORD')
-        
-        # If email credentials are not configured, log and return
-        if not smtp_username or not smtp_password:
-            print("Email credentials not configured. Skipping confirmation email.")
-            return
-        
         # Format dates nicely
         end_date_str = end_date.strftime('%B %d, %Y') if isinstance(end_date, datetime) else str(end_date)
         current_date = datetime.utcnow()
@@ -68,12 +35,6 @@ def send_payment_confirmation_email(user_email, plan_name, days, amount, end_dat
         else:
             period_text = "1 year"
         
-        # Create message
-        message = MIMEMultipart()
-        message['From'] = smtp_username
-        message['To'] = user_email
-        message['Subject'] = f"Receipt - Zebrafish Registry Subscription"
-        
         # Email body with receipt-like formatting
         body = f"""
         <html>
@@ -129,16 +90,10 @@ def send_payment_confirmation_email(user_email, plan_name, days, amount, end_dat
         </html>
         """
         
-        # Attach the HTML body
-        message.attach(MIMEText(body, 'html'))
+        if not send_email(user_email, "Receipt - Zebrafish Registry Subscription", body):
+            return False
         
-        # Connect to the server and send email
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls()
-            server.login(smtp_username, smtp_password)
-            server.send_message(message)
-            
-        print(f"Payment receipt email sent to {user_email}")
+        print(f"Payment receipt email queued for {user_email}")
         return True
         
     except Exception as e:
@@ -0,0 +1,42 @@
+import threading
+import time
+
+
+class FacilityCache:
+    """Small in-process cache of computed payloads, keyed per facility.
+
+    Entries expire after `ttl` seconds and can be dropped early with
+    invalidate() when the underlying data changes. Each worker process has
+    its own copy, so the TTL bounds how stale another worker can be.
+    """
+
+    def __init__(self, ttl=600):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, facility_id, key=None):
+        with self._lock:
+            entry = self._entries.get((facility_id, key))
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[(facility_id, key)]
+                return None
+            return value
+
+    def set(self, facility_id, value, key=None):
+        with self._lock:
+            self._entries[(facility_id, key)] = (time.monotonic() + self.ttl, value)
+        return value
+
+    def invalidate(self, facility_id):
+        """Drop every cached entry for a facility.
+
+        Entries cached under facility_id None (the super-admin view across
+        all facilities) include every facility's data, so they go too.
+        """
+        with self._lock:
+            for cache_key in [k for k in self._entries if k[0] in (facility_id, None)]:
+                del self._entries[cache_key]
@@ -0,0 +1,49 @@
+from config import app, db
+from sqlalchemy import text
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("open-case-count-fix")
+
+# Recompute the maintained counters from clinical_cases, touching only rows that drifted
+FIX_TANKS_SQL = text("""
+    UPDATE tanks t
+    SET open_case_count = COALESCE(c.open_cases, 0)
+    FROM tanks t2
+    LEFT JOIN (
+        SELECT tank_id, COUNT(*) AS open_cases
+        FROM clinical_cases
+        WHERE status = 'Open'
+        GROUP BY tank_id
+    ) c ON c.tank_id = t2.id
+    WHERE t.id = t2.id AND t.open_case_count <> COALESCE(c.open_cases, 0)
+""")
+
+FIX_RACKS_SQL = text("""
+    UPDATE racks r
+    SET open_case_count = COALESCE(t.open_cases, 0)
+    FROM racks r2
+    LEFT JOIN (
+        SELECT rack_id, SUM(open_case_count) AS open_cases
+        FROM tanks
+        GROUP BY rack_id
+    ) t ON t.rack_id = r2.id
+    WHERE r.id = r2.id AND r.open_case_count <> COALESCE(t.open_cases, 0)
+""")
+
+
+def fix_open_case_counts():
+    with app.app_context():
+        try:
+            tanks = db.session.execute(FIX_TANKS_SQL).rowcount
+            racks = db.session.execute(FIX_RACKS_SQL).rowcount
+            db.session.commit()
+            logger.info(f"Done: {tanks} tank counters and {racks} rack counters corrected")
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error fixing open case counters: {str(e)}")
+            raise
+
+
+if __name__ == "__main__":
+    fix_open_case_counts()
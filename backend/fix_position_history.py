@@ -0,0 +1,121 @@
+from config import app, db
+from sqlalchemy import text
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("position-history-fix")
+
+BATCH_SIZE = 500
+
+# Close every interval at the start of the next one, which repairs both the
+# stacked open rows left behind by swaps and any overlapping intervals
+CLOSE_INTERVALS_SQL = text("""
+    WITH ordered AS (
+        SELECT id, LEAD(start_date) OVER (PARTITION BY tank_id ORDER BY start_date, id) AS next_start
+        FROM tank_position_history
+        WHERE tank_id = ANY(:tank_ids)
+    )
+    UPDATE tank_position_history h
+    SET end_date = o.next_start
+    FROM ordered o
+    WHERE h.id = o.id
+      AND o.next_start IS NOT NULL
+      AND (h.end_date IS NULL OR h.end_date > o.next_start)
+""")
+
+DELETE_EMPTY_SQL = text("""
+    DELETE FROM tank_position_history
+    WHERE tank_id = ANY(:tank_ids) AND end_date IS NOT NULL AND end_date <= start_date
+""")
+
+# Consecutive rows at the same rack and position are merged into the first one
+ISLANDS_SQL = text("""
+    CREATE TEMP TABLE position_history_islands ON COMMIT DROP AS
+    WITH marked AS (
+        SELECT id, tank_id, start_date, end_date,
+            CASE WHEN LAG(rack_id) OVER w = rack_id
+                  AND LAG(position) OVER w = position
+                  AND LAG(end_date) OVER w = start_date
+                 THEN 0 ELSE 1 END AS is_new
+        FROM tank_position_history
+        WHERE tank_id = ANY(:tank_ids)
+        WINDOW w AS (PARTITION BY tank_id ORDER BY start_date, id)
+    ), numbered AS (
+        SELECT id, tank_id, start_date, end_date,
+            SUM(is_new) OVER (PARTITION BY tank_id ORDER BY start_date, id) AS island
+        FROM marked
+    )
+    SELECT tank_id, island,
+        (array_agg(id ORDER BY start_date, id))[1] AS keep_id,
+        array_agg(id) AS ids,
+        (array_agg(end_date ORDER BY start_date DESC, id DESC))[1] AS end_date
+    FROM numbered
+    GROUP BY tank_id, island
+    HAVING COUNT(*) > 1
+""")
+
+DELETE_MERGED_SQL = text("""
+    DELETE FROM tank_position_history h
+    USING position_history_islands i
+    WHERE h.id = ANY(i.ids) AND h.id <> i.keep_id
+""")
+
+EXTEND_KEPT_SQL = text("""
+    UPDATE tank_position_history h
+    SET end_date = i.end_date
+    FROM position_history_islands i
+    WHERE h.id = i.keep_id
+""")
+
+
+def compact_batch(tank_ids):
+    """Repair and compact the history of one batch of tanks in a single transaction"""
+    params = {'tank_ids': tank_ids}
+    closed = db.session.execute(CLOSE_INTERVALS_SQL, params).rowcount
+    emptied = db.session.execute(DELETE_EMPTY_SQL, params).rowcount
+    db.session.execute(ISLANDS_SQL, params)
+    merged = db.session.execute(DELETE_MERGED_SQL).rowcount
+    db.session.execute(EXTEND_KEPT_SQL)
+    db.session.commit()
+    return closed, emptied, merged
+
+
+def fix_position_history(batch_size=BATCH_SIZE):
+    """Close stacked open intervals and merge duplicate rows, batch by batch.
+
+    Run this once before applying the migration that adds the unique
+    open-interval index. It is safe to re-run.
+    """
+    with app.app_context():
+        last_tank_id = 0
+        totals = [0, 0, 0]
+
+        while True:
+            tank_ids = [row[0] for row in db.session.execute(text("""
+                SELECT DISTINCT tank_id FROM tank_position_history
+                WHERE tank_id > :after
+                ORDER BY tank_id
+                LIMIT :limit
+            """), {'after': last_tank_id, 'limit': batch_size})]
+
+            if not tank_ids:
+                break
+
+            try:
+                counts = compact_batch(tank_ids)
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Error compacting tanks {tank_ids[0]}-{tank_ids[-1]}: {str(e)}")
+                raise
+
+            totals = [total + count for total, count in zip(totals, counts)]
+            last_tank_id = tank_ids[-1]
+            logger.info(f"Compacted history up to tank {last_tank_id}: "
+                        f"{counts[0]} closed, {counts[1]} empty removed, {counts[2]} merged")
+
+        logger.info(f"Done: {totals[0]} intervals closed, {totals[1]} empty intervals removed, "
+                    f"{totals[2]} duplicate intervals merged")
+
+
+if __name__ == "__main__":
+    fix_position_history()
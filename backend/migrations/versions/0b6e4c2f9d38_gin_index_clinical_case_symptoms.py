@@ -0,0 +1,26 @@
+"""GIN index on clinical case symptoms
+
+Revision ID: 0b6e4c2f9d38
+Revises: f29c7b4e8a61
+Create Date: 2026-10-19 21:19:47.560912
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b6e4c2f9d38'
+down_revision = 'f29c7b4e8a61'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('clinical_cases', schema=None) as batch_op:
+        batch_op.create_index('ix_clinical_cases_symptoms', ['symptoms'], unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    with op.batch_alter_table('clinical_cases', schema=None) as batch_op:
+        batch_op.drop_index('ix_clinical_cases_symptoms')
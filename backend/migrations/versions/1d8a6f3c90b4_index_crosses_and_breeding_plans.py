@@ -0,0 +1,36 @@
+"""Index crosses by plan and tank, and breeding plans by profile and date
+
+Revision ID: 1d8a6f3c90b4
+Revises: e3b90c4a7f62
+Create Date: 2026-10-19 14:40:52.907316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1d8a6f3c90b4'
+down_revision = 'e3b90c4a7f62'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('crosses', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_crosses_plan_id'), ['plan_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_crosses_tank1_id'), ['tank1_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_crosses_tank2_id'), ['tank2_id'], unique=False)
+
+    with op.batch_alter_table('breeding_plans', schema=None) as batch_op:
+        batch_op.create_index('ix_breeding_plans_profile_date', ['profile_id', 'breeding_date'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('breeding_plans', schema=None) as batch_op:
+        batch_op.drop_index('ix_breeding_plans_profile_date')
+
+    with op.batch_alter_table('crosses', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_crosses_tank2_id'))
+        batch_op.drop_index(batch_op.f('ix_crosses_tank1_id'))
+        batch_op.drop_index(batch_op.f('ix_crosses_plan_id'))
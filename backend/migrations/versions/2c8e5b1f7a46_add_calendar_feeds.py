@@ -0,0 +1,33 @@
+"""Add per-facility calendar feed tokens
+
+Revision ID: 2c8e5b1f7a46
+Revises: 9f4c2a7e61d3
+Create Date: 2026-10-19 17:48:03.617254
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2c8e5b1f7a46'
+down_revision = '9f4c2a7e61d3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('calendar_feeds',
+    sa.Column('facility_id', sa.Integer(), nullable=False),
+    sa.Column('token', sa.String(length=64), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['facility_id'], ['facilities.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('facility_id'),
+    sa.UniqueConstraint('token')
+    )
+
+
+def downgrade():
+    op.drop_table('calendar_feeds')
@@ -0,0 +1,33 @@
+"""Soft-delete racks
+
+Deleted racks keep their row so the position history of their tanks,
+which references the rack, and their past layouts survive.
+
+Revision ID: 3a9d7c5e2f14
+Revises: 6f3b8e2a9c14
+Create Date: 2026-10-20 10:12:44.503128
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3a9d7c5e2f14'
+down_revision = '6f3b8e2a9c14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('racks', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('deleted_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    # Deleted racks and the history that points at them go for good
+    op.execute('DELETE FROM tank_position_history WHERE rack_id IN (SELECT id FROM racks WHERE deleted_at IS NOT NULL)')
+    op.execute('DELETE FROM rack_layout_snapshots WHERE rack_id IN (SELECT id FROM racks WHERE deleted_at IS NOT NULL)')
+    op.execute('DELETE FROM racks WHERE deleted_at IS NOT NULL')
+    with op.batch_alter_table('racks', schema=None) as batch_op:
+        batch_op.drop_column('deleted_at')
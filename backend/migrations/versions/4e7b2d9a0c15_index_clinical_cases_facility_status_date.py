@@ -0,0 +1,26 @@
+"""Index clinical cases by facility, status and report date
+
+Revision ID: 4e7b2d9a0c15
+Revises: b5f0c3a8d217
+Create Date: 2026-10-19 19:41:55.306182
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4e7b2d9a0c15'
+down_revision = 'b5f0c3a8d217'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('clinical_cases', schema=None) as batch_op:
+        batch_op.create_index('ix_clinical_cases_facility_status_date', ['facility_id', 'status', 'report_date'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('clinical_cases', schema=None) as batch_op:
+        batch_op.drop_index('ix_clinical_cases_facility_status_date')
@@ -0,0 +1,47 @@
+"""Add fish reservation ledger and backfill it from existing crosses
+
+Revision ID: 6b2e9d4f1c87
+Revises: 1d8a6f3c90b4
+Create Date: 2026-10-19 16:05:29.550183
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6b2e9d4f1c87'
+down_revision = '1d8a6f3c90b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('fish_reservations',
+    sa.Column('tank_id', sa.Integer(), nullable=False),
+    sa.Column('breeding_date', sa.Date(), nullable=False),
+    sa.Column('reserved_males', sa.Integer(), nullable=False),
+    sa.Column('reserved_females', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['tank_id'], ['tanks.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('tank_id', 'breeding_date')
+    )
+
+    op.execute("""
+        INSERT INTO fish_reservations (tank_id, breeding_date, reserved_males, reserved_females)
+        SELECT tank_id, breeding_date, SUM(males), SUM(females)
+        FROM (
+            SELECT c.tank1_id AS tank_id, p.breeding_date, COALESCE(c.tank1_males, 0) AS males, COALESCE(c.tank1_females, 0) AS females
+            FROM crosses c JOIN breeding_plans p ON p.id = c.plan_id
+            WHERE c.tank1_id IS NOT NULL
+            UNION ALL
+            SELECT c.tank2_id, p.breeding_date, COALESCE(c.tank2_males, 0), COALESCE(c.tank2_females, 0)
+            FROM crosses c JOIN breeding_plans p ON p.id = c.plan_id
+            WHERE c.tank2_id IS NOT NULL
+        ) uses
+        GROUP BY tank_id, breeding_date
+        HAVING SUM(males) > 0 OR SUM(females) > 0
+    """)
+
+
+def downgrade():
+    op.drop_table('fish_reservations')
@@ -0,0 +1,31 @@
+"""Keep position history of deleted tanks
+
+Drops the tank foreign key so history rows outlive the tank and
+point-in-time rack layouts still show where it stood.
+
+Revision ID: 6f3b8e2a9c14
+Revises: 8d4a2f6c1e53
+Create Date: 2026-10-19 23:41:06.218734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6f3b8e2a9c14'
+down_revision = '8d4a2f6c1e53'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('tank_position_history', schema=None) as batch_op:
+        batch_op.drop_constraint('tank_position_history_tank_id_fkey', type_='foreignkey')
+
+
+def downgrade():
+    # History of deleted tanks can't satisfy the foreign key again
+    op.execute('DELETE FROM tank_position_history WHERE tank_id NOT IN (SELECT id FROM tanks)')
+    with op.batch_alter_table('tank_position_history', schema=None) as batch_op:
+        batch_op.create_foreign_key('tank_position_history_tank_id_fkey', 'tanks', ['tank_id'], ['id'])
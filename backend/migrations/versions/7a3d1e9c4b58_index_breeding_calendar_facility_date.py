@@ -0,0 +1,26 @@
+"""Index breeding calendar entries by facility and date
+
+Revision ID: 7a3d1e9c4b58
+Revises: 2c8e5b1f7a46
+Create Date: 2026-10-19 18:20:37.941026
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a3d1e9c4b58'
+down_revision = '2c8e5b1f7a46'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('breeding_calendar', schema=None) as batch_op:
+        batch_op.create_index('ix_breeding_calendar_facility_date', ['facility_id', 'date'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('breeding_calendar', schema=None) as batch_op:
+        batch_op.drop_index('ix_breeding_calendar_facility_date')
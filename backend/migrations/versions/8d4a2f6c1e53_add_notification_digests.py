@@ -0,0 +1,45 @@
+"""Add notification digest preferences
+
+Revision ID: 8d4a2f6c1e53
+Revises: 5c1e8f3a7b92
+Create Date: 2026-10-19 22:12:38.915406
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d4a2f6c1e53'
+down_revision = '5c1e8f3a7b92'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('notification_preferences',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('digest_minutes', sa.Integer(), nullable=True),
+    sa.Column('last_digest_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    with op.batch_alter_table('notifications', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('digest_pending', sa.Boolean(), server_default='false', nullable=False))
+        batch_op.add_column(sa.Column('digest_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_notifications_digest_id', 'notifications', ['digest_id'], ['id'],
+                                    ondelete='SET NULL')
+        # Partial index: the digest job only ever looks at held rows
+        batch_op.create_index('ix_notifications_digest_pending', ['user_id'], unique=False,
+                              postgresql_where=sa.text('digest_pending'))
+
+
+def downgrade():
+    with op.batch_alter_table('notifications', schema=None) as batch_op:
+        batch_op.drop_index('ix_notifications_digest_pending')
+        batch_op.drop_constraint('fk_notifications_digest_id', type_='foreignkey')
+        batch_op.drop_column('digest_id')
+        batch_op.drop_column('digest_pending')
+
+    op.drop_table('notification_preferences')
@@ -0,0 +1,47 @@
+"""Link offspring tanks to their parent cross and add the ancestry closure table
+
+Revision ID: 9f4c2a7e61d3
+Revises: 6b2e9d4f1c87
+Create Date: 2026-10-19 17:12:44.208391
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9f4c2a7e61d3'
+down_revision = '6b2e9d4f1c87'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('tanks', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('parent_cross_id', sa.Integer(), nullable=True))
+        batch_op.create_index('ix_tanks_parent_cross_id', ['parent_cross_id'], unique=False)
+        batch_op.create_foreign_key('fk_tanks_parent_cross_id', 'crosses', ['parent_cross_id'], ['id'])
+
+    # parent_cross_id is new, so there is no existing lineage to backfill
+    op.create_table('tank_ancestry',
+    sa.Column('ancestor_id', sa.Integer(), nullable=False),
+    sa.Column('descendant_id', sa.Integer(), nullable=False),
+    sa.Column('depth', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['ancestor_id'], ['tanks.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['descendant_id'], ['tanks.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('ancestor_id', 'descendant_id')
+    )
+    with op.batch_alter_table('tank_ancestry', schema=None) as batch_op:
+        batch_op.create_index('ix_tank_ancestry_descendant', ['descendant_id', 'depth'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('tank_ancestry', schema=None) as batch_op:
+        batch_op.drop_index('ix_tank_ancestry_descendant')
+
+    op.drop_table('tank_ancestry')
+
+    with op.batch_alter_table('tanks', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_tanks_parent_cross_id', type_='foreignkey')
+        batch_op.drop_index('ix_tanks_parent_cross_id')
+        batch_op.drop_column('parent_cross_id')
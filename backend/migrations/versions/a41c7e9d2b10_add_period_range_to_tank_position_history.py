@@ -0,0 +1,36 @@
+"""Add period range and GiST index to tank position history
+
+Revision ID: a41c7e9d2b10
+Revises: 555bec31e454
+Create Date: 2026-10-19 09:12:41.381204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'a41c7e9d2b10'
+down_revision = '555bec31e454'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # btree_gist lets the plain integer tank_id share a GiST index with the range column
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    with op.batch_alter_table('tank_position_history', schema=None) as batch_op:
+        batch_op.add_column(sa.Column(
+            'period',
+            postgresql.TSTZRANGE(),
+            sa.Computed("tstzrange(start_date AT TIME ZONE 'UTC', end_date AT TIME ZONE 'UTC', '[)')", persisted=True),
+            nullable=True
+        ))
+        batch_op.create_index('ix_tank_position_history_tank_period', ['tank_id', 'period'], unique=False, postgresql_using='gist')
+
+
+def downgrade():
+    with op.batch_alter_table('tank_position_history', schema=None) as batch_op:
+        batch_op.drop_index('ix_tank_position_history_tank_period', postgresql_using='gist')
+        batch_op.drop_column('period')
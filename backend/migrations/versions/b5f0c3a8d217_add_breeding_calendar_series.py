@@ -0,0 +1,60 @@
+"""Add recurring breeding calendar series and per-occurrence exceptions
+
+Revision ID: b5f0c3a8d217
+Revises: 7a3d1e9c4b58
+Create Date: 2026-10-19 18:57:12.480663
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5f0c3a8d217'
+down_revision = '7a3d1e9c4b58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('breeding_calendar_series',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('facility_id', sa.Integer(), nullable=True),
+    sa.Column('username', sa.String(length=255), nullable=False),
+    sa.Column('request_type', sa.String(length=50), nullable=False),
+    sa.Column('fish_age', sa.String(length=50), nullable=True),
+    sa.Column('notes', sa.Text(), nullable=True),
+    sa.Column('freq', sa.String(length=10), nullable=False),
+    sa.Column('interval', sa.Integer(), nullable=False),
+    sa.Column('by_day', sa.String(length=20), nullable=True),
+    sa.Column('start_date', sa.Date(), nullable=False),
+    sa.Column('until', sa.Date(), nullable=True),
+    sa.Column('count', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['facility_id'], ['facilities.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('breeding_calendar_series', schema=None) as batch_op:
+        batch_op.create_index('ix_breeding_calendar_series_facility_window', ['facility_id', 'start_date', 'until'], unique=False)
+
+    op.create_table('breeding_calendar_exceptions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('series_id', sa.Integer(), nullable=False),
+    sa.Column('occurrence_date', sa.Date(), nullable=False),
+    sa.Column('cancelled', sa.Boolean(), nullable=False),
+    sa.Column('username', sa.String(length=255), nullable=True),
+    sa.Column('request_type', sa.String(length=50), nullable=True),
+    sa.Column('fish_age', sa.String(length=50), nullable=True),
+    sa.Column('notes', sa.Text(), nullable=True),
+    sa.ForeignKeyConstraint(['series_id'], ['breeding_calendar_series.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('series_id', 'occurrence_date', name='uq_breeding_calendar_exception_occurrence')
+    )
+
+
+def downgrade():
+    op.drop_table('breeding_calendar_exceptions')
+    with op.batch_alter_table('breeding_calendar_series', schema=None) as batch_op:
+        batch_op.drop_index('ix_breeding_calendar_series_facility_window')
+
+    op.drop_table('breeding_calendar_series')
@@ -0,0 +1,29 @@
+"""Allow only one open position history interval per tank
+
+Run fix_position_history.py before upgrading so existing tanks with
+several open intervals are repaired first.
+
+Revision ID: c7f2d81e5a39
+Revises: a41c7e9d2b10
+Create Date: 2026-10-19 11:03:17.642955
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7f2d81e5a39'
+down_revision = 'a41c7e9d2b10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('tank_position_history', schema=None) as batch_op:
+        batch_op.create_index('uq_tank_position_history_open', ['tank_id'], unique=True, postgresql_where=sa.text('end_date IS NULL'))
+
+
+def downgrade():
+    with op.batch_alter_table('tank_position_history', schema=None) as batch_op:
+        batch_op.drop_index('uq_tank_position_history_open')
@@ -0,0 +1,55 @@
+"""Add open clinical case counters to tanks and racks
+
+Revision ID: d81f6a2c3e97
+Revises: 4e7b2d9a0c15
+Create Date: 2026-10-19 20:08:14.772530
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd81f6a2c3e97'
+down_revision = '4e7b2d9a0c15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('tanks', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('open_case_count', sa.Integer(), server_default='0', nullable=False))
+
+    with op.batch_alter_table('racks', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('open_case_count', sa.Integer(), server_default='0', nullable=False))
+
+    # Backfill from the existing cases
+    op.execute("""
+        UPDATE tanks t
+        SET open_case_count = c.open_cases
+        FROM (
+            SELECT tank_id, COUNT(*) AS open_cases
+            FROM clinical_cases
+            WHERE status = 'Open'
+            GROUP BY tank_id
+        ) c
+        WHERE t.id = c.tank_id
+    """)
+    op.execute("""
+        UPDATE racks r
+        SET open_case_count = t.open_cases
+        FROM (
+            SELECT rack_id, SUM(open_case_count) AS open_cases
+            FROM tanks
+            GROUP BY rack_id
+        ) t
+        WHERE r.id = t.rack_id
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('racks', schema=None) as batch_op:
+        batch_op.drop_column('open_case_count')
+
+    with op.batch_alter_table('tanks', schema=None) as batch_op:
+        batch_op.drop_column('open_case_count')
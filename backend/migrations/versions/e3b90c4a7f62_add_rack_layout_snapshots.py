@@ -0,0 +1,44 @@
+"""Add rack layout snapshots and rack-scoped position history indexes
+
+Revision ID: e3b90c4a7f62
+Revises: c7f2d81e5a39
+Create Date: 2026-10-19 13:26:05.118437
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3b90c4a7f62'
+down_revision = 'c7f2d81e5a39'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('rack_layout_snapshots',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('rack_id', sa.Integer(), nullable=False),
+    sa.Column('taken_at', sa.DateTime(), nullable=False),
+    sa.Column('layout', sa.JSON(), nullable=False),
+    sa.ForeignKeyConstraint(['rack_id'], ['racks.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('rack_layout_snapshots', schema=None) as batch_op:
+        batch_op.create_index('ix_rack_layout_snapshots_rack_taken', ['rack_id', 'taken_at'], unique=False)
+
+    with op.batch_alter_table('tank_position_history', schema=None) as batch_op:
+        batch_op.create_index('ix_tank_position_history_rack_start', ['rack_id', 'start_date'], unique=False)
+        batch_op.create_index('ix_tank_position_history_rack_end', ['rack_id', 'end_date'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('tank_position_history', schema=None) as batch_op:
+        batch_op.drop_index('ix_tank_position_history_rack_end')
+        batch_op.drop_index('ix_tank_position_history_rack_start')
+
+    with op.batch_alter_table('rack_layout_snapshots', schema=None) as batch_op:
+        batch_op.drop_index('ix_rack_layout_snapshots_rack_taken')
+
+    op.drop_table('rack_layout_snapshots')
@@ -0,0 +1,26 @@
+"""Index clinical notes by case and creation time
+
+Revision ID: f29c7b4e8a61
+Revises: d81f6a2c3e97
+Create Date: 2026-10-19 20:52:06.118437
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f29c7b4e8a61'
+down_revision = 'd81f6a2c3e97'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('clinical_notes', schema=None) as batch_op:
+        batch_op.create_index('ix_clinical_notes_case_created', ['case_id', 'created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('clinical_notes', schema=None) as batch_op:
+        batch_op.drop_index('ix_clinical_notes_case_created')
@@ -2,7 +2,7 @@ from config import db
 from datetime import datetime
 import enum
 from enum import Enum
-from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import ARRAY, TSTZRANGE
 
 class GenderEnum(enum.Enum):
     MALE = "male"
@@ -34,6 +34,10 @@ class RackModel(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     tanks = db.relationship('TankModel', backref='rack', lazy=True)
     facility_id = db.Column(db.Integer, db.ForeignKey('facilities.id'), nullable=True)
+    # Open clinical cases across the rack's tanks, maintained by the case routes
+    open_case_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Set instead of deleting the row, so the rack's position history and past layouts survive
+    deleted_at = db.Column(db.DateTime)
 
 class TankModel(db.Model):
     __tablename__ = 'tanks'
@@ -44,10 +48,33 @@ class TankModel(db.Model):
     line = db.Column(db.String(100))
     dob = db.Column(db.Date)
     color = db.Column(db.String(50))
+    # Cross this tank's fish were bred from; crosses reference tanks too, hence use_alter
+    parent_cross_id = db.Column(
+        db.Integer,
+        db.ForeignKey('crosses.id', name='fk_tanks_parent_cross_id', use_alter=True),
+        nullable=True,
+        index=True
+    )
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Open clinical cases for this tank, maintained by the case routes
+    open_case_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     subdivisions = db.relationship('SubdivisionModel', backref='tank', lazy=True)
 
+class TankAncestryModel(db.Model):
+    """Closure table over parent_cross_id: one row per (ancestor, descendant) tank pair.
+
+    depth is the fewest generations between the two (1 = parent tank).
+    """
+    __tablename__ = 'tank_ancestry'
+    ancestor_id = db.Column(db.Integer, db.ForeignKey('tanks.id', ondelete='CASCADE'), primary_key=True)
+    descendant_id = db.Column(db.Integer, db.ForeignKey('tanks.id', ondelete='CASCADE'), primary_key=True)
+    depth = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_tank_ancestry_descendant', 'descendant_id', 'depth'),
+    )
+
 class SubdivisionModel(db.Model):
     __tablename__ = 'subdivisions'
     id = db.Column(db.Integer, primary_key=True)
@@ -98,31 +125,73 @@ class BreedingPlanModel(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     crosses = db.relationship('CrossModel', backref='plan', lazy=True)
 
+    __table_args__ = (
+        db.Index('ix_breeding_plans_profile_date', 'profile_id', 'breeding_date'),
+    )
+
 class CrossModel(db.Model):
     __tablename__ = 'crosses'
     id = db.Column(db.Integer, primary_key=True)
-    plan_id = db.Column(db.Integer, db.ForeignKey('breeding_plans.id'), nullable=False)
-    tank1_id = db.Column(db.Integer, db.ForeignKey('tanks.id'))
-    tank2_id = db.Column(db.Integer, db.ForeignKey('tanks.id'))
+    plan_id = db.Column(db.Integer, db.ForeignKey('breeding_plans.id'), nullable=False, index=True)
+    tank1_id = db.Column(db.Integer, db.ForeignKey('tanks.id'), index=True)
+    tank2_id = db.Column(db.Integer, db.ForeignKey('tanks.id'), index=True)
     tank1_males = db.Column(db.Integer, default=0)
     tank1_females = db.Column(db.Integer, default=0)
     tank2_males = db.Column(db.Integer, default=0)
     tank2_females = db.Column(db.Integer, default=0)
     breeding_result = db.Column(db.Boolean, nullable=True)  # Add this field
 
+class FishReservationModel(db.Model):
+    """Fish committed to breeding plans, per tank and breeding date"""
+    __tablename__ = 'fish_reservations'
+    tank_id = db.Column(db.Integer, db.ForeignKey('tanks.id', ondelete='CASCADE'), primary_key=True)
+    breeding_date = db.Column(db.Date, primary_key=True)
+    reserved_males = db.Column(db.Integer, nullable=False, default=0)
+    reserved_females = db.Column(db.Integer, nullable=False, default=0)
+
 class TankPositionHistoryModel(db.Model):
     __tablename__ = 'tank_position_history'
     
     id = db.Column(db.Integer, primary_key=True)
-    tank_id = db.Column(db.Integer, db.ForeignKey('tanks.id'), nullable=False)
+    # No foreign key: history outlives deleted tanks so past rack layouts stay complete
+    tank_id = db.Column(db.Integer, nullable=False)
     position = db.Column(db.String(50), nullable=False)
     rack_id = db.Column(db.Integer, db.ForeignKey('racks.id'), nullable=False)
     start_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     end_date = db.Column(db.DateTime, nullable=True)
+    # Half-open [start_date, end_date) range kept in sync by Postgres for GiST range lookups
+    period = db.Column(
+        TSTZRANGE,
+        db.Computed("tstzrange(start_date AT TIME ZONE 'UTC', end_date AT TIME ZONE 'UTC', '[)')", persisted=True)
+    )
     
-    tank = db.relationship('TankModel', backref='position_history')
+    tank = db.relationship(
+        'TankModel',
+        primaryjoin='foreign(TankPositionHistoryModel.tank_id) == TankModel.id',
+        backref=db.backref('position_history', passive_deletes='all')
+    )
     rack = db.relationship('RackModel')
 
+    __table_args__ = (
+        db.Index('ix_tank_position_history_tank_period', 'tank_id', 'period', postgresql_using='gist'),
+        # At most one open interval per tank
+        db.Index('uq_tank_position_history_open', 'tank_id', unique=True, postgresql_where=db.text('end_date IS NULL')),
+        # Delta lookups when replaying a rack's layout from a snapshot
+        db.Index('ix_tank_position_history_rack_start', 'rack_id', 'start_date'),
+        db.Index('ix_tank_position_history_rack_end', 'rack_id', 'end_date'),
+    )
+
+class RackLayoutSnapshotModel(db.Model):
+    __tablename__ = 'rack_layout_snapshots'
+    id = db.Column(db.Integer, primary_key=True)
+    rack_id = db.Column(db.Integer, db.ForeignKey('racks.id', ondelete='CASCADE'), nullable=False)
+    taken_at = db.Column(db.DateTime, nullable=False)
+    layout = db.Column(db.JSON, nullable=False)  # {position: tank_id}
+
+    __table_args__ = (
+        db.Index('ix_rack_layout_snapshots_rack_taken', 'rack_id', 'taken_at'),
+    )
+
 class BreedingCalendarModel(db.Model):
     __tablename__ = 'breeding_calendar'
     id = db.Column(db.Integer, primary_key=True)
@@ -134,6 +203,68 @@ class BreedingCalendarModel(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     facility_id = db.Column(db.Integer, db.ForeignKey('facilities.id'), nullable=True)  # Add this line
 
+    __table_args__ = (
+        db.Index('ix_breeding_calendar_facility_date', 'facility_id', 'date'),
+    )
+
+class BreedingCalendarSeriesModel(db.Model):
+    """A standing breeding request stored once and expanded per requested window.
+
+    freq is 'DAILY' or 'WEEKLY'; by_day holds comma-separated weekday codes
+    ('MO,TH') for weekly series. until is the last possible occurrence date,
+    computed from count when the series was created with one, or NULL for
+    open-ended series.
+    """
+    __tablename__ = 'breeding_calendar_series'
+    id = db.Column(db.Integer, primary_key=True)
+    facility_id = db.Column(db.Integer, db.ForeignKey('facilities.id'), nullable=True)
+    username = db.Column(db.String(255), nullable=False)
+    request_type = db.Column(db.String(50), nullable=False)
+    fish_age = db.Column(db.String(50))
+    notes = db.Column(db.Text)
+    freq = db.Column(db.String(10), nullable=False)
+    interval = db.Column(db.Integer, nullable=False, default=1)
+    by_day = db.Column(db.String(20))
+    start_date = db.Column(db.Date, nullable=False)
+    until = db.Column(db.Date)
+    count = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    exceptions = db.relationship('BreedingCalendarExceptionModel', backref='series', lazy=True,
+                                 cascade='all, delete-orphan')
+
+    __table_args__ = (
+        db.Index('ix_breeding_calendar_series_facility_window', 'facility_id', 'start_date', 'until'),
+    )
+
+class BreedingCalendarExceptionModel(db.Model):
+    """Per-occurrence change to a series: cancelled, or fields overridden"""
+    __tablename__ = 'breeding_calendar_exceptions'
+    id = db.Column(db.Integer, primary_key=True)
+    series_id = db.Column(db.Integer, db.ForeignKey('breeding_calendar_series.id', ondelete='CASCADE'), nullable=False)
+    occurrence_date = db.Column(db.Date, nullable=False)
+    cancelled = db.Column(db.Boolean, nullable=False, default=False)
+    username = db.Column(db.String(255))
+    request_type = db.Column(db.String(50))
+    fish_age = db.Column(db.String(50))
+    notes = db.Column(db.Text)
+
+    __table_args__ = (
+        db.UniqueConstraint('series_id', 'occurrence_date', name='uq_breeding_calendar_exception_occurrence'),
+    )
+
+class CalendarFeedModel(db.Model):
+    """Secret .ics feed token per facility.
+
+    version is bumped whenever calendar entries or breeding plans change,
+    so feed polls can be answered from the ETag alone.
+    """
+    __tablename__ = 'calendar_feeds'
+    facility_id = db.Column(db.Integer, db.ForeignKey('facilities.id', ondelete='CASCADE'), primary_key=True)
+    token = db.Column(db.String(64), nullable=False, unique=True)
+    version = db.Column(db.Integer, nullable=False, default=1)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 # Add to models_db.py
 class ClinicalCaseModel(db.Model):
     __tablename__ = 'clinical_cases'
@@ -155,6 +286,11 @@ class ClinicalCaseModel(db.Model):
     notes = db.relationship('ClinicalNoteModel', back_populates='case', cascade='all, delete-orphan')
     facility_id = db.Column(db.Integer, db.ForeignKey('facilities.id'), nullable=True)
 
+    __table_args__ = (
+        db.Index('ix_clinical_cases_facility_status_date', 'facility_id', 'status', 'report_date'),
+        db.Index('ix_clinical_cases_symptoms', 'symptoms', postgresql_using='gin'),
+    )
+
 class ClinicalNoteModel(db.Model):
     __tablename__ = 'clinical_notes'
     id = db.Column(db.Integer, primary_key=True)
@@ -167,6 +303,10 @@ class ClinicalNoteModel(db.Model):
     case = db.relationship('ClinicalCaseModel', back_populates='notes')
     user = db.relationship('UserModel')
 
+    __table_args__ = (
+        db.Index('ix_clinical_notes_case_created', 'case_id', 'created_at'),
+    )
+
 # Add after your other models
 class SubscriptionModel(db.Model):
     __tablename__ = 'subscriptions'
@@ -232,9 +372,53 @@ class NotificationModel(db.Model):
     category = db.Column(db.String(50), nullable=False)  # e.g., 'case_opened', 'note_added'
     reference_id = db.Column(db.Integer)  # e.g., case_id
     is_read = db.Column(db.Boolean, default=False)
+    # Held for the user's next digest instead of being shown; see send_digests.py
+    digest_pending = db.Column(db.Boolean, nullable=False, default=False, server_default='false')
+    # The digest summary this row was coalesced into
+    digest_id = db.Column(db.Integer, db.ForeignKey('notifications.id', name='fk_notifications_digest_id',
+                                                    ondelete='SET NULL'))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationships
     user = db.relationship('UserModel', foreign_keys=[user_id])
     sender = db.relationship('UserModel', foreign_keys=[sender_id])
-    facility = db.relationship('FacilityModel')
\ No newline at end of file
+    facility = db.relationship('FacilityModel')
+
+    __table_args__ = (
+        db.Index('ix_notifications_digest_pending', 'user_id', postgresql_where=db.text('digest_pending')),
+    )
+
+class EmailOutboxModel(db.Model):
+    """Outgoing email, written in the sender's transaction and delivered by email_outbox.
+
+    Rows stay 'pending' until sent, so nothing is lost across restarts;
+    failed attempts are retried at next_attempt_at with exponential backoff
+    until they give up as 'failed'.
+    """
+    __tablename__ = 'email_outbox'
+    id = db.Column(db.Integer, primary_key=True)
+    to_email = db.Column(db.String(255), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    html_content = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending', server_default='pending')  # pending, sent, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.String(500))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_email_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+
+class NotificationPreferenceModel(db.Model):
+    """Per-user digest setting; users without a row get every notification immediately.
+
+    With digest_minutes set, notifications are held and coalesced by
+    send_digests.py into one summary notification and one email per window.
+    """
+    __tablename__ = 'notification_preferences'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    digest_minutes = db.Column(db.Integer)  # None = immediate
+    last_digest_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
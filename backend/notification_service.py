@@ -1,7 +1,21 @@
-from models_db import db, NotificationModel, UserModel
-from email_service import send_email
-from datetime import datetime
-import threading
+from models_db import db, NotificationModel, NotificationPreferenceModel, UserModel
+from email_outbox import enqueue_emails, wake_sender
+from datetime import datetime, timedelta
+from sqlalchemy import Integer, case, insert, literal
+
+# Allowed digest windows in minutes; None means every notification is sent immediately
+DIGEST_WINDOWS = (60, 240, 1440)
+# Never held for a digest
+URGENT_CATEGORIES = {'outbreak_alert'}
+# (singular, plural) wording used in digest summaries
+CATEGORY_LABELS = {
+    'case_opened': ('new clinical case', 'new clinical cases'),
+    'note_added': ('case note', 'case notes'),
+    'outbreak_alert': ('outbreak alert', 'outbreak alerts')
+}
+DIGEST_CATEGORY = 'digest'
+# Most recent notifications listed in a digest email
+MAX_DIGEST_ITEMS = 20
 
 def create_notification(facility_id, sender_id, message, category, reference_id=None, exclude_user_ids=None):
     """
@@ -18,37 +32,50 @@ def create_notification(facility_id, sender_id, message, category, reference_id=
     if exclude_user_ids is None:
         exclude_user_ids = []
     
-    if sender_id not in exclude_user_ids:
-        exclude_user_ids.append(sender_id)  # Don't notify the sender
+    # Don't notify the sender; system alerts have no sender, and a NULL in
+    # the NOT IN list below would exclude every user
+    if sender_id is not None and sender_id not in exclude_user_ids:
+        exclude_user_ids.append(sender_id)
         
     try:
-        # Find all users in the facility except those excluded
-        users_to_notify = UserModel.query.filter_by(facility_id=facility_id).filter(
-            ~UserModel.id.in_(exclude_user_ids)
-        ).all()
+        recipients = db.session.query(UserModel.id).outerjoin(
+            NotificationPreferenceModel, NotificationPreferenceModel.user_id == UserModel.id
+        ).filter(UserModel.facility_id == facility_id)
+        if exclude_user_ids:
+            recipients = recipients.filter(~UserModel.id.in_(exclude_user_ids))
+        
+        # Users on a digest get the row held for send_digests.py and no email now
+        if category in URGENT_CATEGORIES:
+            digest_pending = literal(False)
+        else:
+            digest_pending = NotificationPreferenceModel.digest_minutes.isnot(None)
         
-        # Create notifications for each user
-        for user in users_to_notify:
-            notification = NotificationModel(
-                user_id=user.id,
-                sender_id=sender_id,
-                facility_id=facility_id,
-                message=message,
-                category=category,
-                reference_id=reference_id,
-                is_read=False,
-                created_at=datetime.utcnow()
-            )
-            db.session.add(notification)
-            
-            # Also send email notification in separate thread to avoid blocking
-            if user.email:
-                threading.Thread(
-                    target=send_notification_email,
-                    args=(user.email, message, category, reference_id)
-                ).start()
+        # One INSERT ... SELECT for every recipient instead of an ORM object per user
+        now = datetime.utcnow()
+        db.session.execute(insert(NotificationModel).from_select(
+            ['user_id', 'sender_id', 'facility_id', 'message', 'category', 'reference_id', 'is_read',
+             'digest_pending', 'created_at'],
+            recipients.with_entities(
+                UserModel.id,
+                literal(sender_id, Integer),
+                literal(facility_id, Integer),
+                literal(message),
+                literal(category),
+                literal(reference_id, Integer),
+                literal(False),
+                digest_pending,
+                literal(now)
+            ).statement
+        ))
+        # Emails go into the outbox in the same transaction, and are sent once it commits
+        subject, html_content = notification_email(message, category)
+        immediate = recipients.filter(UserModel.email.isnot(None))
+        if category not in URGENT_CATEGORIES:
+            immediate = immediate.filter(NotificationPreferenceModel.digest_minutes.is_(None))
+        enqueue_emails([(row.email, subject, html_content) for row in immediate.with_entities(UserModel.email)])
         
         db.session.commit()
+        wake_sender()
         return True
         
     except Exception as e:
@@ -56,62 +83,74 @@ def create_notification(facility_id, sender_id, message, category, reference_id=
         print(f"Error creating notifications: {str(e)}")
         return False
 
-def send_notification_email(email, message, category, reference_id=None):
-    """Send an email notification to a user"""
-    try:
-        # Customize subject based on category
-        if category == 'case_opened':
-            subject = "New Clinical Case Opened"
-        elif category == 'note_added':
-            subject = "New Note Added to Clinical Case"
-        else:
-            subject = "Zebrafish Facility Notification"
-            
-        # Create the email body
-        html_content = f"""
-        <html>
-        <head>
-            <style>
-                body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                .container {{ max-width: 600px; margin: 0 auto; padding: 20px; border: 1px solid #ddd; border-radius: 5px; }}
-                .header {{ text-align: center; padding-bottom: 10px; border-bottom: 2px solid #f0f0f0; margin-bottom: 20px; }}
-                .content {{ margin-bottom: 20px; }}
-                .footer {{ margin-top: 30px; font-size: 0.9em; color: #777; text-align: center; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h2>Zebrafish Registry Notification</h2>
-                </div>
-                <div class="content">
-                    <p>{message}</p>
-                    <p>Please log in to your Zebrafish Registry account to view details.</p>
-                </div>
-                <div class="footer">
-                    <p>This is an automated notification. Please do not reply to this email.</p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
-        
-        # Send the email
-        send_email(email, subject, html_content)
-        print(f"Notification email sent to {email}")
+def notification_email(message, category, items=()):
+    """Subject and HTML body of the email sent for a notification; digests list their items"""
+    # Customize subject based on category
+    if category == DIGEST_CATEGORY:
+        subject = "Your Zebrafish Facility Digest"
+    elif category == 'case_opened':
+        subject = "New Clinical Case Opened"
+    elif category == 'note_added':
+        subject = "New Note Added to Clinical Case"
+    elif category == 'outbreak_alert':
+        subject = "Possible Disease Outbreak Detected"
+    else:
+        subject = "Zebrafish Facility Notification"
         
-    except Exception as e:
-        print(f"Error sending notification email: {str(e)}")
+    item_list = ''
+    if items:
+        item_list = '<ul>' + ''.join(f'<li>{item}</li>' for item in items) + '</ul>'
+    
+    # Create the email body
+    html_content = f"""
+    <html>
+    <head>
+        <style>
+            body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
+            .container {{ max-width: 600px; margin: 0 auto; padding: 20px; border: 1px solid #ddd; border-radius: 5px; }}
+            .header {{ text-align: center; padding-bottom: 10px; border-bottom: 2px solid #f0f0f0; margin-bottom: 20px; }}
+            .content {{ margin-bottom: 20px; }}
+            .footer {{ margin-top: 30px; font-size: 0.9em; color: #777; text-align: center; }}
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <div class="header">
+                <h2>Zebrafish Registry Notification</h2>
+            </div>
+            <div class="content">
+                <p>{message}</p>
+                {item_list}
+                <p>Please log in to your Zebrafish Registry account to view details.</p>
+            </div>
+            <div class="footer">
+                <p>This is an automated notification. Please do not reply to this email.</p>
+            </div>
+        </div>
+    </body>
+    </html>
+    """
+    
+    return subject, html_content
 
 def get_user_notifications(user_id, limit=10, offset=0, unread_only=False):
-    """Get notifications for a specific user"""
-    query = NotificationModel.query.filter_by(user_id=user_id)
+    """Get notifications for a specific user; rows coalesced into a digest show as the digest only"""
+    query = NotificationModel.query.filter_by(user_id=user_id, digest_pending=False, digest_id=None)
     
     if unread_only:
         query = query.filter_by(is_read=False)
         
     return query.order_by(NotificationModel.created_at.desc()).limit(limit).offset(offset).all()
 
+def get_digest_items(digest_id, user_id):
+    """The notifications a digest summary replaced, newest first; None if it isn't the user's digest"""
+    digest = NotificationModel.query.filter_by(id=digest_id, user_id=user_id, category=DIGEST_CATEGORY).first()
+    if digest is None:
+        return None
+    return NotificationModel.query.filter_by(digest_id=digest_id).order_by(
+        NotificationModel.created_at.desc(), NotificationModel.id.desc()
+    ).all()
+
 def mark_notification_as_read(notification_id, user_id):
     """Mark a specific notification as read"""
     notification = NotificationModel.query.filter_by(
@@ -126,6 +165,127 @@ def mark_notification_as_read(notification_id, user_id):
 
 def mark_all_as_read(user_id):
     """Mark all notifications for a user as read"""
-    NotificationModel.query.filter_by(user_id=user_id, is_read=False).update({'is_read': True})
+    NotificationModel.query.filter_by(user_id=user_id, is_read=False, digest_pending=False).update({'is_read': True})
     db.session.commit()
-    return True
\ No newline at end of file
+    return True
+
+def get_digest_minutes(user_id):
+    """The user's digest window in minutes, or None for immediate notifications"""
+    preference = NotificationPreferenceModel.query.get(user_id)
+    return preference.digest_minutes if preference else None
+
+def set_digest_minutes(user_id, digest_minutes):
+    """Switch a user between immediate notifications and a digest window.
+
+    Turning digests off releases any held notifications right away. The
+    caller validates digest_minutes against DIGEST_WINDOWS and commits.
+    """
+    preference = NotificationPreferenceModel.query.get(user_id)
+    if preference is None:
+        preference = NotificationPreferenceModel(user_id=user_id)
+        db.session.add(preference)
+    if digest_minutes != preference.digest_minutes:
+        # The first digest covers a full window from now
+        preference.last_digest_at = datetime.utcnow()
+    preference.digest_minutes = digest_minutes
+    
+    if digest_minutes is None:
+        NotificationModel.query.filter_by(user_id=user_id, digest_pending=True).update(
+            {'digest_pending': False}, synchronize_session=False
+        )
+    return preference
+
+def digest_message(notifications):
+    """One-line summary of held notifications, e.g. '5 new notifications: 3 case notes, 2 new clinical cases'"""
+    counts = {}
+    for notification in notifications:
+        counts[notification.category] = counts.get(notification.category, 0) + 1
+    parts = []
+    for category, count in sorted(counts.items(), key=lambda item: (-item[1], item[0])):
+        singular, plural = CATEGORY_LABELS.get(category, (category.replace('_', ' '),) * 2)
+        parts.append(f"{count} {singular if count == 1 else plural}")
+    noun = 'notification' if len(notifications) == 1 else 'notifications'
+    return f"{len(notifications)} new {noun}: {', '.join(parts)}"[:500]
+
+def send_due_digests(now=None):
+    """Coalesce held notifications into one summary row and one email per due user.
+
+    A user is due once their digest window has passed since the last
+    digest. All held rows for due users are loaded in one query (locked
+    with SKIP LOCKED so overlapping runs never double-send) and summarised
+    with one bulk insert. The held rows are kept: one UPDATE marks them
+    read and links them to their summary through digest_id. The emails go
+    to the outbox in the same transaction. Returns the number of digests
+    sent.
+    """
+    now = now or datetime.utcnow()
+    due = [
+        preference.user_id
+        for preference in NotificationPreferenceModel.query.filter(
+            NotificationPreferenceModel.digest_minutes.isnot(None)
+        )
+        if preference.last_digest_at is None
+        or preference.last_digest_at <= now - timedelta(minutes=preference.digest_minutes)
+    ]
+    if not due:
+        return 0
+    
+    try:
+        held = NotificationModel.query.filter(
+            NotificationModel.digest_pending.is_(True),
+            NotificationModel.user_id.in_(due)
+        ).order_by(
+            NotificationModel.user_id, NotificationModel.created_at.desc(), NotificationModel.id.desc()
+        ).with_for_update(skip_locked=True).all()
+        
+        by_user = {}
+        for notification in held:
+            by_user.setdefault(notification.user_id, []).append(notification)
+        emails = dict(db.session.query(UserModel.id, UserModel.email).filter(
+            UserModel.id.in_(list(by_user)), UserModel.email.isnot(None)
+        ).all()) if by_user else {}
+        
+        summaries = []
+        messages = []
+        for user_id, notifications in by_user.items():
+            message = digest_message(notifications)
+            summaries.append({
+                'user_id': user_id,
+                'facility_id': notifications[0].facility_id,
+                'message': message,
+                'category': DIGEST_CATEGORY,
+                'is_read': False,
+                'digest_pending': False,
+                'created_at': now
+            })
+            if emails.get(user_id):
+                items = [notification.message for notification in notifications[:MAX_DIGEST_ITEMS]]
+                if len(notifications) > MAX_DIGEST_ITEMS:
+                    items.append(f"and {len(notifications) - MAX_DIGEST_ITEMS} more")
+                subject, html_content = notification_email(message, DIGEST_CATEGORY, items)
+                messages.append((emails[user_id], subject, html_content))
+        
+        if summaries:
+            digest_ids = dict(db.session.execute(
+                insert(NotificationModel).values(summaries).returning(NotificationModel.user_id, NotificationModel.id)
+            ).all())
+            NotificationModel.query.filter(
+                NotificationModel.id.in_([notification.id for notification in held])
+            ).update({
+                'digest_pending': False,
+                'is_read': True,
+                'digest_id': case(digest_ids, value=NotificationModel.user_id)
+            }, synchronize_session=False)
+        enqueue_emails(messages)
+        # Due users with nothing held start a new window too, so a burst is always coalesced
+        NotificationPreferenceModel.query.filter(
+            NotificationPreferenceModel.user_id.in_(due)
+        ).update({'last_digest_at': now}, synchronize_session=False)
+        
+        db.session.commit()
+        wake_sender()
+        return len(summaries)
+        
+    except Exception:
+        db.session.rollback()
+        raise
@@ -0,0 +1,151 @@
+import re
+from collections import namedtuple
+from datetime import date, timedelta
+from functools import lru_cache
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
+
+from config import db
+from models_db import ClinicalCaseModel, RackModel, TankModel
+
+WINDOW_DAYS = 14
+# Neighbouring tanks with cases that make a cluster
+MIN_CLUSTER_TANKS = 3
+# Tanks with cases anywhere on one rack (shared water system) that raise a rack-wide alert
+MIN_RACK_TANKS = 5
+
+# "A1", "AB12", or a range such as "A1-A2" for large tanks
+POSITION_PATTERN = re.compile(r'^([A-Z]+)(\d+)(?:-([A-Z]+)(\d+))?$')
+
+Cluster = namedtuple('Cluster', ['facility_id', 'rack_id', 'rack_name', 'kind', 'tank_ids', 'positions', 'cases', 'fish'])
+
+
+def _row_index(letters):
+    index = 0
+    for letter in letters:
+        index = index * 26 + (ord(letter) - 64)
+    return index - 1
+
+
+def position_cells(position):
+    """Grid cells (row, col), zero-based, covered by a tank position; [] if unparseable"""
+    match = POSITION_PATTERN.match((position or '').strip().upper())
+    if not match:
+        return []
+    row, col = _row_index(match.group(1)), int(match.group(2)) - 1
+    if not match.group(3):
+        return [(row, col)]
+    end_row, end_col = _row_index(match.group(3)), int(match.group(4)) - 1
+    return [(r, c) for r in range(min(row, end_row), max(row, end_row) + 1)
+            for c in range(min(col, end_col), max(col, end_col) + 1)]
+
+
+@lru_cache(maxsize=256)
+def grid_adjacency(rows, cols):
+    """Sparse (cells x cells) matrix linking each cell to its 8 neighbours and itself.
+
+    Built once per grid size and reused, so scoring a rack is a sparse
+    matrix-vector product.
+    """
+    cell = np.arange(rows * cols).reshape(rows, cols)
+    sources, targets = [], []
+    for dr in (-1, 0, 1):
+        for dc in (-1, 0, 1):
+            src = cell[max(0, -dr):rows - max(0, dr), max(0, -dc):cols - max(0, dc)]
+            dst = cell[max(0, dr):rows + min(0, dr), max(0, dc):cols + min(0, dc)]
+            sources.append(src.ravel())
+            targets.append(dst.ravel())
+    sources, targets = np.concatenate(sources), np.concatenate(targets)
+    return csr_matrix((np.ones(len(sources), dtype=np.int32), (sources, targets)), shape=(rows * cols, rows * cols))
+
+
+def _window_cases(since, facility_id=None):
+    query = db.session.query(
+        ClinicalCaseModel.facility_id,
+        ClinicalCaseModel.fish_count,
+        TankModel.id.label('tank_id'),
+        TankModel.position,
+        RackModel.id.label('rack_id'),
+        RackModel.name.label('rack_name'),
+        RackModel.rows,
+        RackModel.columns
+    ).join(
+        TankModel, TankModel.id == ClinicalCaseModel.tank_id
+    ).join(
+        RackModel, RackModel.id == TankModel.rack_id
+    ).filter(
+        ClinicalCaseModel.report_date >= since
+    )
+    if facility_id is not None:
+        query = query.filter(ClinicalCaseModel.facility_id == facility_id)
+    return query.order_by(RackModel.id).all()
+
+
+def _rack_clusters(rows):
+    """Clusters for one rack's window cases"""
+    first = rows[0]
+    tanks = {}
+    for row in rows:
+        tank = tanks.setdefault(row.tank_id, {'position': row.position, 'cases': 0, 'fish': 0,
+                                              'cells': position_cells(row.position)})
+        tank['cases'] += 1
+        tank['fish'] += row.fish_count or 0
+
+    clusters = []
+    if len(tanks) >= MIN_RACK_TANKS:
+        clusters.append(Cluster(
+            first.facility_id, first.rack_id, first.rack_name, 'rack', sorted(tanks),
+            sorted(tank['position'] for tank in tanks.values()),
+            sum(tank['cases'] for tank in tanks.values()), sum(tank['fish'] for tank in tanks.values())
+        ))
+
+    located = [(tank_id, tank) for tank_id, tank in tanks.items() if tank['cells']]
+    if len(located) < MIN_CLUSTER_TANKS:
+        return clusters
+
+    n_rows = max([first.rows or 0] + [r + 1 for _, tank in located for r, _ in tank['cells']])
+    n_cols = max([first.columns or 0] + [c + 1 for _, tank in located for _, c in tank['cells']])
+    adjacency = grid_adjacency(n_rows, n_cols)
+
+    # Tank-by-cell incidence, then tanks are adjacent if any of their cells touch
+    tank_index = np.repeat(np.arange(len(located)), [len(tank['cells']) for _, tank in located])
+    cell_index = np.array([r * n_cols + c for _, tank in located for r, c in tank['cells']])
+    incidence = csr_matrix((np.ones(len(cell_index), dtype=np.int32), (tank_index, cell_index)),
+                           shape=(len(located), n_rows * n_cols))
+    tank_adjacency = incidence @ adjacency @ incidence.T
+
+    n_components, labels = connected_components(tank_adjacency, directed=False)
+    sizes = np.bincount(labels, minlength=n_components)
+    for component in np.flatnonzero(sizes >= MIN_CLUSTER_TANKS):
+        members = [located[i] for i in np.flatnonzero(labels == component)]
+        clusters.append(Cluster(
+            first.facility_id, first.rack_id, first.rack_name, 'neighbourhood',
+            sorted(tank_id for tank_id, _ in members),
+            sorted(tank['position'] for _, tank in members),
+            sum(tank['cases'] for _, tank in members), sum(tank['fish'] for _, tank in members)
+        ))
+    return clusters
+
+
+def find_clusters(today=None, facility_id=None, window_days=WINDOW_DAYS):
+    """Spatial case clusters over the last `window_days` of clinical reports.
+
+    Each case is mapped to its tank's grid cells on the rack. Tanks are
+    linked when their cells are neighbours (8-way) in the precomputed
+    adjacency index, and connected groups of at least MIN_CLUSTER_TANKS
+    tanks are reported. A rack with cases in MIN_RACK_TANKS or more tanks
+    is also reported as a whole, since its tanks share water. One query
+    loads the window for every facility.
+    """
+    today = today or date.today()
+    rows = _window_cases(today - timedelta(days=window_days - 1), facility_id)
+
+    clusters = []
+    start = 0
+    for i in range(1, len(rows) + 1):
+        if i == len(rows) or rows[i].rack_id != rows[start].rack_id:
+            clusters.extend(_rack_clusters(rows[start:i]))
+            start = i
+    return clusters
@@ -0,0 +1,58 @@
+import base64
+import json
+from datetime import date, datetime
+
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+
+def encode_cursor(*values):
+    """Encode the sort key of the last row on a page as an opaque cursor"""
+    payload = [v.isoformat() if isinstance(v, (date, datetime)) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def decode_cursor(cursor, *types):
+    """Decode a cursor back into its sort key, converting each value with `types`.
+
+    Raises ValueError for malformed cursors so routes can answer with a 400.
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if not isinstance(payload, list) or len(payload) != len(types):
+        raise ValueError('Invalid cursor')
+
+    values = []
+    try:
+        for value, kind in zip(payload, types):
+            if kind is date:
+                values.append(date.fromisoformat(value))
+            elif kind is datetime:
+                values.append(datetime.fromisoformat(value))
+            else:
+                values.append(kind(value))
+    except (TypeError, ValueError):
+        # e.g. a number where a date belongs, or a null id
+        raise ValueError('Invalid cursor')
+    return values
+
+
+def page_size(value, default=DEFAULT_PAGE_SIZE):
+    """Clamp a requested page size to 1..MAX_PAGE_SIZE"""
+    if value in (None, ''):
+        return default
+    return max(1, min(int(value), MAX_PAGE_SIZE))
+
+
+def keyset_after(columns, values, descending=False):
+    """Build the WHERE clause selecting rows strictly after `values` in sort order"""
+    terms = []
+    for i, (column, value) in enumerate(zip(columns, values)):
+        step = column < value if descending else column > value
+        terms.append(and_(*[c == v for c, v in zip(columns[:i], values[:i])], step))
+    return or_(*terms)
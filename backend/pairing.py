@@ -0,0 +1,168 @@
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from sqlalchemy import case, func
+
+from config import db
+from models_db import FishReservationModel, GenderEnum, RackModel, SubdivisionModel, TankModel
+
+# Rest beyond this many days since the last cross earns no extra credit
+REST_CAP_DAYS = 28
+DEFAULT_MAX_FISH = 5
+
+
+def _candidate_tanks(lines, facility_id):
+    """Tanks of the target lines with per-gender stock, in one GROUP BY query"""
+    query = db.session.query(
+        TankModel.id,
+        TankModel.line,
+        TankModel.position,
+        TankModel.rack_id,
+        func.coalesce(func.sum(case(
+            (SubdivisionModel.gender == GenderEnum.MALE, SubdivisionModel.count), else_=0
+        )), 0).label('males'),
+        func.coalesce(func.sum(case(
+            (SubdivisionModel.gender == GenderEnum.FEMALE, SubdivisionModel.count), else_=0
+        )), 0).label('females')
+    ).join(
+        RackModel, RackModel.id == TankModel.rack_id
+    ).join(
+        SubdivisionModel, SubdivisionModel.tank_id == TankModel.id
+    ).filter(
+        TankModel.line.in_(lines)
+    ).group_by(TankModel.id)
+
+    if facility_id is not None:
+        query = query.filter(RackModel.facility_id == facility_id)
+    return query.all()
+
+
+def _availability(tanks, breeding_date):
+    """Free males/females and rest days per tank, from the reservation ledger.
+
+    The ledger already holds one row per tank and breeding date, so both
+    the fish reserved on the target date and each tank's most recent
+    earlier cross come from indexed aggregate queries rather than a scan
+    of crosses.
+    """
+    tank_ids = [tank.id for tank in tanks]
+    reserved = {
+        row.tank_id: row for row in FishReservationModel.query.filter(
+            FishReservationModel.tank_id.in_(tank_ids),
+            FishReservationModel.breeding_date == breeding_date
+        )
+    }
+    last_used = dict(db.session.query(
+        FishReservationModel.tank_id,
+        func.max(FishReservationModel.breeding_date)
+    ).filter(
+        FishReservationModel.tank_id.in_(tank_ids),
+        FishReservationModel.breeding_date < breeding_date
+    ).group_by(FishReservationModel.tank_id).all())
+
+    males = np.array([tank.males - (reserved[tank.id].reserved_males if tank.id in reserved else 0) for tank in tanks])
+    females = np.array([tank.females - (reserved[tank.id].reserved_females if tank.id in reserved else 0) for tank in tanks])
+    # Never-crossed tanks have rested indefinitely; rest scores clip at REST_CAP_DAYS
+    rest = np.array([
+        (breeding_date - last_used[tank.id]).days if tank.id in last_used else np.inf
+        for tank in tanks
+    ], dtype=float)
+    return np.clip(males, 0, None), np.clip(females, 0, None), rest
+
+
+def _tank_summary(tank, males, females, rest_days):
+    # Same shape as a cross side in POST /api/breeding/plans, plus context
+    return {
+        'id': tank.id,
+        'males': int(males),
+        'females': int(females),
+        'line': tank.line,
+        'position': tank.position,
+        'rack_id': tank.rack_id,
+        'rest_days': int(rest_days) if np.isfinite(rest_days) else None
+    }
+
+
+def _best_pairs(score, k):
+    """Rows and columns of the k pairs with the highest total score.
+
+    Keeping the top k pairs of a full assignment is not optimal, so this
+    solves the k-cardinality problem directly: the matrix is padded with
+    n_cols - k dummy rows and n_rows - k dummy columns that score 0 against
+    real tanks and can't be matched with each other. Every dummy then
+    absorbs one real tank, leaving exactly k real pairs.
+    """
+    n_rows, n_cols = score.shape
+    k = min(k, n_rows, n_cols)
+    if k <= 0:
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+    padded = np.zeros((n_rows + n_cols - k, n_cols + n_rows - k))
+    padded[:n_rows, :n_cols] = score
+    padded[n_rows:, n_cols:] = -np.inf
+    rows, cols = linear_sum_assignment(padded, maximize=True)
+    real = (rows < n_rows) & (cols < n_cols)
+    return rows[real], cols[real]
+
+
+def suggest_pairs(targets, breeding_date, facility_id=None, max_fish=DEFAULT_MAX_FISH, min_rest_days=0):
+    """Propose male/female tank pairs for each target.
+
+    `targets` is a list of {'line', 'partner_line', 'crosses'}; tank1 of
+    every pair supplies males from `line` and tank2 supplies females from
+    `partner_line` (the same line for an in-cross). A pair scores by the
+    fish it can actually use, min(free males, free females, max_fish),
+    plus the rest both tanks had since their last cross. Because the fish
+    term depends on both tanks, the best `crosses` pairs are found with an
+    optimal k-cardinality assignment (Hungarian algorithm, see _best_pairs)
+    rather than by sorting. Tanks are used at most once across all targets;
+    targets are served in order, so earlier ones get first pick.
+    `rest_days` is None for tanks that were never crossed.
+    """
+    lines = {target['line'] for target in targets} | {target.get('partner_line') or target['line'] for target in targets}
+    tanks = _candidate_tanks(lines, facility_id)
+    if tanks:
+        males, females, rest = _availability(tanks, breeding_date)
+    else:
+        males = females = rest = np.zeros(0)
+    lines_array = np.array([tank.line for tank in tanks], dtype=object)
+    rest_score = np.minimum(rest, REST_CAP_DAYS) / REST_CAP_DAYS
+    eligible = rest >= min_rest_days
+    used = np.zeros(len(tanks), dtype=bool)
+
+    suggestions = []
+    for target in targets:
+        line = target['line']
+        partner_line = target.get('partner_line') or line
+        wanted = int(target['crosses'])
+
+        male_side = np.flatnonzero((lines_array == line) & (males > 0) & eligible & ~used)
+        female_side = np.flatnonzero((lines_array == partner_line) & (females > 0) & eligible & ~used)
+        if line == partner_line:
+            # Within one line each tank takes the role it has more free fish for
+            male_side = male_side[males[male_side] >= females[male_side]]
+            female_side = female_side[females[female_side] > males[female_side]]
+
+        pairs = []
+        if len(male_side) and len(female_side) and wanted > 0:
+            usable = np.minimum(np.minimum.outer(males[male_side], females[female_side]), max_fish)
+            score = usable / max_fish + (rest_score[male_side][:, None] + rest_score[female_side][None, :]) / 2
+            rows, cols = _best_pairs(score, wanted)
+
+            for k in np.argsort(-score[rows, cols], kind='stable'):
+                m, f = male_side[rows[k]], female_side[cols[k]]
+                fish = usable[rows[k], cols[k]]
+                used[m] = used[f] = True
+                pairs.append({
+                    'tank1': _tank_summary(tanks[m], fish, 0, rest[m]),
+                    'tank2': _tank_summary(tanks[f], 0, fish, rest[f]),
+                    'score': round(float(score[rows[k], cols[k]]), 4)
+                })
+
+        suggestions.append({
+            'line': line,
+            'partner_line': partner_line,
+            'crosses': wanted,
+            'pairs': pairs,
+            'shortfall': max(wanted - len(pairs), 0)
+        })
+
+    return suggestions
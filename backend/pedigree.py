@@ -0,0 +1,190 @@
+from sqlalchemy import text
+
+from config import db
+from models_db import (
+    BreedingPlanModel,
+    BreedingProfileModel,
+    CrossModel,
+    RackModel,
+    TankAncestryModel,
+    TankModel
+)
+
+# Guard against runaway recursion if the parent links were ever edited by hand
+MAX_GENERATIONS = 200
+
+INSERT_ANCESTRY_SQL = text("""
+    INSERT INTO tank_ancestry (ancestor_id, descendant_id, depth)
+    SELECT ancestor_id, :tank_id, MIN(depth) + 1
+    FROM (
+        SELECT unnest(CAST(:parent_ids AS integer[])) AS ancestor_id, 0 AS depth
+        UNION ALL
+        SELECT ancestor_id, depth FROM tank_ancestry WHERE descendant_id = ANY(:parent_ids)
+    ) lineage
+    GROUP BY ancestor_id
+""")
+
+# Recomputes ancestry for a set of tanks by walking parent_cross_id links.
+# Only used when a tank that already has descendants is re-linked.
+REBUILD_ANCESTRY_SQL = text("""
+    INSERT INTO tank_ancestry (ancestor_id, descendant_id, depth)
+    WITH RECURSIVE walk (descendant_id, ancestor_id, depth) AS (
+        SELECT t.id, p.parent_id, 1
+        FROM tanks t
+        JOIN crosses c ON c.id = t.parent_cross_id
+        CROSS JOIN LATERAL unnest(ARRAY[c.tank1_id, c.tank2_id]) AS p(parent_id)
+        WHERE t.id = ANY(:tank_ids) AND p.parent_id IS NOT NULL
+        UNION
+        SELECT w.descendant_id, p.parent_id, w.depth + 1
+        FROM walk w
+        JOIN tanks t ON t.id = w.ancestor_id
+        JOIN crosses c ON c.id = t.parent_cross_id
+        CROSS JOIN LATERAL unnest(ARRAY[c.tank1_id, c.tank2_id]) AS p(parent_id)
+        WHERE p.parent_id IS NOT NULL AND w.depth < :max_depth
+    )
+    SELECT ancestor_id, descendant_id, MIN(depth)
+    FROM walk
+    GROUP BY ancestor_id, descendant_id
+""")
+
+
+def cross_for_facility(cross_id, facility_id):
+    """Return the cross if it belongs to the facility, else None"""
+    query = CrossModel.query.join(
+        BreedingPlanModel, BreedingPlanModel.id == CrossModel.plan_id
+    ).join(
+        BreedingProfileModel, BreedingProfileModel.id == BreedingPlanModel.profile_id
+    ).filter(CrossModel.id == cross_id)
+    if facility_id is not None:
+        query = query.filter(BreedingProfileModel.facility_id == facility_id)
+    return query.first()
+
+
+def _descendant_ids(tank_id):
+    return [row.descendant_id for row in TankAncestryModel.query.filter_by(ancestor_id=tank_id)]
+
+
+def set_parent_cross(tank, cross):
+    """Link a tank to the cross it was bred from (or unlink it with None).
+
+    A freshly linked tank with no offspring of its own gets its ancestry
+    with a single INSERT ... SELECT from its parents' closure rows. A tank
+    that already has descendants moves its whole subtree, so ancestry for
+    the tank and every descendant is recomputed. Raises ValueError if the
+    link would make a tank its own ancestor. The caller must commit.
+    """
+    cross_id = cross.id if cross is not None else None
+    if tank.parent_cross_id == cross_id:
+        return
+
+    parent_ids = [tank_id for tank_id in (cross.tank1_id, cross.tank2_id) if tank_id is not None] if cross else []
+    descendant_ids = _descendant_ids(tank.id)
+    if tank.id in parent_ids or set(parent_ids) & set(descendant_ids):
+        raise ValueError('A tank cannot descend from itself or its own offspring')
+
+    tank.parent_cross_id = cross_id
+    db.session.flush()
+
+    subtree = [tank.id] + descendant_ids
+    TankAncestryModel.query.filter(
+        TankAncestryModel.descendant_id.in_(subtree)
+    ).delete(synchronize_session=False)
+
+    if not descendant_ids:
+        if parent_ids:
+            db.session.execute(INSERT_ANCESTRY_SQL, {'tank_id': tank.id, 'parent_ids': parent_ids})
+    else:
+        db.session.execute(REBUILD_ANCESTRY_SQL, {'tank_ids': subtree, 'max_depth': MAX_GENERATIONS})
+
+
+def crosses_with_offspring(cross_ids):
+    """Cross ids that offspring tanks point back to"""
+    if not cross_ids:
+        return []
+    rows = db.session.query(TankModel.parent_cross_id).filter(
+        TankModel.parent_cross_id.in_(list(cross_ids))
+    ).distinct().all()
+    return [row.parent_cross_id for row in rows]
+
+
+def _relatives(tank_id, own_column, other_column):
+    return db.session.query(TankModel, TankAncestryModel.depth).join(
+        TankAncestryModel, other_column == TankModel.id
+    ).filter(
+        own_column == tank_id
+    ).order_by(TankAncestryModel.depth, TankModel.id).all()
+
+
+def get_ancestors(tank_id):
+    """[(tank, depth)] for every ancestor, nearest first, from one indexed lookup"""
+    return _relatives(tank_id, TankAncestryModel.descendant_id, TankAncestryModel.ancestor_id)
+
+
+def get_descendants(tank_id):
+    """[(tank, depth)] for every descendant, nearest first, from one indexed lookup"""
+    return _relatives(tank_id, TankAncestryModel.ancestor_id, TankAncestryModel.descendant_id)
+
+
+def lineage_graph(facility_id, tank_id=None):
+    """Pedigree as {'nodes': [...], 'edges': [...]}.
+
+    With tank_id the graph is limited to that tank, its ancestors and its
+    descendants; otherwise it covers every tank in the facility (or in all
+    facilities when facility_id is None) that has a recorded parent or
+    offspring. Each edge runs from a parent tank to an
+    offspring tank and carries the cross id.
+    """
+    if tank_id is not None:
+        relatives = get_ancestors(tank_id) + get_descendants(tank_id)
+        tanks = {tank.id: tank for tank, _ in relatives}
+        tanks[tank_id] = TankModel.query.get(tank_id)
+        children = [tank for tank in tanks.values() if tank.parent_cross_id is not None]
+    else:
+        query = TankModel.query.filter(TankModel.parent_cross_id.isnot(None))
+        if facility_id is not None:
+            query = query.join(
+                RackModel, RackModel.id == TankModel.rack_id
+            ).filter(RackModel.facility_id == facility_id)
+        children = query.all()
+        tanks = {tank.id: tank for tank in children}
+
+    crosses = {}
+    cross_ids = {tank.parent_cross_id for tank in children}
+    if cross_ids:
+        crosses = {cross.id: cross for cross in CrossModel.query.filter(CrossModel.id.in_(cross_ids))}
+
+    edges = []
+    for child in children:
+        cross = crosses.get(child.parent_cross_id)
+        if cross is None:
+            continue
+        for parent_id in (cross.tank1_id, cross.tank2_id):
+            if parent_id is None or (tank_id is not None and parent_id not in tanks):
+                continue
+            edges.append({'source': parent_id, 'target': child.id, 'cross_id': cross.id})
+
+    missing = {edge['source'] for edge in edges} - set(tanks)
+    if missing:
+        tanks.update({tank.id: tank for tank in TankModel.query.filter(TankModel.id.in_(missing))})
+
+    nodes = [{
+        'id': tank.id,
+        'line': tank.line,
+        'position': tank.position,
+        'rack_id': tank.rack_id,
+        'dob': tank.dob.isoformat() if tank.dob else None,
+        'parent_cross_id': tank.parent_cross_id
+    } for tank in sorted(tanks.values(), key=lambda t: t.id)]
+    return {'nodes': nodes, 'edges': edges}
+
+
+def graph_to_dot(graph):
+    """Render a lineage_graph() result in Graphviz DOT format"""
+    lines = ['digraph pedigree {']
+    for node in graph['nodes']:
+        label = f"{node['line'] or 'Unknown'}\\n{node['position']}".replace('"', '\\"')
+        lines.append(f'  "{node["id"]}" [label="{label}"];')
+    for edge in graph['edges']:
+        lines.append(f'  "{edge["source"]}" -> "{edge["target"]}" [label="cross {edge["cross_id"]}"];')
+    lines.append('}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,227 @@
+from bisect import bisect_right
+from collections import namedtuple
+from datetime import date, datetime, time, timezone
+
+from sqlalchemy import Integer, and_, column, select, values
+
+from config import db
+from models_db import RackModel, TankPositionHistoryModel
+
+# One row of tank_position_history, valid for start <= t < end (end is None while open)
+PositionInterval = namedtuple('PositionInterval', ['start', 'end', 'position', 'rack_id'])
+
+
+def to_utc(value):
+    """Normalise a date or datetime to a timezone-aware UTC datetime.
+
+    Plain dates resolve to midnight UTC, i.e. where the tank stood at the
+    start of that day. Naive datetimes are assumed to already be UTC, which
+    is how every timestamp in this database is stored.
+    """
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            return value.replace(tzinfo=timezone.utc)
+        return value.astimezone(timezone.utc)
+    if isinstance(value, date):
+        return datetime.combine(value, time.min, tzinfo=timezone.utc)
+    raise TypeError(f"Expected date or datetime, got {type(value).__name__}")
+
+
+def naive_utc(value):
+    """Normalise a date or datetime to a naive UTC datetime, as stored in the database"""
+    return to_utc(value).replace(tzinfo=None)
+
+
+class PositionIntervalIndex:
+    """Sorted in-memory interval index over tank position history.
+
+    Intervals are grouped per tank and sorted by start, so resolving where a
+    tank was at a given moment is a single bisect: O(log n) per lookup
+    instead of a scan over every history row.
+    """
+
+    def __init__(self, rows=()):
+        self._starts = {}
+        self._intervals = {}
+        for row in sorted(rows, key=lambda r: (r.tank_id, r.start_date)):
+            self._starts.setdefault(row.tank_id, []).append(row.start_date)
+            self._intervals.setdefault(row.tank_id, []).append(
+                PositionInterval(row.start_date, row.end_date, row.position, row.rack_id)
+            )
+
+    @classmethod
+    def for_tanks(cls, tank_ids):
+        """Build an index for the given tanks with a single query"""
+        tank_ids = list(set(tank_ids))
+        if not tank_ids:
+            return cls()
+        rows = TankPositionHistoryModel.query.filter(
+            TankPositionHistoryModel.tank_id.in_(tank_ids)
+        ).all()
+        return cls(rows)
+
+    def position_at(self, tank_id, when):
+        """Return the PositionInterval covering `when` for a tank, or None"""
+        starts = self._starts.get(tank_id)
+        if not starts:
+            return None
+
+        point = naive_utc(when)
+        i = bisect_right(starts, point) - 1
+        if i < 0:
+            return None
+
+        interval = self._intervals[tank_id][i]
+        if interval.end is not None and interval.end <= point:
+            return None
+        return interval
+
+    def resolve(self, pairs):
+        """Resolve many (tank_id, when) pairs, preserving input order"""
+        return [self.position_at(tank_id, when) for tank_id, when in pairs]
+
+
+def record_moves(moves, at=None):
+    """Move tanks and keep their position history consistent.
+
+    `moves` is an iterable of (tank, rack_id, position). Every open interval
+    for the moved tanks is closed with a single UPDATE before the new
+    intervals are added, so a tank never has more than one row with
+    end_date IS NULL. The caller owns the transaction and must commit.
+    """
+    moves = list(moves)
+    if not moves:
+        return []
+
+    at = at or datetime.utcnow()
+    tank_ids = [tank.id for tank, _, _ in moves]
+
+    # Tanks that were never moved have no history yet; record where they stood
+    # until now so point-in-time layouts see them leave their old position
+    tracked = {row.tank_id for row in db.session.query(TankPositionHistoryModel.tank_id).filter(
+        TankPositionHistoryModel.tank_id.in_(tank_ids)
+    ).distinct()}
+
+    entries = []
+    for tank, _, _ in moves:
+        if tank.id not in tracked:
+            entries.append(TankPositionHistoryModel(
+                tank_id=tank.id,
+                position=tank.position,
+                rack_id=tank.rack_id,
+                start_date=min(tank.created_at or at, at),
+                end_date=at
+            ))
+
+    TankPositionHistoryModel.query.filter(
+        TankPositionHistoryModel.tank_id.in_(tank_ids),
+        TankPositionHistoryModel.end_date.is_(None)
+    ).update({'end_date': at}, synchronize_session=False)
+
+    rack_deltas = {}
+    for tank, rack_id, position in moves:
+        # Open-case counters follow a tank to its new rack
+        if tank.rack_id != rack_id and tank.open_case_count:
+            rack_deltas[tank.rack_id] = rack_deltas.get(tank.rack_id, 0) - tank.open_case_count
+            rack_deltas[rack_id] = rack_deltas.get(rack_id, 0) + tank.open_case_count
+        tank.rack_id = rack_id
+        tank.position = position
+        entries.append(TankPositionHistoryModel(
+            tank_id=tank.id,
+            position=position,
+            rack_id=rack_id,
+            start_date=at
+        ))
+    db.session.add_all(entries)
+
+    for rack_id, delta in rack_deltas.items():
+        if delta:
+            RackModel.query.filter(RackModel.id == rack_id).update(
+                {RackModel.open_case_count: RackModel.open_case_count + delta},
+                synchronize_session=False
+            )
+    return entries[-len(moves):]
+
+
+def record_move(tank, rack_id, position, at=None):
+    """Move a single tank; see record_moves"""
+    return record_moves([(tank, rack_id, position)], at=at)[0]
+
+
+def retire_tank(tank, at=None):
+    """Close a tank's position history before the tank is deleted.
+
+    History rows outlive the tank so point-in-time rack layouts still show
+    it where it stood. A tank that was never moved gets its one interval
+    recorded here. The caller owns the transaction and must commit.
+    """
+    at = at or datetime.utcnow()
+    closed = TankPositionHistoryModel.query.filter(
+        TankPositionHistoryModel.tank_id == tank.id,
+        TankPositionHistoryModel.end_date.is_(None)
+    ).update({'end_date': at}, synchronize_session=False)
+    if closed:
+        return
+    tracked = db.session.query(TankPositionHistoryModel.id).filter(
+        TankPositionHistoryModel.tank_id == tank.id
+    ).first()
+    if not tracked:
+        db.session.add(TankPositionHistoryModel(
+            tank_id=tank.id,
+            position=tank.position,
+            rack_id=tank.rack_id,
+            start_date=min(tank.created_at or at, at),
+            end_date=at
+        ))
+
+
+def position_at(tank_id, when):
+    """Look up a single tank's history row at `when` using the GiST range index"""
+    return TankPositionHistoryModel.query.filter(
+        TankPositionHistoryModel.tank_id == tank_id,
+        TankPositionHistoryModel.period.contains(db.cast(to_utc(when), db.DateTime(timezone=True)))
+    ).first()
+
+
+def resolve_positions(pairs):
+    """Resolve many (tank_id, when) pairs with a single range join.
+
+    The pairs are sent as an inline VALUES list and outer-joined to
+    tank_position_history on `period @> when`, so the GiST index answers
+    every probe in one round trip. Returns a list aligned with `pairs`
+    holding a PositionInterval, or None where the tank had no recorded
+    position at that time.
+    """
+    pairs = list(pairs)
+    if not pairs:
+        return []
+
+    probes = values(
+        column('idx', Integer),
+        column('tank_id', Integer),
+        column('at', db.DateTime(timezone=True)),
+        name='probes'
+    ).data([(i, tank_id, to_utc(when)) for i, (tank_id, when) in enumerate(pairs)])
+
+    history = TankPositionHistoryModel.__table__
+    rows = db.session.execute(
+        select(
+            probes.c.idx,
+            history.c.start_date,
+            history.c.end_date,
+            history.c.position,
+            history.c.rack_id
+        ).select_from(probes).outerjoin(
+            history,
+            and_(
+                history.c.tank_id == probes.c.tank_id,
+                history.c.period.contains(probes.c.at)
+            )
+        )
+    ).all()
+
+    resolved = [None] * len(pairs)
+    for row in rows:
+        if row.start_date is not None:
+            resolved[row.idx] = PositionInterval(row.start_date, row.end_date, row.position, row.rack_id)
+    return resolved
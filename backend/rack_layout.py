@@ -0,0 +1,88 @@
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+from config import db
+from models_db import RackLayoutSnapshotModel, TankModel, TankPositionHistoryModel
+from position_history import naive_utc
+
+
+def _history_events(rack_id, since, until):
+    """Position history changes for a rack in (since, until], oldest first.
+
+    Each event is (timestamp, is_arrival, position, tank_id). Departures sort
+    before arrivals at the same instant so a swap never drops a tank.
+    """
+    H = TankPositionHistoryModel
+    started = H.start_date <= until
+    ended = and_(H.end_date.isnot(None), H.end_date <= until)
+    if since is not None:
+        started = and_(H.start_date > since, started)
+        ended = and_(H.end_date > since, ended)
+
+    rows = db.session.query(
+        H.tank_id, H.position, H.start_date, H.end_date
+    ).filter(H.rack_id == rack_id, or_(started, ended)).all()
+
+    events = []
+    for row in rows:
+        if (since is None or row.start_date > since) and row.start_date <= until:
+            events.append((row.start_date, True, row.position, row.tank_id))
+        if row.end_date is not None and (since is None or row.end_date > since) and row.end_date <= until:
+            events.append((row.end_date, False, row.position, row.tank_id))
+    events.sort(key=lambda event: (event[0], event[1]))
+    return events
+
+
+def layout_at(rack_id, at=None):
+    """Rebuild a rack's {position: tank_id} layout at a point in time.
+
+    Starts from the nearest snapshot taken at or before `at` and replays only
+    the position history recorded since then, so the cost depends on how
+    much changed after the snapshot rather than on the age of the rack.
+    Tanks deleted since `at` are included: their history is kept on delete.
+    Returns (layout, snapshot_taken_at).
+    """
+    at = naive_utc(at or datetime.utcnow())
+
+    snapshot = RackLayoutSnapshotModel.query.filter(
+        RackLayoutSnapshotModel.rack_id == rack_id,
+        RackLayoutSnapshotModel.taken_at <= at
+    ).order_by(RackLayoutSnapshotModel.taken_at.desc()).first()
+
+    since = snapshot.taken_at if snapshot else None
+    layout = dict(snapshot.layout) if snapshot else {}
+    placed = {tank_id: position for position, tank_id in layout.items()}
+
+    for _, is_arrival, position, tank_id in _history_events(rack_id, since, at):
+        if is_arrival:
+            # Guard against a missing departure so a tank is never shown twice
+            previous = placed.get(tank_id)
+            if previous is not None and layout.get(previous) == tank_id:
+                del layout[previous]
+            layout[position] = tank_id
+            placed[tank_id] = position
+        elif layout.get(position) == tank_id:
+            del layout[position]
+            placed.pop(tank_id, None)
+
+    # Tanks that have never moved have no history; they have been in place since creation
+    unmoved = TankModel.query.filter(
+        TankModel.rack_id == rack_id,
+        or_(TankModel.created_at.is_(None), TankModel.created_at <= at),
+        ~TankModel.position_history.any()
+    ).with_entities(TankModel.id, TankModel.position).all()
+    for tank_id, position in unmoved:
+        if tank_id not in placed:
+            layout.setdefault(position, tank_id)
+
+    return layout, since
+
+
+def take_snapshot(rack_id, at=None):
+    """Store the rack's layout at `at` (default now). The caller must commit."""
+    at = naive_utc(at or datetime.utcnow())
+    layout, _ = layout_at(rack_id, at)
+    snapshot = RackLayoutSnapshotModel(rack_id=rack_id, taken_at=at, layout=layout)
+    db.session.add(snapshot)
+    return snapshot
@@ -0,0 +1,149 @@
+from datetime import date, timedelta
+
+WEEKDAYS = ['MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU']
+FREQUENCIES = ('DAILY', 'WEEKLY')
+MAX_INTERVAL = 52
+
+
+def parse_rrule(rule):
+    """Parse the supported subset of an RFC 5545 RRULE.
+
+    Accepts FREQ (DAILY or WEEKLY), INTERVAL, BYDAY (weekly only), COUNT
+    and UNTIL (YYYYMMDD), e.g. 'FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,TH;COUNT=10'.
+    Returns a dict of freq/interval/by_day/count/until and raises
+    ValueError for anything else.
+    """
+    rule = rule.strip().upper()
+    if rule.startswith('RRULE:'):
+        rule = rule[len('RRULE:'):]
+
+    parts = {}
+    for part in rule.split(';'):
+        if not part:
+            continue
+        key, sep, value = part.partition('=')
+        if not sep or key in parts:
+            raise ValueError(f'Invalid RRULE part: {part}')
+        parts[key] = value
+
+    unsupported = set(parts) - {'FREQ', 'INTERVAL', 'BYDAY', 'COUNT', 'UNTIL'}
+    if unsupported:
+        raise ValueError(f"Unsupported RRULE parts: {', '.join(sorted(unsupported))}")
+
+    until = None
+    if parts.get('UNTIL'):
+        value = parts['UNTIL'][:8]
+        until = date(int(value[:4]), int(value[4:6]), int(value[6:8]))
+
+    return {
+        'freq': parts.get('FREQ'),
+        'interval': int(parts.get('INTERVAL', 1)),
+        'by_day': parts.get('BYDAY'),
+        'count': int(parts['COUNT']) if parts.get('COUNT') else None,
+        'until': until
+    }
+
+
+def validate_rule(freq, interval, by_day, start_date, count=None, until=None):
+    """Normalise a rule; returns (freq, interval, by_day, until) with until resolved from count"""
+    if freq not in FREQUENCIES:
+        raise ValueError(f"freq must be one of {', '.join(FREQUENCIES)}")
+    if not 1 <= interval <= MAX_INTERVAL:
+        raise ValueError(f'interval must be between 1 and {MAX_INTERVAL}')
+    if count is not None and until is not None:
+        raise ValueError('Use either count or until, not both')
+    if count is not None and count < 1:
+        raise ValueError('count must be positive')
+    if until is not None and until < start_date:
+        raise ValueError('until must not be before the start date')
+
+    if freq == 'WEEKLY':
+        if by_day and not set(by_day.split(',')) <= set(WEEKDAYS):
+            raise ValueError(f"by_day must list weekday codes from {','.join(WEEKDAYS)}")
+        days = sorted({WEEKDAYS.index(day) for day in by_day.split(',')}) if by_day else [start_date.weekday()]
+        by_day = ','.join(WEEKDAYS[day] for day in days)
+    elif by_day:
+        raise ValueError('by_day is only supported for weekly series')
+    else:
+        by_day = None
+
+    if count is not None:
+        until = _nth_occurrence(freq, interval, by_day, start_date, count)
+    return freq, interval, by_day, until
+
+
+def _weekdays(by_day):
+    return [WEEKDAYS.index(day) for day in by_day.split(',')]
+
+
+def _nth_occurrence(freq, interval, by_day, start_date, n):
+    """Date of the n-th occurrence (1-based), computed directly"""
+    if freq == 'DAILY':
+        return start_date + timedelta(days=(n - 1) * interval)
+
+    days = _weekdays(by_day)
+    week0 = start_date - timedelta(days=start_date.weekday())
+    first_week = [week0 + timedelta(days=day) for day in days if week0 + timedelta(days=day) >= start_date]
+    if n <= len(first_week):
+        return first_week[n - 1]
+    weeks, index = divmod(n - len(first_week) - 1, len(days))
+    return week0 + timedelta(days=(weeks + 1) * 7 * interval + days[index])
+
+
+def occurrence_dates(freq, interval, by_day, start_date, until, window_start, window_end):
+    """Occurrence dates of a series that fall inside [window_start, window_end].
+
+    Jumps straight to the first period that can overlap the window, so the
+    cost depends on the window size, not on how long the series has run.
+    """
+    lo = max(window_start, start_date)
+    hi = min(window_end, until) if until else window_end
+    if lo > hi:
+        return []
+
+    dates = []
+    if freq == 'DAILY':
+        step = (lo - start_date).days
+        current = start_date + timedelta(days=-(-step // interval) * interval)
+        while current <= hi:
+            dates.append(current)
+            current += timedelta(days=interval)
+        return dates
+
+    days = _weekdays(by_day)
+    period = 7 * interval
+    week0 = start_date - timedelta(days=start_date.weekday())
+    k = (lo - week0).days // period
+    while True:
+        base = week0 + timedelta(days=k * period)
+        if base > hi:
+            break
+        for day in days:
+            current = base + timedelta(days=day)
+            if lo <= current <= hi:
+                dates.append(current)
+        k += 1
+    return dates
+
+
+def first_occurrence(freq, interval, by_day, start_date, until):
+    """First occurrence date of a series, or None if it has none.
+
+    A weekly series need not occur on its start date itself; the first
+    occurrence always falls within one period of it.
+    """
+    dates = occurrence_dates(freq, interval, by_day, start_date, until,
+                             start_date, start_date + timedelta(days=7 * interval))
+    return dates[0] if dates else None
+
+
+def to_rrule(freq, interval, by_day, until):
+    """Render a stored rule back to RRULE text (for .ics export)"""
+    parts = [f'FREQ={freq}']
+    if interval != 1:
+        parts.append(f'INTERVAL={interval}')
+    if freq == 'WEEKLY' and by_day:
+        parts.append(f'BYDAY={by_day}')
+    if until:
+        parts.append(f"UNTIL={until.strftime('%Y%m%d')}")
+    return ';'.join(parts)
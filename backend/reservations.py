@@ -0,0 +1,80 @@
+from sqlalchemy.dialects.postgresql import insert
+
+from config import db
+from models_db import FishReservationModel
+
+
+def cross_uses(crosses):
+    """Total the fish a set of crosses takes from each tank.
+
+    Accepts CrossModel rows or request payloads shaped like
+    {'tank1': {'id', 'males', 'females'}, 'tank2': {...}} and returns
+    {tank_id: {'males': n, 'females': n}}.
+    """
+    uses = {}
+    for cross in crosses:
+        if isinstance(cross, dict):
+            sides = [(cross[side]['id'], cross[side].get('males'), cross[side].get('females')) for side in ('tank1', 'tank2')]
+        else:
+            sides = [
+                (cross.tank1_id, cross.tank1_males, cross.tank1_females),
+                (cross.tank2_id, cross.tank2_males, cross.tank2_females)
+            ]
+        for tank_id, males, females in sides:
+            if tank_id is None:
+                continue
+            counts = uses.setdefault(tank_id, {'males': 0, 'females': 0})
+            counts['males'] += males or 0
+            counts['females'] += females or 0
+    return uses
+
+
+def adjust_reservations(changes):
+    """Apply reservation deltas to the ledger with one upsert.
+
+    `changes` is an iterable of (breeding_date, uses, sign) where `uses` is a
+    cross_uses() result and sign is +1 to reserve or -1 to release. Deltas
+    for the same tank and date are netted before touching the table, and
+    rows that drop to zero are removed. The caller must commit.
+    """
+    net = {}
+    for breeding_date, uses, sign in changes:
+        for tank_id, counts in uses.items():
+            key = (tank_id, breeding_date)
+            males, females = net.get(key, (0, 0))
+            net[key] = (males + sign * counts['males'], females + sign * counts['females'])
+
+    rows = [{
+        'tank_id': tank_id,
+        'breeding_date': breeding_date,
+        'reserved_males': males,
+        'reserved_females': females
+    } for (tank_id, breeding_date), (males, females) in net.items() if males or females]
+    if not rows:
+        return
+
+    table = FishReservationModel.__table__
+    statement = insert(table).values(rows)
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=[table.c.tank_id, table.c.breeding_date],
+        set_={
+            'reserved_males': table.c.reserved_males + statement.excluded.reserved_males,
+            'reserved_females': table.c.reserved_females + statement.excluded.reserved_females
+        }
+    ))
+    FishReservationModel.query.filter(
+        FishReservationModel.reserved_males <= 0,
+        FishReservationModel.reserved_females <= 0
+    ).filter(
+        FishReservationModel.tank_id.in_({row['tank_id'] for row in rows})
+    ).delete(synchronize_session=False)
+
+
+def reserved_on(tank_ids, breeding_date):
+    """Return {tank_id: {'males': n, 'females': n}} reserved on a date"""
+    rows = FishReservationModel.query.filter(
+        FishReservationModel.tank_id.in_(set(tank_ids)),
+        FishReservationModel.breeding_date == breeding_date
+    ).all()
+    return {row.tank_id: {'males': row.reserved_males, 'females': row.reserved_females} for row in rows}
+
@@ -0,0 +1,29 @@
+from config import app
+from email_queue import email_pool
+from notification_service import send_due_digests
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("notification-digests")
+
+EMAIL_DRAIN_SECONDS = 300
+
+def send_digests():
+    """Coalesce held notifications into one summary and email per user.
+
+    Meant to run every few minutes; each user gets at most one digest per
+    digest window, and only if something was held for them.
+    """
+    with app.app_context():
+        try:
+            sent = send_due_digests()
+            logger.info(f"Sent {sent} notification digests")
+        except Exception as e:
+            logger.error(f"Error sending notification digests: {str(e)}")
+        
+        # Email workers are daemon threads; let them finish before the script exits
+        if not email_pool.drain(timeout=EMAIL_DRAIN_SECONDS):
+            logger.warning(f"Email queue not drained: {email_pool.stats()}")
+
+if __name__ == "__main__":
+    send_digests()
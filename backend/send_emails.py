@@ -0,0 +1,31 @@
+from config import app
+from email_outbox import deliver_pending, purge_sent, outbox_stats
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("email-outbox")
+
+# Sent emails are kept this long for troubleshooting
+SENT_RETENTION_DAYS = 30
+
+def send_emails():
+    """Deliver pending and due-for-retry emails from the outbox.
+
+    Meant to run every minute or so; requests also wake a worker to send
+    right away, so this mostly picks up retries and anything queued while
+    the app was down.
+    """
+    with app.app_context():
+        try:
+            sent, retried, failed = deliver_pending()
+            logger.info(f"Sent {sent} emails, {retried} to retry, {failed} failed")
+            
+            removed = purge_sent(SENT_RETENTION_DAYS)
+            if removed:
+                logger.info(f"Removed {removed} sent emails older than {SENT_RETENTION_DAYS} days")
+            logger.info(f"Outbox: {outbox_stats()}")
+        except Exception as e:
+            logger.error(f"Error sending outbox emails: {str(e)}")
+
+if __name__ == "__main__":
+    send_emails()
@@ -0,0 +1,49 @@
+from datetime import datetime
+from config import app, db
+from models_db import RackModel, RackLayoutSnapshotModel, TankPositionHistoryModel
+from rack_layout import take_snapshot
+from sqlalchemy import func, or_
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("rack-snapshots")
+
+def snapshot_racks():
+    """Snapshot every rack whose layout changed since its last snapshot.
+
+    Meant to run periodically (e.g. nightly) so point-in-time layout
+    lookups only ever replay a short tail of position history.
+    """
+    with app.app_context():
+        now = datetime.utcnow()
+        
+        last_snapshots = dict(db.session.query(
+            RackLayoutSnapshotModel.rack_id,
+            func.max(RackLayoutSnapshotModel.taken_at)
+        ).group_by(RackLayoutSnapshotModel.rack_id).all())
+        
+        taken = 0
+        for rack_id, in db.session.query(RackModel.id).order_by(RackModel.id).all():
+            try:
+                last_taken = last_snapshots.get(rack_id)
+                if last_taken is not None:
+                    changed = db.session.query(TankPositionHistoryModel.id).filter(
+                        TankPositionHistoryModel.rack_id == rack_id,
+                        or_(TankPositionHistoryModel.start_date > last_taken,
+                            TankPositionHistoryModel.end_date > last_taken)
+                    ).first()
+                    if not changed:
+                        continue
+                
+                take_snapshot(rack_id, now)
+                db.session.commit()
+                taken += 1
+                
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Error snapshotting rack {rack_id}: {str(e)}")
+        
+        logger.info(f"Took {taken} rack layout snapshots")
+
+if __name__ == "__main__":
+    snapshot_racks()
@@ -0,0 +1,163 @@
+"""Shared fixtures for the backend tests.
+
+Pure-logic tests run anywhere. Tests that use the `session` fixture need a
+scratch Postgres database (with the btree_gist extension available) named by
+TEST_DATABASE_URL, e.g.
+
+    TEST_DATABASE_URL=postgresql://postgres@localhost/zebrafish_test python -m pytest
+
+and are skipped without one. The schema is created with db.create_all()
+and every table is truncated after each test.
+"""
+import os
+import sys
+from datetime import date
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+TEST_DATABASE_URL = os.environ.get('TEST_DATABASE_URL')
+if TEST_DATABASE_URL:
+    # config reads DATABASE_URL at import time
+    os.environ['DATABASE_URL'] = TEST_DATABASE_URL
+
+from config import app as flask_app, db  # noqa: E402
+import models_db  # noqa: E402
+from models_db import (  # noqa: E402
+    FacilityModel,
+    GenderEnum,
+    RackModel,
+    SubdivisionModel,
+    TankModel,
+    TankSizeEnum,
+    UserModel,
+    UserRole
+)
+
+
+@pytest.fixture
+def app_ctx():
+    with flask_app.app_context():
+        yield flask_app
+
+
+@pytest.fixture(scope='session')
+def _schema():
+    if not TEST_DATABASE_URL:
+        pytest.skip('TEST_DATABASE_URL is not set')
+    with flask_app.app_context():
+        db.session.execute(db.text('CREATE EXTENSION IF NOT EXISTS btree_gist'))
+        db.session.commit()
+        db.drop_all()
+        db.create_all()
+    yield
+
+
+@pytest.fixture
+def session(_schema, app_ctx):
+    yield db.session
+    db.session.rollback()
+    tables = ', '.join(table.name for table in db.metadata.sorted_tables)
+    db.session.execute(db.text(f'TRUNCATE {tables} RESTART IDENTITY CASCADE'))
+    db.session.commit()
+    db.session.remove()
+
+
+class Factory:
+    """Small helpers that insert valid rows; every helper flushes so ids are set"""
+
+    def __init__(self, session):
+        self.session = session
+        self._users = 0
+
+    def facility(self, name='Facility'):
+        facility = FacilityModel(name=name, organization_name='Lab')
+        self.session.add(facility)
+        self.session.flush()
+        return facility
+
+    def user(self, facility, username=None, email=None):
+        self._users += 1
+        username = username or f'user{self._users}'
+        user = UserModel(
+            username=username,
+            email=email if email is not None else f'{username}@example.org',
+            password='x',
+            role=UserRole.RESEARCHER,
+            facility_id=facility.id if facility else None
+        )
+        self.session.add(user)
+        self.session.flush()
+        return user
+
+    def rack(self, facility, name='R1', rows=4, columns=6):
+        rack = RackModel(name=name, lab_id='lab', rows=rows, columns=columns,
+                         facility_id=facility.id if facility else None)
+        self.session.add(rack)
+        self.session.flush()
+        return rack
+
+    def tank(self, rack, position='A1', males=0, females=0, line=None, dob=None, **fields):
+        tank = TankModel(rack_id=rack.id, position=position, size=TankSizeEnum.REGULAR,
+                         line=line, dob=dob, **fields)
+        self.session.add(tank)
+        self.session.flush()
+        for gender, count in ((GenderEnum.MALE, males), (GenderEnum.FEMALE, females)):
+            if count:
+                self.session.add(SubdivisionModel(tank_id=tank.id, gender=gender, count=count))
+        self.session.flush()
+        return tank
+
+    def profile(self, user, facility, name='Profile'):
+        profile = models_db.BreedingProfileModel(name=name, user_id=user.id, facility_id=facility.id)
+        self.session.add(profile)
+        self.session.flush()
+        return profile
+
+    def plan(self, profile, breeding_date=date(2026, 3, 2), crosses=()):
+        plan = models_db.BreedingPlanModel(profile_id=profile.id, breeding_date=breeding_date)
+        self.session.add(plan)
+        self.session.flush()
+        for tank1, tank2, counts in crosses:
+            self.session.add(models_db.CrossModel(
+                plan_id=plan.id, tank1_id=tank1.id, tank2_id=tank2.id,
+                tank1_males=counts[0], tank1_females=counts[1],
+                tank2_males=counts[2], tank2_females=counts[3]
+            ))
+        self.session.flush()
+        return plan
+
+    def case(self, tank, user=None, report_date=date(2026, 3, 2), status='Open', symptoms=(), **fields):
+        case = models_db.ClinicalCaseModel(
+            tank_id=tank.id, user_id=user.id if user else None, symptoms=list(symptoms),
+            fish_count=fields.pop('fish_count', 1), report_date=report_date, status=status,
+            facility_id=self.session.get(RackModel, tank.rack_id).facility_id, **fields
+        )
+        self.session.add(case)
+        self.session.flush()
+        return case
+
+
+@pytest.fixture
+def make(session):
+    return Factory(session)
+
+
+@pytest.fixture
+def client(session):
+    import app  # noqa: F401  registers the routes on the shared Flask app
+    return flask_app.test_client()
+
+
+@pytest.fixture
+def auth_headers(app_ctx):
+    """Build Authorization headers for a user, with their facility in the claims"""
+    from flask_jwt_extended import create_access_token
+
+    def build(user):
+        token = create_access_token(identity=str(user.id), additional_claims={'facility_id': user.facility_id})
+        return {'Authorization': f'Bearer {token}'}
+    return build
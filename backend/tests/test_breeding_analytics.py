@@ -0,0 +1,47 @@
+from datetime import date
+
+import numpy as np
+
+from breeding_analytics import _success_rates, compute_breeding_analytics
+
+
+def test_success_rates_only_count_recorded_results():
+    rates = _success_rates(
+        np.array(['nacre', 'AB', 'AB', 'AB']),
+        has_result=np.array([0.0, 1.0, 1.0, 0.0]),
+        succeeded=np.array([0.0, 1.0, 0.0, 0.0])
+    )
+    assert rates == [
+        {'key': 'AB', 'crosses': 3, 'recorded': 2, 'successes': 1, 'success_rate': 0.5},
+        {'key': 'nacre', 'crosses': 1, 'recorded': 0, 'successes': 0, 'success_rate': None},
+    ]
+
+
+def test_compute_breeding_analytics_buckets_age_rest_and_position(make):
+    facility = make.facility()
+    user = make.user(facility)
+    rack = make.rack(facility)
+    a = make.tank(rack, 'A1', line='AB', dob=date(2025, 12, 1))
+    b = make.tank(rack, 'A2', line='nacre')
+    profile = make.profile(user, facility)
+    first = make.plan(profile, date(2026, 3, 2), [(a, b, (1, 1, 1, 1))])
+    second = make.plan(profile, date(2026, 3, 12), [(a, b, (1, 1, 1, 1))])
+    first.crosses[0].breeding_result = True
+    second.crosses[0].breeding_result = False
+    make.session.flush()
+
+    analytics = compute_breeding_analytics(facility.id)
+
+    half = {'crosses': 2, 'recorded': 2, 'successes': 1, 'success_rate': 0.5}
+    assert analytics['total_crosses'] == 2
+    assert analytics['by_line'] == [{'key': 'AB', **half}, {'key': 'nacre', **half}]
+    # Only tank a has a date of birth: 91 and 101 days old
+    assert analytics['by_age'] == [{'key': '90-179d', **half}]
+    # Both tanks rest 10 days before their second cross
+    assert analytics['by_rest'] == [
+        {'key': '8-14d', 'crosses': 2, 'recorded': 2, 'successes': 0, 'success_rate': 0.0}
+    ]
+    assert [(entry['rack_id'], entry['position']) for entry in analytics['by_position']] == [
+        (rack.id, 'A1'), (rack.id, 'A2')
+    ]
+    assert compute_breeding_analytics(facility.id + 1)['total_crosses'] == 0
@@ -0,0 +1,149 @@
+from datetime import date
+
+from breeding_service import TANK1_ROLE, TANK2_ROLE, get_tank_crosses, search_plans_query, validate_fish_availability
+from pagination import NEXT_CURSOR_HEADER
+from reservations import adjust_reservations, cross_uses
+
+
+def test_get_tank_crosses_reports_fish_taken_from_the_tank_in_either_role(make):
+    facility = make.facility()
+    user = make.user(facility)
+    rack = make.rack(facility)
+    a, b, c = make.tank(rack, 'A1'), make.tank(rack, 'A2'), make.tank(rack, 'A3')
+    profile = make.profile(user, facility)
+    later = make.plan(profile, date(2026, 3, 9), [(b, a, (5, 6, 7, 8))])
+    earlier = make.plan(profile, date(2026, 3, 2), [(a, c, (1, 2, 3, 4))])
+    make.plan(profile, date(2026, 3, 5), [(b, c, (1, 1, 1, 1))])
+
+    rows = get_tank_crosses(a.id)
+
+    assert [(row.plan_id, row.breeding_date, row.role, row.males_used, row.females_used) for row in rows] == [
+        (earlier.id, date(2026, 3, 2), TANK1_ROLE, 1, 2),
+        (later.id, date(2026, 3, 9), TANK2_ROLE, 7, 8),
+    ]
+
+
+def _search(client, headers, **body):
+    response = client.post('/api/breeding/plans/search', json=body, headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return [plan['id'] for plan in response.get_json()], response.headers.get(NEXT_CURSOR_HEADER)
+
+
+def test_search_plans_query_needs_one_cross_to_match_every_filter(make):
+    facility = make.facility()
+    user = make.user(facility)
+    rack = make.rack(facility)
+    wt, mutant, other = make.tank(rack, 'A1', line='AB'), make.tank(rack, 'B2', line='nacre'), make.tank(rack, 'C3', line='AB')
+    profile = make.profile(user, facility)
+    # Line and position each match, but on different crosses
+    split = make.plan(profile, date(2026, 3, 2), [(wt, other, (1, 1, 1, 1)), (mutant, other, (1, 1, 1, 1))])
+    together = make.plan(profile, date(2026, 3, 9), [(mutant, wt, (1, 1, 1, 1))])
+
+    found = search_plans_query(facility.id, {'tankLine': 'nacre', 'tankPosition': 'A1'}).all()
+    assert [plan.id for plan in found] == [together.id]
+    dated = search_plans_query(facility.id, {'dateTo': '2026-03-05'}).all()
+    assert [plan.id for plan in dated] == [split.id]
+    assert search_plans_query(facility.id + 1, {}).all() == []
+
+
+def test_search_route_paginates_only_when_a_limit_is_given(make, client, auth_headers):
+    facility = make.facility()
+    user = make.user(facility)
+    profile = make.profile(user, facility)
+    plans = [make.plan(profile, date(2026, 3, day)) for day in range(1, 6)]
+    make.session.commit()
+    headers = auth_headers(user)
+    newest_first = [plan.id for plan in reversed(plans)]
+
+    assert _search(client, headers) == (newest_first, None)
+
+    first, cursor = _search(client, headers, limit=2)
+    second, cursor = _search(client, headers, limit=2, cursor=cursor)
+    third, cursor = _search(client, headers, limit=2, cursor=cursor)
+    assert first + second + third == newest_first
+    assert cursor is None
+
+
+def _cross(tank1, tank2, counts):
+    return {'tank1': {'id': tank1.id, 'males': counts[0], 'females': counts[1]},
+            'tank2': {'id': tank2.id, 'males': counts[2], 'females': counts[3]}}
+
+
+def test_validate_fish_availability_adds_up_requests_and_nets_reservations(make):
+    facility = make.facility()
+    rack = make.rack(facility)
+    a, b = make.tank(rack, 'A1', males=3, females=3), make.tank(rack, 'A2', males=5, females=5)
+    day = date(2026, 3, 2)
+    adjust_reservations([(day, {b.id: {'males': 4, 'females': 0}}, 1)])
+
+    crosses = [_cross(a, b, (2, 0, 1, 0)), _cross(a, b, (2, 0, 1, 0))]
+    missing, shortages = validate_fish_availability(crosses, day, facility.id)
+    assert missing == []
+    assert shortages == [
+        {'tank_id': a.id, 'gender': 'males', 'requested': 4, 'available': 3},
+        {'tank_id': b.id, 'gender': 'males', 'requested': 2, 'available': 1},
+    ]
+    # Another day has no reservations, and a plan's own reservation is credited back
+    assert validate_fish_availability(crosses[:1], date(2026, 3, 3), facility.id) == ([], [])
+    assert validate_fish_availability(crosses[:1], day, facility.id,
+                                      credit={b.id: {'males': 4, 'females': 0}}) == ([], [])
+    assert validate_fish_availability(crosses, day, facility.id + 1) == (sorted([a.id, b.id]), [])
+
+
+def test_moving_a_plan_checks_its_fish_on_the_new_date(make, client, auth_headers):
+    facility = make.facility()
+    user = make.user(facility)
+    rack = make.rack(facility)
+    a, b = make.tank(rack, 'A1', males=2, females=2), make.tank(rack, 'A2', males=2, females=2)
+    profile = make.profile(user, facility)
+    crosses = [(a, b, (2, 0, 0, 2))]
+    moving = make.plan(profile, date(2026, 3, 2), crosses)
+    busy = make.plan(profile, date(2026, 3, 9), crosses)
+    adjust_reservations([(plan.breeding_date, cross_uses(plan.crosses), 1) for plan in (moving, busy)])
+    make.session.commit()
+    headers = auth_headers(user)
+
+    response = client.put(f'/api/breeding/plans/{moving.id}', json={'breeding_date': '2026-03-09'}, headers=headers)
+    assert response.status_code == 400
+    assert response.get_json()['shortages'][0]['available'] == 0
+
+    response = client.put(f'/api/breeding/plans/{moving.id}', json={'breeding_date': '2026-03-16'}, headers=headers)
+    assert response.status_code == 200
+
+
+def _plan_pages(client, headers, profile, **params):
+    response = client.get('/api/breeding/plans', query_string={'profile_id': profile.id, **params}, headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json(), response.headers.get(NEXT_CURSOR_HEADER)
+
+
+def test_get_plans_pages_with_a_limit_and_returns_headers_only(make, client, auth_headers):
+    facility = make.facility()
+    user = make.user(facility)
+    rack = make.rack(facility)
+    a, b = make.tank(rack, 'A1'), make.tank(rack, 'A2')
+    profile = make.profile(user, facility)
+    # Two plans on one date: the id breaks the tie
+    plans = [make.plan(profile, date(2026, 3, day), [(a, b, (1, 1, 1, 1))] * (day % 3))
+             for day in (1, 2, 2, 4)]
+    make.session.commit()
+    headers = auth_headers(user)
+    newest_first = [plans[3].id, plans[2].id, plans[1].id, plans[0].id]
+
+    everything, cursor = _plan_pages(client, headers, profile)
+    assert [plan['id'] for plan in everything] == newest_first
+    assert cursor is None
+    assert [len(plan['crosses']) for plan in everything] == [1, 2, 2, 1]
+
+    first, cursor = _plan_pages(client, headers, profile, limit=3)
+    second, cursor = _plan_pages(client, headers, profile, limit=3, cursor=cursor)
+    assert [plan['id'] for plan in first + second] == newest_first
+    assert cursor is None
+
+    summaries, _ = _plan_pages(client, headers, profile, headers_only='true')
+    assert [(plan['id'], plan['cross_count']) for plan in summaries] == list(zip(newest_first, [1, 2, 2, 1]))
+    assert 'crosses' not in summaries[0]
+
+    response = client.get('/api/breeding/plans', query_string={'profile_id': profile.id, 'limit': 2, 'cursor': 'junk'},
+                          headers=headers)
+    assert response.status_code == 400
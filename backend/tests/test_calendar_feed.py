@@ -0,0 +1,79 @@
+from datetime import date, timedelta
+
+from calendar_feed import _escape, _fold, feed_cache, get_or_create_feed
+from models_db import BreedingCalendarSeriesModel, CalendarFeedModel
+
+
+def test_fold_splits_long_lines_without_breaking_characters():
+    assert _fold('SUMMARY:short') == 'SUMMARY:short\r\n'
+
+    line = 'DESCRIPTION:' + 'é' * 80
+    folded = _fold(line)
+    parts = folded[:-2].split('\r\n ')
+    assert ''.join(parts) == line
+    assert all(len(part.encode('utf-8')) <= 75 for part in parts)
+    assert all(len(part.encode('utf-8')) <= 74 for part in parts[1:])
+
+
+def test_escape_handles_ical_special_characters():
+    assert _escape('a;b,c\\d\ne') == r'a\;b\,c\\d\ne'
+    assert _escape(None) == ''
+
+
+def _get_feed(client, feed, **headers):
+    return client.get(f'/api/breeding/calendar-feed/{feed.token}.ics', headers=headers)
+
+
+def test_feed_is_revalidated_by_etag_and_renamed_profiles_bump_it(make, client, auth_headers):
+    facility = make.facility()
+    user = make.user(facility)
+    profile = make.profile(user, facility, name='Old name')
+    make.plan(profile, date.today() + timedelta(days=3))
+    feed = get_or_create_feed(facility.id)
+    make.session.commit()
+    feed_cache.invalidate(facility.id)
+
+    response = _get_feed(client, feed)
+    body = response.get_data(as_text=True)
+    etag = response.headers['ETag']
+    assert response.status_code == 200
+    assert body.startswith('BEGIN:VCALENDAR\r\n') and body.endswith('END:VCALENDAR\r\n')
+    assert 'SUMMARY:Breeding plan: Old name' in body
+    assert _get_feed(client, feed, **{'If-None-Match': etag}).status_code == 304
+
+    response = client.put(f'/api/breeding/profiles/{profile.id}', json={'name': 'New name'},
+                          headers=auth_headers(user))
+    assert response.status_code == 200
+
+    make.session.expire_all()
+    assert CalendarFeedModel.query.get(facility.id).version == 2
+    response = _get_feed(client, feed, **{'If-None-Match': etag})
+    assert response.status_code == 200
+    assert 'SUMMARY:Breeding plan: New name' in response.get_data(as_text=True)
+    assert _get_feed(client, CalendarFeedModel(token='nope')).status_code == 404
+
+
+def test_series_events_start_on_their_first_occurrence(make, client):
+    facility = make.facility()
+    # A Monday series created on a Wednesday first occurs the following Monday
+    wednesday = date.today() + timedelta(days=(2 - date.today().weekday()) % 7)
+    monday = wednesday + timedelta(days=5)
+    make.session.add_all([
+        BreedingCalendarSeriesModel(facility_id=facility.id, username='alice', request_type='Embryos',
+                                    freq='WEEKLY', interval=1, by_day='MO', start_date=wednesday),
+        BreedingCalendarSeriesModel(facility_id=facility.id, username='bob', request_type='Adults',
+                                    freq='WEEKLY', interval=1, by_day='MO', start_date=wednesday,
+                                    until=monday - timedelta(days=1)),
+    ])
+    feed = get_or_create_feed(facility.id)
+    make.session.commit()
+    feed_cache.invalidate(facility.id)
+
+    body = _get_feed(client, feed).get_data(as_text=True)
+
+    assert (f'DTSTART;VALUE=DATE:{monday:%Y%m%d}\r\n'
+            f'DTEND;VALUE=DATE:{monday + timedelta(days=1):%Y%m%d}\r\n'
+            'SUMMARY:Embryos (alice)') in body
+    assert 'RRULE:FREQ=WEEKLY;BYDAY=MO' in body
+    # A series that never occurs is left out
+    assert '(bob)' not in body
@@ -0,0 +1,77 @@
+from datetime import date
+
+import pytest
+
+from calendar_service import calendar_summary, month_bounds
+from models_db import BreedingCalendarModel
+from pagination import NEXT_CURSOR_HEADER
+
+
+def test_month_bounds_handle_leap_years_and_december():
+    assert month_bounds('2028-02') == (date(2028, 2, 1), date(2028, 2, 29))
+    assert month_bounds('2026-12') == (date(2026, 12, 1), date(2026, 12, 31))
+    with pytest.raises(ValueError):
+        month_bounds('2026-13')
+
+
+def _entry(facility, day, request_type='Embryos', fish_age=None):
+    return BreedingCalendarModel(facility_id=facility.id, date=day, username='alice',
+                                 request_type=request_type, fish_age=fish_age)
+
+
+def test_calendar_summary_groups_by_day_type_and_age(make):
+    facility, other = make.facility(), make.facility('Other')
+    make.session.add_all([
+        _entry(facility, date(2026, 3, 2), fish_age='5dpf'),
+        _entry(facility, date(2026, 3, 2), fish_age='5dpf'),
+        _entry(facility, date(2026, 3, 2)),
+        _entry(facility, date(2026, 3, 2), request_type='Adults'),
+        _entry(facility, date(2026, 3, 31)),
+        _entry(facility, date(2026, 4, 1)),
+        _entry(other, date(2026, 3, 2)),
+    ])
+    make.session.flush()
+
+    summary = calendar_summary(facility.id, *month_bounds('2026-03'))
+
+    assert summary == [
+        {'date': '2026-03-02', 'total': 4, 'groups': [
+            {'request_type': 'Adults', 'fish_age': None, 'count': 1},
+            {'request_type': 'Embryos', 'fish_age': None, 'count': 1},
+            {'request_type': 'Embryos', 'fish_age': '5dpf', 'count': 2},
+        ]},
+        {'date': '2026-03-31', 'total': 1, 'groups': [
+            {'request_type': 'Embryos', 'fish_age': None, 'count': 1},
+        ]},
+    ]
+    assert calendar_summary(None, date(2026, 3, 2), date(2026, 3, 2))[0]['total'] == 5
+
+
+def test_calendar_history_is_scoped_paged_and_streamable(make, client, auth_headers):
+    facility, other = make.facility(), make.facility('Other')
+    user = make.user(facility)
+    entries = [_entry(facility, date(2026, 3, day)) for day in (5, 1, 3, 3, 9)]
+    make.session.add_all(entries + [_entry(other, date(2026, 3, 2)), _entry(facility, date(2026, 4, 1))])
+    make.session.commit()
+    headers = auth_headers(user)
+    window = {'start_date': '2026-03-01', 'end_date': '2026-03-31'}
+    in_order = [entry.id for entry in sorted(entries, key=lambda entry: (entry.date, entry.id))]
+
+    response = client.get('/api/breeding/calendar/history', query_string=window, headers=headers)
+    assert [entry['id'] for entry in response.get_json()] == in_order
+    assert NEXT_CURSOR_HEADER not in response.headers
+
+    seen, cursor = [], None
+    while True:
+        params = {**window, 'limit': 2, **({'cursor': cursor} if cursor else {})}
+        response = client.get('/api/breeding/calendar/history', query_string=params, headers=headers)
+        seen += [entry['id'] for entry in response.get_json()]
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            break
+    assert seen == in_order
+
+    response = client.get('/api/breeding/calendar/history', query_string={**window, 'stream': 'true'}, headers=headers)
+    assert [entry['id'] for entry in response.get_json()] == in_order
+    response = client.get('/api/breeding/calendar/history', query_string={'start_date': '2026-03-01'}, headers=headers)
+    assert response.status_code == 400
@@ -0,0 +1,37 @@
+from datetime import date, timedelta
+
+from capacity import plan_capacity
+from models_db import BreedingCalendarModel
+from reservations import adjust_reservations
+
+
+def test_plan_capacity_nets_reservations_and_buckets_by_age(make):
+    facility = make.facility()
+    rack = make.rack(facility)
+    start = date(2026, 3, 2)
+    tank = make.tank(rack, 'A1', males=3, females=2, dob=start - timedelta(days=100))
+    # Undated tanks have no age and supply nothing
+    make.tank(rack, 'A2', males=9, females=9)
+    adjust_reservations([(start + timedelta(days=1), {tank.id: {'males': 0, 'females': 1}}, 1)])
+    make.session.add_all([
+        BreedingCalendarModel(facility_id=facility.id, date=start, username='a', request_type='fish', fish_age='100'),
+        BreedingCalendarModel(facility_id=facility.id, date=start, username='a', request_type='fish', fish_age=' 95 '),
+        BreedingCalendarModel(facility_id=facility.id, date=start, username='a', request_type='Embryos'),
+        BreedingCalendarModel(facility_id=facility.id, date=start + timedelta(days=1), username='a',
+                              request_type='fish', fish_age='120'),
+    ])
+    make.session.flush()
+
+    first, second = plan_capacity(facility.id, start, 2, fish_per_request=2)
+
+    assert first['date'] == '2026-03-02' and second['date'] == '2026-03-03'
+    assert first['other_requests'] == 1
+    assert first['buckets'][1] == {'age': '90-179d', 'requests': 2, 'fish_needed': 4,
+                                   'males_free': 3, 'females_free': 2, 'shortfall': 2}
+    assert second['buckets'][1] == {'age': '90-179d', 'requests': 1, 'fish_needed': 2,
+                                    'males_free': 3, 'females_free': 1, 'shortfall': 1}
+    assert all(bucket['males_free'] == 0 for bucket in first['buckets'] if bucket['age'] != '90-179d')
+    assert not first['can_meet_demand'] and not second['can_meet_demand']
+
+    relaxed = plan_capacity(facility.id, start + timedelta(days=1), 1, fish_per_request=1)
+    assert relaxed[0]['can_meet_demand']
@@ -0,0 +1,223 @@
+from datetime import date, datetime, timedelta
+
+from clinical_service import case_note_count, case_notes_page, cases_query, compute_symptom_trends, open_case_delta
+from models_db import ClinicalCaseModel, ClinicalNoteModel, RackModel, TankModel
+from pagination import NEXT_CURSOR_HEADER
+
+
+def _case_ids(facility_id, **filters):
+    return [case.id for case, *_ in cases_query(facility_id, filters).order_by(ClinicalCaseModel.id)]
+
+
+def test_cases_query_joins_names_and_applies_every_filter(make):
+    facility, other = make.facility(), make.facility('Other')
+    user = make.user(facility, 'vet')
+    rack, second_rack = make.rack(facility, 'R1'), make.rack(facility, 'R2')
+    tank, second_tank = make.tank(rack, 'A1'), make.tank(second_rack, 'B1')
+    early = make.case(tank, user, date(2026, 3, 1))
+    closed = make.case(tank, None, date(2026, 3, 5), status='Closed')
+    elsewhere = make.case(second_tank, user, date(2026, 3, 9))
+    make.case(make.tank(make.rack(other), 'A1'))
+
+    case, tank_position, rack_name, reporter = cases_query(facility.id, {}).filter(
+        ClinicalCaseModel.id == early.id
+    ).one()
+    assert (case.id, tank_position, rack_name, reporter) == (early.id, 'A1', 'R1', 'vet')
+
+    assert _case_ids(facility.id) == [early.id, closed.id, elsewhere.id]
+    assert _case_ids(facility.id, status='Closed') == [closed.id]
+    assert _case_ids(facility.id, tank_id=str(tank.id)) == [early.id, closed.id]
+    assert _case_ids(facility.id, rack_id=str(second_rack.id)) == [elsewhere.id]
+    assert _case_ids(facility.id, date_from='2026-03-05', date_to='2026-03-05') == [closed.id]
+
+
+def test_case_list_pages_only_with_a_limit(make, client, auth_headers):
+    facility = make.facility()
+    user = make.user(facility)
+    tank = make.tank(make.rack(facility), 'A1')
+    cases = [make.case(tank, user, date(2026, 3, day)) for day in (4, 2, 4, 1)]
+    make.session.commit()
+    headers = auth_headers(user)
+    newest_first = [cases[2].id, cases[0].id, cases[1].id, cases[3].id]
+
+    response = client.get('/api/clinical/cases', headers=headers)
+    assert [case['id'] for case in response.get_json()] == newest_first
+    assert NEXT_CURSOR_HEADER not in response.headers
+
+    first = client.get('/api/clinical/cases', query_string={'limit': 3}, headers=headers)
+    second = client.get('/api/clinical/cases', query_string={'limit': 3, 'cursor': first.headers[NEXT_CURSOR_HEADER]},
+                        headers=headers)
+    assert [case['id'] for case in first.get_json() + second.get_json()] == newest_first
+    assert NEXT_CURSOR_HEADER not in second.headers
+
+
+def test_open_case_delta():
+    assert open_case_delta(None, 'Open') == 1
+    assert open_case_delta('Open', 'Closed') == -1
+    assert open_case_delta('Closed', 'Open') == 1
+    assert open_case_delta('Open', 'Open') == open_case_delta('Open', None) + 1 == 0
+
+
+def _counters(session, tank, rack):
+    session.expire_all()
+    return session.get(TankModel, tank.id).open_case_count, session.get(RackModel, rack.id).open_case_count
+
+
+def test_status_changes_keep_open_case_counters_in_step(make, client, auth_headers):
+    facility = make.facility()
+    user = make.user(facility)
+    rack = make.rack(facility)
+    tank = make.tank(rack, 'A1')
+    make.session.commit()
+    headers = auth_headers(user)
+
+    response = client.post('/api/clinical/cases', headers=headers, json={
+        'tank_id': tank.id, 'symptoms': ['lesions'], 'fish_count': 2, 'report_date': '2026-03-02'
+    })
+    case_id = response.get_json()['id']
+    assert _counters(make.session, tank, rack) == (1, 1)
+
+    def set_status(**body):
+        return client.patch(f'/api/clinical/cases/{case_id}/status', json=body, headers=headers)
+
+    assert set_status(status='Resolved').status_code == 400
+    assert set_status(status='Closed').status_code == 400
+    assert _counters(make.session, tank, rack) == (1, 1)
+    assert set_status(status='Closed', closure_reason='Recovered').status_code == 200
+    assert _counters(make.session, tank, rack) == (0, 0)
+    assert set_status(status='Open').status_code == 200
+    assert _counters(make.session, tank, rack) == (1, 1)
+
+
+def test_deleting_a_tank_removes_its_open_cases_from_the_rack(make, client, auth_headers):
+    facility = make.facility()
+    user = make.user(facility)
+    rack = make.rack(facility, name='R1')
+    rack.open_case_count = 3
+    tank = make.tank(rack, 'A1', open_case_count=2)
+    make.tank(rack, 'A2', open_case_count=1)
+    make.session.commit()
+
+    response = client.delete(f'/api/tanks/{tank.id}', headers=auth_headers(user))
+
+    assert response.status_code == 200
+    make.session.expire_all()
+    assert make.session.get(RackModel, rack.id).open_case_count == 1
+
+
+def test_case_notes_page_walks_newest_first_with_authors(make):
+    facility = make.facility()
+    user = make.user(facility, 'vet')
+    case = make.case(make.tank(make.rack(facility)))
+    other_case = make.case(make.tank(make.rack(facility, 'R2')))
+    # Two notes share a timestamp; the id breaks the tie
+    stamps = [datetime(2026, 3, 2, 9), datetime(2026, 3, 2, 12), datetime(2026, 3, 2, 12), datetime(2026, 3, 3, 8)]
+    notes = [ClinicalNoteModel(case_id=case.id, content=f'note {i}', user_id=user.id if i % 2 else None, created_at=stamp)
+             for i, stamp in enumerate(stamps)]
+    make.session.add_all(notes + [ClinicalNoteModel(case_id=other_case.id, content='other')])
+    make.session.flush()
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        rows, has_more = case_notes_page(case.id, 3, cursor)
+        seen += [(note.content, username) for note, username in rows]
+        pages += 1
+        if not has_more:
+            break
+        cursor = [rows[-1][0].created_at, rows[-1][0].id]
+
+    assert pages == 2
+    assert seen == [('note 3', 'vet'), ('note 2', None), ('note 1', 'vet'), ('note 0', None)]
+    assert case_note_count(case.id) == 4
+
+
+
+def test_case_detail_notes_continue_through_the_notes_route(make, client, auth_headers):
+    facility = make.facility()
+    user = make.user(facility)
+    case = make.case(make.tank(make.rack(facility)))
+    make.session.add_all([ClinicalNoteModel(case_id=case.id, content=f'note {i}', created_at=datetime(2026, 3, 2, i))
+                          for i in range(5)])
+    make.session.commit()
+    headers = auth_headers(user)
+
+    # The case detail page starts from the newest notes and pages back from there
+    detail = client.get(f'/api/clinical/cases/{case.id}', query_string={'notes_limit': 2}, headers=headers).get_json()
+    assert detail['note_count'] == 5
+    seen, cursor = [note['content'] for note in detail['notes']], detail['notes_next_cursor']
+    while cursor:
+        response = client.get(f'/api/clinical/cases/{case.id}/notes', query_string={'cursor': cursor, 'limit': 2},
+                              headers=headers)
+        assert response.status_code == 200, response.get_json()
+        seen += [note['content'] for note in response.get_json()]
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+
+    assert seen == [f'note {i}' for i in reversed(range(5))]
+
+def test_symptom_filter_needs_every_symptom(make, client, auth_headers):
+    facility = make.facility()
+    user = make.user(facility)
+    tank = make.tank(make.rack(facility))
+    both = make.case(tank, symptoms=['lesions', 'lethargy'])
+    one = make.case(tank, symptoms=['lesions'])
+    make.case(tank, symptoms=[])
+    make.session.commit()
+
+    assert _case_ids(facility.id, symptom='lesions') == [both.id, one.id]
+    assert _case_ids(facility.id, symptom=['lethargy', 'lesions']) == [both.id]
+
+    response = client.get('/api/clinical/cases', query_string=[('symptom', 'lesions'), ('symptom', 'lethargy')],
+                          headers=auth_headers(user))
+    assert [case['id'] for case in response.get_json()] == [both.id]
+
+
+def test_symptom_trends_count_each_symptom_per_week_and_group(make):
+    facility = make.facility()
+    rack, other_rack = make.rack(facility, 'R1'), make.rack(facility, 'R2')
+    tank, other_tank = make.tank(rack, line='AB'), make.tank(other_rack)
+    monday = date.today() - timedelta(days=date.today().weekday())
+    make.case(tank, report_date=monday, symptoms=['lesions', 'lethargy'])
+    make.case(tank, report_date=monday, symptoms=['lesions'])
+    make.case(other_tank, report_date=monday, symptoms=['lesions'])
+    make.case(tank, report_date=monday - timedelta(weeks=10), symptoms=['fin rot'])
+
+    trends = compute_symptom_trends(facility.id, 4, 'rack')
+
+    week = monday.isoformat()
+    assert trends['totals'] == [{'symptom': 'lesions', 'cases': 3}, {'symptom': 'lethargy', 'cases': 1}]
+    assert trends['rows'] == [
+        {'week': week, 'symptom': 'lesions', 'cases': 2, 'rack_id': rack.id, 'rack_name': 'R1'},
+        {'week': week, 'symptom': 'lethargy', 'cases': 1, 'rack_id': rack.id, 'rack_name': 'R1'},
+        {'week': week, 'symptom': 'lesions', 'cases': 1, 'rack_id': other_rack.id, 'rack_name': 'R2'},
+    ]
+    by_line = compute_symptom_trends(facility.id, 4, 'line')['rows']
+    assert [(row['line'], row['symptom'], row['cases']) for row in by_line] == [
+        ('AB', 'lesions', 2), ('AB', 'lethargy', 1), ('Unknown', 'lesions', 1)
+    ]
+    assert compute_symptom_trends(facility.id + 1, 4, 'rack')['rows'] == []
+
+
+def test_new_cases_invalidate_symptom_trends_only_once_committed(make, client, auth_headers, monkeypatch):
+    import app as app_module
+    import notification_service
+    from config import db
+
+    facility = make.facility()
+    user = make.user(facility)
+    tank = make.tank(make.rack(facility))
+    make.session.commit()
+    visible_at_invalidation = []
+
+    def invalidate(facility_id):
+        # What a concurrent trends request would see, on its own connection
+        with db.engine.connect() as connection:
+            visible_at_invalidation.append(connection.execute(db.text('SELECT count(*) FROM clinical_cases')).scalar())
+    monkeypatch.setattr(app_module, 'invalidate_symptom_trends', invalidate)
+    monkeypatch.setattr(notification_service, 'wake_sender', lambda: None)
+
+    response = client.post('/api/clinical/cases', json={
+        'tank_id': tank.id, 'symptoms': ['lesions'], 'fish_count': 1, 'report_date': '2026-03-02'
+    }, headers=auth_headers(user))
+
+    assert response.status_code == 201, response.get_json()
+    assert visible_at_invalidation == [1]
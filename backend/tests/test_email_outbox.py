@@ -0,0 +1,221 @@
+import socket
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+aiosmtpd_controller = pytest.importorskip('aiosmtpd.controller')
+aiosmtpd_smtp = pytest.importorskip('aiosmtpd.smtp')
+
+import email_outbox  # noqa: E402
+from email_outbox import MAX_ATTEMPTS, deliver_pending, enqueue_emails, retry_delay  # noqa: E402
+from models_db import EmailOutboxModel  # noqa: E402
+
+
+class RecordingHandler:
+    """Accepts mail, except 5xx for 'bad@' and 4xx for 'later@' recipients"""
+
+    def __init__(self):
+        self.messages = []
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith('bad@'):
+            return '550 No such user'
+        if address.startswith('later@'):
+            return '451 Try again later'
+        envelope.rcpt_tos.append(address)
+        return '250 OK'
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((session.peer, envelope.rcpt_tos[0]))
+        return '250 Message accepted'
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server(monkeypatch):
+    handler = RecordingHandler()
+    controller = aiosmtpd_controller.Controller(handler, hostname='127.0.0.1', port=_free_port())
+    controller.start()
+    monkeypatch.setattr(email_outbox, 'SMTP_SERVER', '127.0.0.1')
+    monkeypatch.setattr(email_outbox, 'SMTP_PORT', controller.port)
+    monkeypatch.setattr(email_outbox, 'SMTP_STARTTLS', False)
+    monkeypatch.setattr(email_outbox, 'SMTP_USERNAME', '')
+    yield handler
+    controller.stop()
+
+
+class RefusingSMTP(aiosmtpd_smtp.SMTP):
+    """Answers the greeting with `greeting` instead of 220, or rejects EHLO and HELO with `helo`"""
+
+    connections = 0
+
+    def __init__(self, handler, greeting=None, helo=None, **kwargs):
+        super().__init__(handler, **kwargs)
+        self.greeting, self.helo = greeting, helo
+
+    async def _handle_client(self):
+        type(self).connections += 1
+        if self.greeting:
+            await self.push(self.greeting)
+            self.transport.close()
+            return
+        await super()._handle_client()
+
+    async def smtp_EHLO(self, hostname):
+        await (self.push(self.helo) if self.helo else super().smtp_EHLO(hostname))
+
+    async def smtp_HELO(self, hostname):
+        await (self.push(self.helo) if self.helo else super().smtp_HELO(hostname))
+
+
+@pytest.fixture
+def refusing_server(monkeypatch):
+    servers = []
+
+    def start(**refusal):
+        class Controller(aiosmtpd_controller.Controller):
+            def factory(self):
+                return RefusingSMTP(self.handler, **refusal)
+
+        controller = Controller(RecordingHandler(), hostname='127.0.0.1', port=_free_port())
+        controller.start()
+        servers.append(controller)
+        # The controller opens one connection of its own while starting
+        RefusingSMTP.connections = 0
+        monkeypatch.setattr(email_outbox, 'SMTP_SERVER', '127.0.0.1')
+        monkeypatch.setattr(email_outbox, 'SMTP_PORT', controller.port)
+        monkeypatch.setattr(email_outbox, 'SMTP_STARTTLS', False)
+        monkeypatch.setattr(email_outbox, 'SMTP_USERNAME', '')
+        return controller
+
+    yield start
+    for controller in servers:
+        controller.stop()
+
+
+def _queue(session, *addresses):
+    enqueue_emails([(address, 'Subject', '<p>Hi</p>') for address in addresses])
+    session.commit()
+
+
+def _rows(session):
+    session.expire_all()
+    return {row.to_email: row for row in EmailOutboxModel.query.order_by(EmailOutboxModel.id)}
+
+
+def test_pending_rows_go_out_over_one_connection(session, smtp_server):
+    _queue(session, *[f'user{i}@example.org' for i in range(5)])
+
+    assert deliver_pending(batch_size=2) == (5, 0, 0)
+
+    assert len(smtp_server.messages) == 5
+    assert len({peer for peer, _ in smtp_server.messages}) == 1
+    assert all(row.status == 'sent' and row.sent_at for row in _rows(session).values())
+    assert deliver_pending() == (0, 0, 0)
+
+
+def test_rejections_fail_or_back_off(session, smtp_server):
+    _queue(session, 'bad@example.org', 'later@example.org', 'ok@example.org')
+    before = datetime.utcnow()
+
+    assert deliver_pending() == (1, 1, 1)
+
+    rows = _rows(session)
+    assert (rows['bad@example.org'].status, rows['bad@example.org'].attempts) == ('failed', 1)
+    later = rows['later@example.org']
+    assert (later.status, later.attempts) == ('pending', 1)
+    assert later.next_attempt_at >= before + retry_delay(1)
+    assert rows['ok@example.org'].status == 'sent'
+    # Not due yet, so a second run leaves it alone
+    assert deliver_pending() == (0, 0, 0)
+
+
+def test_a_temporary_rejection_gives_up_after_max_attempts(session, smtp_server):
+    _queue(session, 'later@example.org')
+    for _ in range(MAX_ATTEMPTS):
+        EmailOutboxModel.query.update({'next_attempt_at': datetime.utcnow() - timedelta(seconds=1)})
+        session.commit()
+        deliver_pending()
+
+    row = _rows(session)['later@example.org']
+    assert (row.status, row.attempts) == ('failed', MAX_ATTEMPTS)
+
+
+def test_an_outage_delays_rows_without_using_attempts(session, monkeypatch):
+    monkeypatch.setattr(email_outbox, 'SMTP_SERVER', '127.0.0.1')
+    monkeypatch.setattr(email_outbox, 'SMTP_PORT', _free_port())
+    monkeypatch.setattr(email_outbox, 'SMTP_STARTTLS', False)
+    monkeypatch.setattr(email_outbox, 'SMTP_USERNAME', '')
+    _queue(session, 'first@example.org', 'second@example.org')
+    before = datetime.utcnow()
+
+    assert deliver_pending() == (0, 1, 0)
+
+    rows = _rows(session)
+    assert all(row.status == 'pending' and row.attempts == 0 for row in rows.values())
+    assert rows['first@example.org'].next_attempt_at >= before + retry_delay(1)
+    assert rows['first@example.org'].last_error
+    # The run stopped at the first row instead of timing out on each
+    assert rows['second@example.org'].next_attempt_at <= before
+
+
+
+@pytest.mark.parametrize('refusal', [
+    {'greeting': '554 Not accepting mail'},
+    {'greeting': '421 Too busy, try later'},
+    {'helo': '550 Not welcome'},
+])
+def test_a_refused_session_is_an_outage_not_a_failed_message(session, refusing_server, refusal):
+    refusing_server(**refusal)
+    _queue(session, 'first@example.org', 'second@example.org', 'third@example.org')
+
+    assert deliver_pending() == (0, 1, 0)
+
+    rows = _rows(session)
+    assert all(row.status == 'pending' and row.attempts == 0 for row in rows.values())
+    assert 'unavailable' in rows['first@example.org'].last_error
+    # One connection attempt for the whole run, not one per row
+    assert RefusingSMTP.connections == 1
+
+
+class RecordingPool:
+    def __init__(self, accept=True):
+        self.accept = accept
+        self.submitted = []
+
+    def submit(self, func, *args, timeout=None):
+        self.submitted.append(func)
+        return self.accept
+
+
+def test_wake_ups_are_coalesced_until_one_starts(monkeypatch):
+    pool = RecordingPool()
+    monkeypatch.setattr(email_outbox, 'email_pool', pool)
+    monkeypatch.setattr(email_outbox, '_wake_queued', threading.Event())
+    monkeypatch.setattr(email_outbox, 'deliver_pending', lambda: (0, 0, 0))
+
+    for _ in range(3):
+        email_outbox.wake_sender()
+    assert len(pool.submitted) == 1
+
+    # Once the run starts, emails committed meanwhile need another wake-up
+    pool.submitted[0]()
+    email_outbox.wake_sender()
+    email_outbox.wake_sender()
+    assert len(pool.submitted) == 2
+
+
+def test_a_dropped_wake_up_does_not_block_later_ones(monkeypatch):
+    pool = RecordingPool(accept=False)
+    monkeypatch.setattr(email_outbox, 'email_pool', pool)
+    monkeypatch.setattr(email_outbox, '_wake_queued', threading.Event())
+
+    email_outbox.wake_sender()
+    email_outbox.wake_sender()
+    assert len(pool.submitted) == 2
@@ -0,0 +1,72 @@
+import threading
+import time
+
+from email_queue import EmailWorkerPool
+
+
+def test_full_queue_keeps_emails_in_the_overflow_until_sent():
+    pool = EmailWorkerPool(workers=1, maxsize=1, submit_timeout=0.01)
+    release = threading.Event()
+    sent = []
+
+    def send(n):
+        release.wait(5)
+        sent.append(n)
+
+    # One email runs, one waits in the queue, the rest overflow
+    assert all(pool.submit(send, n) for n in range(5))
+    assert pool.stats()['overflow_depth'] >= 2
+    overflowed = pool.stats()['overflowed']
+
+    release.set()
+    assert pool.drain(timeout=5)
+    assert sorted(sent) == list(range(5))
+    stats = pool.stats()
+    assert (stats['completed'], stats['overflow_depth'], stats['overflowed'], stats['dropped']) == (5, 0, overflowed, 0)
+
+
+def test_a_full_overflow_drops_and_counts_emails():
+    pool = EmailWorkerPool(workers=1, maxsize=1, submit_timeout=0.01, max_overflow=2)
+    release = threading.Event()
+    sent = []
+
+    def send(n):
+        release.wait(5)
+        sent.append(n)
+
+    pool.submit(send, 0)
+    # Wait for the worker to take the first email, so the queue and overflow hold exactly 3
+    deadline = time.monotonic() + 5
+    while pool.stats()['queue_depth'] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    results = [pool.submit(send, n) for n in range(1, 6)]
+
+    assert results == [True, True, True, False, False]
+    assert (pool.stats()['overflow_depth'], pool.stats()['dropped']) == (2, 2)
+    release.set()
+    assert pool.drain(timeout=5)
+    assert sorted(sent) == [0, 1, 2, 3]
+
+
+def test_submit_waits_for_room_before_overflowing():
+    pool = EmailWorkerPool(workers=1, maxsize=1, submit_timeout=5)
+    release = threading.Event()
+    pool.submit(release.wait, 5)
+    pool.submit(lambda: None)
+
+    threading.Timer(0.1, release.set).start()
+    started = time.monotonic()
+    assert pool.submit(lambda: None) is True
+    assert time.monotonic() - started >= 0.05
+
+    assert pool.drain(timeout=5)
+    assert pool.stats()['overflowed'] == 0
+
+
+def test_failures_are_counted():
+    pool = EmailWorkerPool(workers=2, maxsize=10)
+    pool.submit(lambda: False)
+    pool.submit(lambda: 1 / 0)
+    pool.submit(lambda: True)
+    assert pool.drain(timeout=5)
+    assert (pool.stats()['completed'], pool.stats()['failed']) == (1, 2)
@@ -0,0 +1,22 @@
+from facility_cache import FacilityCache
+
+
+def test_invalidate_drops_the_facility_and_the_unscoped_view():
+    cache = FacilityCache()
+    cache.set(1, 'one')
+    cache.set(1, 'one, weekly', key='weekly')
+    cache.set(2, 'two')
+    cache.set(None, 'everything')
+
+    cache.invalidate(1)
+
+    assert cache.get(1) is None
+    assert cache.get(1, key='weekly') is None
+    assert cache.get(None) is None
+    assert cache.get(2) == 'two'
+
+
+def test_entries_expire_after_the_ttl():
+    cache = FacilityCache(ttl=-1)
+    cache.set(1, 'stale')
+    assert cache.get(1) is None
@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+import notification_service
+from models_db import EmailOutboxModel, NotificationModel, NotificationPreferenceModel
+from notification_service import DIGEST_CATEGORY, digest_message, get_user_notifications, send_due_digests
+
+
+def test_digest_message_counts_categories_most_common_first():
+    held = [SimpleNamespace(category=category)
+            for category in ('note_added', 'case_opened', 'note_added', 'tank_moved', 'note_added')]
+
+    assert digest_message(held) == '5 new notifications: 3 case notes, 1 new clinical case, 1 tank moved'
+    assert digest_message(held[1:2]) == '1 new notification: 1 new clinical case'
+
+
+@pytest.fixture
+def no_wake(monkeypatch):
+    # Leave queued emails in the outbox instead of handing them to a worker
+    monkeypatch.setattr(notification_service, 'wake_sender', lambda: None)
+
+
+def _hold(session, user, message, category='note_added', created_at=datetime(2026, 3, 2, 9)):
+    notification = NotificationModel(user_id=user.id, facility_id=user.facility_id, message=message,
+                                     category=category, is_read=False, digest_pending=True, created_at=created_at)
+    session.add(notification)
+    session.flush()
+    return notification
+
+
+def test_send_due_digests_summarises_and_keeps_held_notifications(make, no_wake):
+    facility = make.facility()
+    due, waiting = make.user(facility), make.user(facility)
+    now = datetime(2026, 3, 2, 12)
+    make.session.add_all([
+        NotificationPreferenceModel(user_id=due.id, digest_minutes=60, last_digest_at=now - timedelta(hours=2)),
+        NotificationPreferenceModel(user_id=waiting.id, digest_minutes=1440, last_digest_at=now - timedelta(hours=2))
+    ])
+    held = [_hold(make.session, due, 'Note on case 1'), _hold(make.session, due, 'Case 2 opened', 'case_opened'),
+            _hold(make.session, due, 'Note on case 2')]
+    not_due = _hold(make.session, waiting, 'Note on case 3')
+    held_ids = [notification.id for notification in held]
+
+    assert send_due_digests(now=now) == 1
+
+    summary = NotificationModel.query.filter_by(category=DIGEST_CATEGORY).one()
+    assert (summary.user_id, summary.message, summary.is_read, summary.digest_pending) == (
+        due.id, '3 new notifications: 2 case notes, 1 new clinical case', False, False
+    )
+    # The originals stay, read and linked to their summary
+    originals = NotificationModel.query.filter(NotificationModel.id.in_(held_ids)).all()
+    assert [(row.digest_pending, row.is_read, row.digest_id) for row in originals] == [(False, True, summary.id)] * 3
+    assert make.session.get(NotificationModel, not_due.id).digest_pending is True
+
+    email = EmailOutboxModel.query.one()
+    assert email.to_email == due.email
+    assert 'Note on case 1' in email.html_content
+    assert make.session.get(NotificationPreferenceModel, due.id).last_digest_at == now
+    assert make.session.get(NotificationPreferenceModel, waiting.id).last_digest_at == now - timedelta(hours=2)
+
+    # Nothing is held any more, so the next run sends nothing
+    assert send_due_digests(now=now + timedelta(hours=2)) == 0
+    assert NotificationModel.query.filter_by(category=DIGEST_CATEGORY).count() == 1
+
+
+def test_digested_notifications_are_listed_through_their_digest(make, client, auth_headers, no_wake):
+    facility = make.facility()
+    user, other = make.user(facility), make.user(facility)
+    now = datetime(2026, 3, 2, 12)
+    make.session.add(NotificationPreferenceModel(user_id=user.id, digest_minutes=60,
+                                                 last_digest_at=now - timedelta(hours=2)))
+    held = [_hold(make.session, user, f'Note {i}', created_at=datetime(2026, 3, 2, 9, i)) for i in range(3)]
+    urgent = NotificationModel(user_id=user.id, facility_id=facility.id, message='Outbreak in R1',
+                               category='outbreak_alert', is_read=False, created_at=datetime(2026, 3, 2, 10))
+    make.session.add(urgent)
+    make.session.flush()
+    held_ids = [notification.id for notification in held]
+    assert send_due_digests(now=now) == 1
+    summary = NotificationModel.query.filter_by(category=DIGEST_CATEGORY).one()
+    headers = auth_headers(user)
+
+    listed = client.get('/api/notifications', headers=headers).get_json()
+    assert [n['message'] for n in listed] == ['3 new notifications: 3 case notes', 'Outbreak in R1']
+    assert [n.id for n in get_user_notifications(user.id)] == [summary.id, urgent.id]
+
+    response = client.get(f'/api/notifications/{summary.id}/digest', headers=headers)
+    assert [n['id'] for n in response.get_json()] == list(reversed(held_ids))
+    assert client.get(f'/api/notifications/{summary.id}/digest', headers=auth_headers(other)).status_code == 404
+    assert client.get(f'/api/notifications/{urgent.id}/digest', headers=headers).status_code == 404
@@ -0,0 +1,88 @@
+import random
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from outbreak import MIN_CLUSTER_TANKS, _rack_clusters, find_clusters, grid_adjacency, position_cells
+
+
+def test_position_cells_parse_single_cells_and_ranges():
+    assert position_cells('A1') == [(0, 0)]
+    assert position_cells(' ab12 ') == [(27, 11)]
+    assert position_cells('B2-A1') == [(0, 0), (0, 1), (1, 0), (1, 1)]
+    assert position_cells('shelf') == position_cells(None) == []
+
+
+def test_grid_adjacency_links_the_eight_neighbours_and_self():
+    rows, cols = 3, 4
+    adjacency = grid_adjacency(rows, cols).toarray()
+    for a in range(rows * cols):
+        for b in range(rows * cols):
+            touching = abs(a // cols - b // cols) <= 1 and abs(a % cols - b % cols) <= 1
+            assert adjacency[a, b] == int(touching)
+
+
+def _brute_force_groups(tanks):
+    """Connected groups of tank ids where any two cells are 8-way neighbours"""
+    def touching(a, b):
+        return any(abs(r1 - r2) <= 1 and abs(c1 - c2) <= 1 for r1, c1 in tanks[a] for r2, c2 in tanks[b])
+
+    groups, seen = [], set()
+    for start in tanks:
+        if start in seen:
+            continue
+        group, stack = set(), [start]
+        while stack:
+            tank = stack.pop()
+            if tank in group:
+                continue
+            group.add(tank)
+            stack.extend(other for other in tanks if other not in group and touching(tank, other))
+        seen |= group
+        groups.append(sorted(group))
+    return groups
+
+
+@pytest.mark.parametrize('seed', range(30))
+def test_neighbourhood_clusters_match_brute_force(seed):
+    rng = random.Random(seed)
+    cells = rng.sample([(r, c) for r in range(5) for c in range(8)], rng.randint(1, 14))
+    rows = [SimpleNamespace(facility_id=1, rack_id=1, rack_name='R1', rows=5, columns=8, fish_count=1,
+                            tank_id=i + 1, position=f'{chr(65 + r)}{c + 1}') for i, (r, c) in enumerate(cells)]
+
+    clusters = [cluster for cluster in _rack_clusters(rows) if cluster.kind == 'neighbourhood']
+
+    expected = [group for group in _brute_force_groups({row.tank_id: position_cells(row.position) for row in rows})
+                if len(group) >= MIN_CLUSTER_TANKS]
+    assert sorted(cluster.tank_ids for cluster in clusters) == sorted(expected)
+
+
+def test_a_range_tank_bridges_its_neighbours():
+    rows = [SimpleNamespace(facility_id=1, rack_id=1, rack_name='R1', rows=4, columns=6, fish_count=2,
+                            tank_id=tank_id, position=position)
+            for tank_id, position in ((1, 'A1'), (2, 'A2-A4'), (3, 'A5'), (3, 'A5'), (4, 'D6'))]
+
+    [cluster] = _rack_clusters(rows)
+
+    assert (cluster.kind, cluster.tank_ids, cluster.positions) == ('neighbourhood', [1, 2, 3], ['A1', 'A2-A4', 'A5'])
+    assert (cluster.cases, cluster.fish) == (4, 8)
+
+
+def test_find_clusters_looks_only_at_the_window(make):
+    facility = make.facility()
+    rack = make.rack(facility)
+    today = date(2026, 3, 20)
+    tanks = [make.tank(rack, position) for position in ('A1', 'A2', 'B1', 'B2', 'D6')]
+    for tank in tanks[:3]:
+        make.case(tank, report_date=today - timedelta(days=13))
+    make.case(tanks[3], report_date=today - timedelta(days=14))
+
+    [cluster] = find_clusters(today=today, facility_id=facility.id)
+    assert (cluster.kind, cluster.rack_id, cluster.tank_ids) == ('neighbourhood', rack.id, [t.id for t in tanks[:3]])
+
+    # Widen the window: the old case joins, and five tanks on the rack raise a rack-wide alert
+    make.case(tanks[4], report_date=today)
+    kinds = {cluster.kind: cluster.tank_ids for cluster in find_clusters(today=today, window_days=15)}
+    assert kinds == {'rack': [t.id for t in tanks], 'neighbourhood': [t.id for t in tanks[:4]]}
+    assert find_clusters(today=today, facility_id=facility.id + 1) == []
@@ -0,0 +1,36 @@
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import column
+from sqlalchemy.dialects import postgresql
+
+from pagination import MAX_PAGE_SIZE, decode_cursor, encode_cursor, keyset_after, page_size
+
+
+def test_cursor_round_trips_dates_and_ids():
+    cursor = encode_cursor(date(2026, 3, 2), 17)
+    assert decode_cursor(cursor, date, int) == [date(2026, 3, 2), 17]
+    assert decode_cursor(encode_cursor(datetime(2026, 3, 2, 8, 30), 1), datetime, int) == [datetime(2026, 3, 2, 8, 30), 1]
+
+
+@pytest.mark.parametrize('cursor', [
+    'not base64!', encode_cursor(1), encode_cursor('x', 1),
+    # Well-formed, but the values have the wrong JSON types
+    encode_cursor(1, 2), encode_cursor('2026-03-02', None), encode_cursor('2026-03-02', [1])
+])
+def test_malformed_cursors_raise_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, date, int)
+
+
+def test_page_size_is_clamped():
+    assert page_size(None) == 50
+    assert page_size('', default=7) == 7
+    assert page_size('0') == 1
+    assert page_size(10_000) == MAX_PAGE_SIZE
+
+
+def test_keyset_after_compares_lexicographically():
+    clause = keyset_after([column('d'), column('id')], [1, 2], descending=True)
+    sql = str(clause.compile(dialect=postgresql.dialect(), compile_kwargs={'literal_binds': True}))
+    assert sql == 'd < 1 OR d = 1 AND id < 2'
@@ -0,0 +1,59 @@
+from datetime import date
+from itertools import combinations, permutations
+
+import numpy as np
+import pytest
+
+from pairing import _best_pairs, suggest_pairs
+from reservations import adjust_reservations
+
+
+def _brute_force(score, k):
+    n_rows, n_cols = score.shape
+    return max(
+        sum(score[r, c] for r, c in zip(rows, cols))
+        for rows in combinations(range(n_rows), k)
+        for cols in permutations(range(n_cols), k)
+    )
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_best_pairs_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    n_rows, n_cols = rng.integers(1, 5, size=2)
+    score = rng.random((n_rows, n_cols))
+    k = int(rng.integers(1, min(n_rows, n_cols) + 1))
+
+    rows, cols = _best_pairs(score, k)
+
+    assert len(rows) == k
+    assert len(set(rows)) == len(set(cols)) == k
+    assert score[rows, cols].sum() == pytest.approx(_brute_force(score, k))
+
+
+def test_best_pairs_beats_the_top_of_a_full_assignment():
+    # The full assignment pairs 0-0 and 1-1 (total 18), but the best
+    # single pair is 0-1
+    score = np.array([[9.0, 10.0], [1.0, 9.0]])
+    rows, cols = _best_pairs(score, 1)
+    assert (list(rows), list(cols)) == ([0], [1])
+    assert [len(part) for part in _best_pairs(score, 0)] == [0, 0]
+    assert len(_best_pairs(score, 5)[0]) == 2
+
+
+def test_never_crossed_tanks_pass_any_rest_requirement(make):
+    facility = make.facility()
+    rack = make.rack(facility)
+    fresh_male = make.tank(rack, 'A1', males=4, line='AB')
+    fresh_female = make.tank(rack, 'A2', females=4, line='AB')
+    rested = make.tank(rack, 'A3', females=4, line='AB')
+    adjust_reservations([(date(2026, 2, 1), {rested.id: {'males': 0, 'females': 1}}, 1)])
+
+    [suggestion] = suggest_pairs([{'line': 'AB', 'crosses': 2}], date(2026, 3, 2),
+                                 facility_id=facility.id, min_rest_days=60)
+
+    assert [(pair['tank1']['id'], pair['tank2']['id']) for pair in suggestion['pairs']] == [
+        (fresh_male.id, fresh_female.id)
+    ]
+    assert suggestion['pairs'][0]['tank1']['rest_days'] is None
+    assert suggestion['shortfall'] == 1
@@ -0,0 +1,75 @@
+import pytest
+
+from models_db import TankModel
+from pedigree import get_ancestors, get_descendants, lineage_graph, set_parent_cross
+
+
+def _ids(relatives):
+    return [(tank.id, depth) for tank, depth in relatives]
+
+
+@pytest.fixture
+def family(make):
+    facility = make.facility()
+    user = make.user(facility)
+    rack = make.rack(facility)
+    p1, p2, p3 = make.tank(rack, 'A1'), make.tank(rack, 'A2'), make.tank(rack, 'A3')
+    child, grandchild = make.tank(rack, 'B1'), make.tank(rack, 'C1')
+    profile = make.profile(user, facility)
+    plan = make.plan(profile, crosses=[(p1, p2, (1, 1, 1, 1)), (child, p3, (1, 1, 1, 1)), (p3, p2, (1, 1, 1, 1))])
+    first, second, third = sorted(plan.crosses, key=lambda cross: cross.id)
+    set_parent_cross(child, first)
+    set_parent_cross(grandchild, second)
+    make.session.flush()
+    return facility, user, (p1, p2, p3, child, grandchild), (first, second, third)
+
+
+def test_closure_table_answers_ancestors_and_descendants(family):
+    _, _, (p1, p2, p3, child, grandchild), _ = family
+
+    assert _ids(get_ancestors(grandchild.id)) == [(p3.id, 1), (child.id, 1), (p1.id, 2), (p2.id, 2)]
+    assert _ids(get_descendants(p1.id)) == [(child.id, 1), (grandchild.id, 2)]
+    assert get_ancestors(p1.id) == []
+
+
+def test_relinking_a_tank_moves_its_whole_subtree(family):
+    _, _, (p1, p2, p3, child, grandchild), (_, _, third) = family
+
+    set_parent_cross(child, third)
+
+    # p3 is both a grandparent and a parent of grandchild; the nearest depth wins
+    assert _ids(get_ancestors(grandchild.id)) == [(p3.id, 1), (child.id, 1), (p2.id, 2)]
+    assert get_descendants(p1.id) == []
+
+
+def test_a_tank_cannot_descend_from_its_offspring(family):
+    _, _, (p1, _, _, _, _), (_, second, _) = family
+    with pytest.raises(ValueError):
+        set_parent_cross(p1, second)
+
+
+def test_lineage_graph_without_a_facility_covers_every_tank(family):
+    facility, _, (p1, p2, p3, child, grandchild), (first, second, _) = family
+
+    graph = lineage_graph(None)
+
+    assert [node['id'] for node in graph['nodes']] == [p1.id, p2.id, p3.id, child.id, grandchild.id]
+    assert sorted((edge['source'], edge['target'], edge['cross_id']) for edge in graph['edges']) == sorted([
+        (p1.id, child.id, first.id), (p2.id, child.id, first.id),
+        (child.id, grandchild.id, second.id), (p3.id, grandchild.id, second.id),
+    ])
+    assert lineage_graph(facility.id) == graph
+    assert lineage_graph(facility.id + 1) == {'nodes': [], 'edges': []}
+
+
+def test_unknown_parent_cross_leaves_the_tank_unchanged(family, make, client, auth_headers):
+    _, user, (_, _, _, child, _), _ = family
+    make.session.commit()
+
+    response = client.put(f'/api/tanks/{child.id}', json={'line': 'changed', 'parent_cross_id': 999999},
+                          headers=auth_headers(user))
+    assert response.status_code == 404
+
+    make.session.commit()
+    make.session.expire_all()
+    assert TankModel.query.get(child.id).line is None
@@ -0,0 +1,137 @@
+from datetime import date, datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from position_history import (
+    PositionIntervalIndex,
+    naive_utc,
+    position_at,
+    record_move,
+    record_moves,
+    resolve_positions,
+    to_utc
+)
+from models_db import TankPositionHistoryModel
+
+
+def _row(tank_id, start, end, position, rack_id=1):
+    return SimpleNamespace(tank_id=tank_id, start_date=start, end_date=end, position=position, rack_id=rack_id)
+
+
+def test_to_utc_treats_dates_as_midnight_and_naive_datetimes_as_utc():
+    assert to_utc(date(2026, 1, 2)) == datetime(2026, 1, 2, tzinfo=timezone.utc)
+    assert to_utc(datetime(2026, 1, 2, 8)) == datetime(2026, 1, 2, 8, tzinfo=timezone.utc)
+    assert naive_utc(datetime(2026, 1, 2, 8, tzinfo=timezone.utc)) == datetime(2026, 1, 2, 8)
+
+
+def test_interval_index_resolves_half_open_intervals():
+    index = PositionIntervalIndex([
+        _row(1, datetime(2026, 1, 10), None, 'C3'),
+        _row(1, datetime(2026, 1, 1), datetime(2026, 1, 5), 'A1'),
+        _row(1, datetime(2026, 1, 5), datetime(2026, 1, 10), 'B2'),
+        _row(2, datetime(2026, 1, 3), datetime(2026, 1, 4), 'D4'),
+    ])
+
+    assert index.position_at(1, datetime(2025, 12, 31)) is None
+    assert index.position_at(1, datetime(2026, 1, 1)).position == 'A1'
+    # end is exclusive, start is inclusive
+    assert index.position_at(1, datetime(2026, 1, 5)).position == 'B2'
+    assert index.position_at(1, datetime(2030, 1, 1)).position == 'C3'
+    assert index.position_at(2, datetime(2026, 1, 4)) is None
+    assert index.position_at(3, datetime(2026, 1, 4)) is None
+    assert [interval and interval.position for interval in index.resolve([
+        (2, date(2026, 1, 3)), (1, date(2026, 1, 7))
+    ])] == ['D4', 'B2']
+
+
+def test_position_at_uses_the_generated_period_range(make):
+    facility = make.facility()
+    rack = make.rack(facility)
+    tank = make.tank(rack, 'A1')
+    make.session.add_all([
+        TankPositionHistoryModel(tank_id=tank.id, rack_id=rack.id, position='A1',
+                                 start_date=datetime(2026, 1, 1), end_date=datetime(2026, 1, 5)),
+        TankPositionHistoryModel(tank_id=tank.id, rack_id=rack.id, position='B2',
+                                 start_date=datetime(2026, 1, 5))
+    ])
+    make.session.flush()
+
+    assert position_at(tank.id, datetime(2026, 1, 4, 23)).position == 'A1'
+    assert position_at(tank.id, datetime(2026, 1, 5)).position == 'B2'
+    assert position_at(tank.id, date(2025, 12, 1)) is None
+
+
+def test_resolve_positions_answers_every_pair_in_order(make):
+    facility = make.facility()
+    rack = make.rack(facility)
+    first, second = make.tank(rack, 'A1'), make.tank(rack, 'A2')
+    make.session.add_all([
+        TankPositionHistoryModel(tank_id=first.id, rack_id=rack.id, position='A1',
+                                 start_date=datetime(2026, 1, 1), end_date=datetime(2026, 2, 1)),
+        TankPositionHistoryModel(tank_id=first.id, rack_id=rack.id, position='C1',
+                                 start_date=datetime(2026, 2, 1)),
+        TankPositionHistoryModel(tank_id=second.id, rack_id=rack.id, position='A2',
+                                 start_date=datetime(2026, 1, 15))
+    ])
+    make.session.flush()
+
+    resolved = resolve_positions([
+        (first.id, date(2026, 3, 1)),
+        (second.id, date(2026, 1, 1)),
+        (first.id, datetime(2026, 1, 31, 23, 59)),
+        (second.id, datetime(2026, 1, 20, tzinfo=timezone.utc)),
+    ])
+
+    assert [interval and interval.position for interval in resolved] == ['C1', None, 'A1', 'A2']
+    assert resolve_positions([]) == []
+
+
+def _intervals(session, tank):
+    return [(row.position, row.start_date, row.end_date) for row in session.query(TankPositionHistoryModel).filter_by(
+        tank_id=tank.id
+    ).order_by(TankPositionHistoryModel.start_date, TankPositionHistoryModel.id)]
+
+
+def test_record_moves_keeps_one_open_interval_per_tank(make):
+    facility = make.facility()
+    rack = make.rack(facility)
+    tank = make.tank(rack, 'A1', created_at=datetime(2026, 1, 1))
+
+    record_move(tank, rack.id, 'B1', at=datetime(2026, 2, 1))
+    record_move(tank, rack.id, 'C1', at=datetime(2026, 3, 1))
+    make.session.flush()
+
+    assert _intervals(make.session, tank) == [
+        # The stint before the first move is recorded too
+        ('A1', datetime(2026, 1, 1), datetime(2026, 2, 1)),
+        ('B1', datetime(2026, 2, 1), datetime(2026, 3, 1)),
+        ('C1', datetime(2026, 3, 1), None),
+    ]
+    assert tank.position == 'C1'
+
+
+def test_record_moves_swaps_tanks_in_one_call(make):
+    facility = make.facility()
+    rack = make.rack(facility)
+    left = make.tank(rack, 'A1', created_at=datetime(2026, 1, 1))
+    right = make.tank(rack, 'A2', created_at=datetime(2026, 1, 1))
+    at = datetime(2026, 2, 1)
+
+    record_moves([(left, rack.id, 'A2'), (right, rack.id, 'A1')], at=at)
+    make.session.flush()
+
+    assert _intervals(make.session, left)[-1] == ('A2', at, None)
+    assert _intervals(make.session, right)[-1] == ('A1', at, None)
+
+
+def test_a_second_open_interval_is_rejected(make):
+    facility = make.facility()
+    rack = make.rack(facility)
+    tank = make.tank(rack, 'A1')
+    for position in ('A1', 'B1'):
+        make.session.add(TankPositionHistoryModel(tank_id=tank.id, rack_id=rack.id, position=position,
+                                                  start_date=datetime(2026, 1, 1)))
+    with pytest.raises(IntegrityError):
+        make.session.flush()
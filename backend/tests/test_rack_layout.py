@@ -0,0 +1,93 @@
+from datetime import datetime
+
+from models_db import TankModel
+from position_history import record_move, record_moves, resolve_positions, retire_tank
+from rack_layout import layout_at, take_snapshot
+
+
+def test_layout_replays_history_since_the_nearest_snapshot(make):
+    facility = make.facility()
+    rack = make.rack(facility)
+    left = make.tank(rack, 'A1', created_at=datetime(2026, 1, 1))
+    right = make.tank(rack, 'A2', created_at=datetime(2026, 1, 1))
+    record_moves([(left, rack.id, 'A2'), (right, rack.id, 'A1')], at=datetime(2026, 2, 1))
+    take_snapshot(rack.id, datetime(2026, 2, 15))
+    record_move(left, rack.id, 'B1', at=datetime(2026, 3, 1))
+    make.session.flush()
+
+    assert layout_at(rack.id, datetime(2026, 1, 15)) == ({'A1': left.id, 'A2': right.id}, None)
+    assert layout_at(rack.id, datetime(2026, 2, 1)) == ({'A1': right.id, 'A2': left.id}, None)
+    assert layout_at(rack.id, datetime(2026, 3, 1)) == (
+        {'A1': right.id, 'B1': left.id}, datetime(2026, 2, 15)
+    )
+
+
+def test_unmoved_tanks_appear_once_created(make):
+    facility = make.facility()
+    rack = make.rack(facility)
+    tank = make.tank(rack, 'C3', created_at=datetime(2026, 1, 1))
+
+    assert layout_at(rack.id, datetime(2025, 12, 1))[0] == {}
+    assert layout_at(rack.id, datetime(2026, 1, 2))[0] == {'C3': tank.id}
+
+
+def test_deleted_tanks_stay_in_past_layouts(make):
+    facility = make.facility()
+    rack = make.rack(facility)
+    moved = make.tank(rack, 'A1', created_at=datetime(2026, 1, 1))
+    unmoved = make.tank(rack, 'A2', created_at=datetime(2026, 1, 1))
+    record_move(moved, rack.id, 'B1', at=datetime(2026, 2, 1))
+    # A snapshot taken while both tanks existed must not be filtered later
+    take_snapshot(rack.id, datetime(2026, 2, 15))
+    make.session.flush()
+
+    deleted_at = datetime(2026, 3, 1)
+    for tank in (moved, unmoved):
+        retire_tank(tank, at=deleted_at)
+        make.session.delete(tank)
+    make.session.flush()
+    assert TankModel.query.count() == 0
+
+    assert layout_at(rack.id, datetime(2026, 1, 15))[0] == {'A1': moved.id, 'A2': unmoved.id}
+    assert layout_at(rack.id, datetime(2026, 2, 20))[0] == {'B1': moved.id, 'A2': unmoved.id}
+    assert layout_at(rack.id, deleted_at)[0] == {}
+
+
+def test_delete_tank_route_keeps_history(make, client, auth_headers):
+    facility = make.facility()
+    user = make.user(facility)
+    rack = make.rack(facility)
+    tank = make.tank(rack, 'D4', males=2, created_at=datetime(2026, 1, 1))
+    tank_id = tank.id
+    make.session.commit()
+
+    response = client.delete(f'/api/tanks/{tank_id}', headers=auth_headers(user))
+
+    assert response.status_code == 200
+    assert layout_at(rack.id, datetime(2026, 1, 2))[0] == {'D4': tank_id}
+    assert layout_at(rack.id)[0] == {}
+
+
+def test_delete_rack_route_retires_its_tanks_and_keeps_the_rack(make, client, auth_headers):
+    facility = make.facility()
+    user = make.user(facility)
+    rack, other = make.rack(facility), make.rack(facility, 'R2')
+    moved = make.tank(rack, 'A1', created_at=datetime(2026, 1, 1))
+    unmoved = make.tank(rack, 'A2', created_at=datetime(2026, 1, 1))
+    record_move(moved, rack.id, 'B1', at=datetime(2026, 2, 1))
+    rack_id, tank_ids = rack.id, (moved.id, unmoved.id)
+    make.session.commit()
+    headers = auth_headers(user)
+
+    response = client.delete(f'/api/racks/{rack_id}', headers=headers)
+
+    assert response.status_code == 200, response.get_json()
+    assert TankModel.query.count() == 0
+    assert layout_at(rack_id, datetime(2026, 2, 2))[0] == {'A2': tank_ids[1], 'B1': tank_ids[0]}
+    assert layout_at(rack_id)[0] == {}
+    assert resolve_positions([(tank_id, datetime.utcnow()) for tank_id in tank_ids]) == [None, None]
+    # Gone from the rack list, and can't take new tanks or be deleted twice
+    assert [listed['id'] for listed in client.get('/api/racks', headers=headers).get_json()] == [other.id]
+    assert client.post('/api/tanks', json={'rack_id': rack_id, 'position': 'A1', 'size': 'REGULAR'},
+                       headers=headers).status_code != 201
+    assert client.delete(f'/api/racks/{rack_id}', headers=headers).status_code != 200
@@ -0,0 +1,90 @@
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from recurrence import (
+    WEEKDAYS,
+    first_occurrence,
+    occurrence_dates,
+    parse_rrule,
+    to_rrule,
+    validate_rule
+)
+
+
+def _brute_force(freq, interval, by_day, start_date, until, window_start, window_end):
+    week0 = start_date - timedelta(days=start_date.weekday())
+    dates = []
+    day = start_date
+    while day <= window_end and (until is None or day <= until):
+        if freq == 'DAILY':
+            matches = (day - start_date).days % interval == 0
+        else:
+            matches = WEEKDAYS[day.weekday()] in by_day.split(',') and (day - week0).days // 7 % interval == 0
+        if matches and day >= window_start:
+            dates.append(day)
+        day += timedelta(days=1)
+    return dates
+
+
+def test_parse_rrule_reads_the_supported_subset():
+    assert parse_rrule('RRULE:freq=weekly;interval=2;byday=MO,TH;count=10') == {
+        'freq': 'WEEKLY', 'interval': 2, 'by_day': 'MO,TH', 'count': 10, 'until': None
+    }
+    assert parse_rrule('FREQ=DAILY;UNTIL=20260331T000000Z')['until'] == date(2026, 3, 31)
+    for rule in ('FREQ=MONTHLY;BYMONTHDAY=1', 'FREQ=DAILY;FREQ=WEEKLY', 'FREQ'):
+        with pytest.raises(ValueError):
+            parse_rrule(rule)
+
+
+def test_validate_rule_normalises_by_day_and_resolves_count():
+    monday = date(2026, 3, 2)
+    assert validate_rule('WEEKLY', 1, None, monday) == ('WEEKLY', 1, 'MO', None)
+    # Starting on a Monday, the 5th occurrence of TH,MO every other week
+    assert validate_rule('WEEKLY', 2, 'TH,MO', monday, count=5) == ('WEEKLY', 2, 'MO,TH', date(2026, 3, 30))
+    assert validate_rule('DAILY', 3, None, monday, count=4)[3] == date(2026, 3, 11)
+    for args, kwargs in [
+        (('MONTHLY', 1, None, monday), {}),
+        (('DAILY', 0, None, monday), {}),
+        (('DAILY', 1, 'MO', monday), {}),
+        (('WEEKLY', 1, 'XX', monday), {}),
+        (('DAILY', 1, None, monday), {'count': 2, 'until': monday}),
+        (('DAILY', 1, None, monday), {'until': date(2026, 3, 1)}),
+    ]:
+        with pytest.raises(ValueError):
+            validate_rule(*args, **kwargs)
+
+
+@pytest.mark.parametrize('seed', range(50))
+def test_occurrence_dates_match_brute_force(seed):
+    rng = random.Random(seed)
+    freq = rng.choice(['DAILY', 'WEEKLY'])
+    interval = rng.randint(1, 4)
+    start_date = date(2026, 1, 1) + timedelta(days=rng.randint(0, 60))
+    by_day = None
+    if freq == 'WEEKLY':
+        by_day = ','.join(sorted(rng.sample(WEEKDAYS, rng.randint(1, 3)), key=WEEKDAYS.index))
+    until = start_date + timedelta(days=rng.randint(0, 200)) if rng.random() < 0.5 else None
+    window_start = start_date + timedelta(days=rng.randint(-30, 150))
+    window_end = window_start + timedelta(days=rng.randint(0, 60))
+
+    expected = _brute_force(freq, interval, by_day, start_date, until, window_start, window_end)
+    assert occurrence_dates(freq, interval, by_day, start_date, until, window_start, window_end) == expected
+
+    everything = _brute_force(freq, interval, by_day, start_date, until, start_date, start_date + timedelta(days=400))
+    assert first_occurrence(freq, interval, by_day, start_date, until) == (everything[0] if everything else None)
+
+
+def test_first_occurrence_skips_to_the_first_listed_weekday():
+    wednesday = date(2026, 3, 4)
+    assert first_occurrence('WEEKLY', 2, 'MO', wednesday, None) == date(2026, 3, 16)
+    assert first_occurrence('WEEKLY', 1, 'MO', wednesday, date(2026, 3, 8)) is None
+
+
+def test_to_rrule_round_trips_through_parse_rrule():
+    rule = to_rrule('WEEKLY', 2, 'MO,TH', date(2026, 6, 30))
+    assert rule == 'FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,TH;UNTIL=20260630'
+    assert parse_rrule(rule) == {'freq': 'WEEKLY', 'interval': 2, 'by_day': 'MO,TH', 'count': None,
+                                 'until': date(2026, 6, 30)}
+    assert to_rrule('DAILY', 1, None, None) == 'FREQ=DAILY'
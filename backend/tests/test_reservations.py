@@ -0,0 +1,47 @@
+from datetime import date
+from types import SimpleNamespace
+
+from models_db import FishReservationModel
+from reservations import adjust_reservations, cross_uses, reserved_on
+
+
+def test_cross_uses_totals_models_and_payloads_per_tank():
+    model = SimpleNamespace(tank1_id=1, tank1_males=2, tank1_females=None,
+                            tank2_id=2, tank2_males=0, tank2_females=3)
+    payload = {'tank1': {'id': 2, 'males': 1, 'females': 1}, 'tank2': {'id': 1, 'males': 1, 'females': 0}}
+
+    assert cross_uses([model, payload]) == {
+        1: {'males': 3, 'females': 0},
+        2: {'males': 1, 'females': 4},
+    }
+    assert cross_uses([]) == {}
+
+
+def test_adjust_reservations_nets_deltas_and_removes_empty_rows(make):
+    facility = make.facility()
+    rack = make.rack(facility)
+    a, b = make.tank(rack, 'A1'), make.tank(rack, 'A2')
+    monday, tuesday = date(2026, 3, 2), date(2026, 3, 3)
+
+    adjust_reservations([
+        (monday, {a.id: {'males': 2, 'females': 1}, b.id: {'males': 1, 'females': 0}}, 1),
+        (monday, {a.id: {'males': 1, 'females': 0}}, 1),
+    ])
+    assert reserved_on([a.id, b.id], monday) == {
+        a.id: {'males': 3, 'females': 1},
+        b.id: {'males': 1, 'females': 0},
+    }
+
+    # Moving a plan releases one date and reserves another in the same call
+    adjust_reservations([
+        (monday, {b.id: {'males': 1, 'females': 0}}, -1),
+        (tuesday, {b.id: {'males': 1, 'females': 0}}, 1),
+    ])
+    assert reserved_on([b.id], monday) == {}
+    assert reserved_on([b.id], tuesday) == {b.id: {'males': 1, 'females': 0}}
+    assert FishReservationModel.query.count() == 2
+
+    # Deltas that cancel out never touch the table
+    adjust_reservations([(monday, {b.id: {'males': 5, 'females': 5}}, 1),
+                         (monday, {b.id: {'males': 5, 'females': 5}}, -1)])
+    assert reserved_on([b.id], monday) == {}
@@ -23,6 +23,10 @@ const CaseDetail = ({ caseData, onBack, onCaseUpdated }) => {
   const [error, setError] = useState(null);
   const [caseDetails, setCaseDetails] = useState(caseData || {});
   const [refreshKey, setRefreshKey] = useState(0); // Add a refresh key state
+  // The case comes with its newest notes; older pages are fetched on demand
+  const [olderNotes, setOlderNotes] = useState([]);
+  const [notesCursor, setNotesCursor] = useState(null);
+  const [loadingNotes, setLoadingNotes] = useState(false);
 
   const fetchCaseDetails = async () => {
     try {
@@ -36,6 +40,8 @@ const CaseDetail = ({ caseData, onBack, onCaseUpdated }) => {
       );
       
       setCaseDetails(response.data);
+      setOlderNotes([]);
+      setNotesCursor(response.data.notes_next_cursor || null);
     } catch (err) {
       setError("Failed to refresh case details");
       console.error("Error fetching case details:", err);
@@ -48,6 +54,30 @@ const CaseDetail = ({ caseData, onBack, onCaseUpdated }) => {
     fetchCaseDetails();
   }, [caseData.id, refreshKey]);
 
+  const loadOlderNotes = async () => {
+    try {
+      setLoadingNotes(true);
+      setError(null);
+      const token = localStorage.getItem('token');
+      
+      const response = await axios.get(
+        `${process.env.REACT_APP_API_BASE_URL}/clinical/cases/${caseData.id}/notes`,
+        { params: { cursor: notesCursor }, headers: { 'Authorization': `Bearer ${token}` } }
+      );
+      
+      setOlderNotes(prevNotes => [...prevNotes, ...response.data]);
+      setNotesCursor(response.headers['x-next-cursor'] || null);
+    } catch (err) {
+      setError("Failed to load earlier updates");
+      console.error("Error fetching case notes:", err);
+    } finally {
+      setLoadingNotes(false);
+    }
+  };
+
+  // Pages arrive newest first; show the thread oldest first
+  const notes = [...(caseDetails.notes || []), ...olderNotes].reverse();
+
   const handleStatusChange = async () => {
     try {
       setLoading(true);
@@ -196,14 +226,29 @@ const CaseDetail = ({ caseData, onBack, onCaseUpdated }) => {
         
         <Grid item xs={12} md={6}>
           <Paper sx={{ p: 2, height: '100%', display: 'flex', flexDirection: 'column' }}>
-            <Typography variant="h6" gutterBottom>Case Updates</Typography>
+            <Typography variant="h6" gutterBottom>
+              Case Updates{caseDetails.note_count ? ` (${caseDetails.note_count})` : ''}
+            </Typography>
             <Divider sx={{ mb: 2 }} />
             
             <Box sx={{ flexGrow: 1, overflowY: 'auto', maxHeight: 400 }}>
-              {caseDetails.notes && caseDetails.notes.length > 0 ? (
+              {notesCursor && (
+                <Box sx={{ display: 'flex', justifyContent: 'center' }}>
+                  <Button
+                    size="small"
+                    disabled={loadingNotes}
+                    onClick={loadOlderNotes}
+                  >
+                    {loadingNotes
+                      ? <CircularProgress size={20} />
+                      : `Load earlier updates (${notes.length} of ${caseDetails.note_count} shown)`}
+                  </Button>
+                </Box>
+              )}
+              {notes.length > 0 ? (
                 <List>
-                  {caseDetails.notes.map((note, index) => (
-                    <ListItem key={note.id || index} alignItems="flex-start" divider={index < caseDetails.notes.length - 1}>
+                  {notes.map((note, index) => (
+                    <ListItem key={note.id || index} alignItems="flex-start" divider={index < notes.length - 1}>
                       <ListItemAvatar>
                         <Avatar>
                           <TimeIcon />